@@ -4,12 +4,12 @@ import threading
 from typing import Any, Dict
 import base64, tempfile
 from pathlib import Path
-import yaml
 
 from settings import CONFIG_PATH
 
 from actions.dispatcher import register
 from scripts.marketplace import run
+from utils.config_io import parse_yaml_to_dict
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -20,7 +20,7 @@ def _resolve_temp_dir() -> Path:
     default_dir = Path.home() / "AppData/Local/Temp"
     try:
         if CONFIG_PATH.exists():
-            data = yaml.safe_load(CONFIG_PATH.read_text(encoding="utf-8")) or {}
+            data = parse_yaml_to_dict(CONFIG_PATH.read_text(encoding="utf-8"))
             cfg_dir = data.get("temp_dir")
             if isinstance(cfg_dir, str) and cfg_dir.strip():
                 return Path(cfg_dir).expanduser()
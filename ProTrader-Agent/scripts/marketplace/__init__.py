@@ -1,181 +1,251 @@
 """Marketplace workflow package."""
 from __future__ import annotations
 
+import contextlib
 import os
+import subprocess
 import time
-from typing import Optional, Sequence, TYPE_CHECKING
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
 
 from utils.fsm import FSM, StateDef
 from utils.logger import get_logger
-from utils.misc import close_dofus, open_dofus
+from utils.misc import close_dofus, open_dofus, wait_for
 
 from .config import (
     ATTENTE_HDV_PATH,
     BTN_JOUER_PATH,
+    DEBUG,
     EST_EN_JEU_PATH,
+    KAMAS_PATH,
     MONITOR_INDEX,
     OUVRIR_HDV_PATH,
+    PREFILTER_K,
+    PYRAMID_LEVELS,
     RECHERCHE_PATH,
     TICK_HZ,
 )
-from .context import create_context
+from .context import create_context, set_current_kamas, state_region
 from .purchase import PURCHASE_STATES, _try_read_kamas_amount
 from .sale import SALE_STATES
-from .telemetry import _send_kamas, _send_state
+from .telemetry import _enqueue_state, _send_kamas
 
 logger = get_logger(__name__)
 
-if TYPE_CHECKING:  # pragma: no cover - imported for typing only
-    from utils.mouse import move_click as MoveClickFn
-    from utils.vision import find_template_on_screen as FindTemplateFn
+def _bind_io(ctx) -> None:
+    """Resolve the mouse/vision callables once, before the first tick.
 
-_move_click_impl = None
-_find_template_impl = None
+    Imported here rather than at module import so that loading the package
+    does not pull OpenCV/mss/interception in.
+    """
 
+    from utils.mouse import move_click
+    from utils.vision import find_any_template, find_template_on_screen
 
-def _ensure_mouse():
-    global _move_click_impl
-    if _move_click_impl is None:
-        from utils.mouse import move_click as mc
+    ctx.click = move_click
+    ctx.find = find_template_on_screen
+    ctx.find_any = find_any_template
 
-        _move_click_impl = mc
-    return _move_click_impl
 
+def _state_region(fsm, state: str):
+    """Return the configured search area for ``state`` (``None`` = whole monitor)."""
 
-def _ensure_vision():
-    global _find_template_impl
-    if _find_template_impl is None:
-        from utils.vision import find_template_on_screen as finder
+    return state_region(fsm.ctx, state)
 
-        _find_template_impl = finder
-    return _find_template_impl
+
+# Transition waits: poll at WAIT_POLL_HZ instead of sleeping a fixed second,
+# and move on as soon as the screen confirms the next step.
+WAIT_TIMEOUT_S = 1.2
+WAIT_POLL_HZ = 20
+
+
+def _settled_match(fsm, state: str, template_path, res):
+    """Wait until a freshly found button stops moving (e.g. fade/slide-in).
+
+    Returns the last match, falling back to ``res`` if the template vanished.
+    """
+
+    find_template_on_screen = fsm.ctx.find
+    region = _state_region(fsm, state)
+    last = res
+
+    def _stable() -> bool:
+        nonlocal last
+        cur = find_template_on_screen(
+            template_path=str(template_path),
+            region=region,
+            pyramid_levels=PYRAMID_LEVELS,
+            debug=DEBUG,
+        )
+        if cur is None:
+            return False
+        stable = cur.center == last.center
+        last = cur
+        return stable
+
+    wait_for(_stable, timeout=WAIT_TIMEOUT_S, poll_hz=WAIT_POLL_HZ)
+    return last
+
+
+def _wait_visible(fsm, state: str, template_path) -> None:
+    """Wait (bounded) until the next state's template appears."""
+
+    find_template_on_screen = fsm.ctx.find
+    region = _state_region(fsm, state)
+    wait_for(
+        lambda: find_template_on_screen(
+            template_path=str(template_path),
+            region=region,
+            pyramid_levels=PYRAMID_LEVELS,
+            debug=DEBUG,
+        ),
+        timeout=WAIT_TIMEOUT_S,
+        poll_hz=WAIT_POLL_HZ,
+    )
 
 
 def on_enter_lancement(fsm):
-    _send_state("LANCEMENT")
+    _enqueue_state("LANCEMENT")
     open_dofus()
 
 
 def on_tick_lancement(fsm):
-    find_template_on_screen = _ensure_vision()
-    res = find_template_on_screen(
+    res = fsm.ctx.find(
         template_path=str(BTN_JOUER_PATH),
-        debug=True,
+        region=_state_region(fsm, "LANCEMENT"),
+        prefilter_k=PREFILTER_K,
+        pyramid_levels=PYRAMID_LEVELS,
+        debug=DEBUG,
     )
 
     if res:
-        time.sleep(1)
-        move_click = _ensure_mouse()
-        move_click(res.center[0], res.center[1])
+        res = _settled_match(fsm, "LANCEMENT", BTN_JOUER_PATH, res)
+        fsm.ctx.click(res.center[0], res.center[1])
         return "ATTENTE_CONNEXION"
 
 
 def on_enter_attente_connexion(fsm):
-    _send_state("ATTENTE_CONNEXION")
+    _enqueue_state("ATTENTE_CONNEXION")
 
 
 def on_tick_attente_connexion(fsm):
-    find_template_on_screen = _ensure_vision()
-    res = find_template_on_screen(
-        template_path=str(EST_EN_JEU_PATH),
-        debug=True,
+    # The HDV button only shows once the game is loaded: either template
+    # proves the connection, and both are matched on the same grab.
+    hit = fsm.ctx.find_any(
+        (str(EST_EN_JEU_PATH), str(OUVRIR_HDV_PATH)),
+        region=_state_region(fsm, "ATTENTE_CONNEXION"),
+        pyramid_levels=PYRAMID_LEVELS,
+        debug=DEBUG,
     )
 
-    if res:
-        time.sleep(1)
+    if hit:
+        if hit[0] != str(OUVRIR_HDV_PATH):
+            _wait_visible(fsm, "OUVRIR_HDV", OUVRIR_HDV_PATH)
         return "EN_JEU"
 
 
 def on_enter_en_jeu(fsm):
-    _send_state("EN_JEU")
+    _enqueue_state("EN_JEU")
     return "OUVRIR_HDV"
 
 
 def on_enter_ouvrir_hdv(fsm):
-    _send_state("OUVRIR_HDV")
+    _enqueue_state("OUVRIR_HDV")
 
 
 def on_tick_ouvrir_hdv(fsm):
-    find_template_on_screen = _ensure_vision()
-    res = find_template_on_screen(
+    res = fsm.ctx.find(
         template_path=str(OUVRIR_HDV_PATH),
-        debug=True,
+        region=_state_region(fsm, "OUVRIR_HDV"),
+        pyramid_levels=PYRAMID_LEVELS,
+        debug=DEBUG,
     )
 
     if res:
-        time.sleep(1)
-        move_click = _ensure_mouse()
-        move_click(res.center[0], res.center[1])
+        res = _settled_match(fsm, "OUVRIR_HDV", OUVRIR_HDV_PATH, res)
+        fsm.ctx.click(res.center[0], res.center[1])
         return "ATTENTE_HDV"
 
 
 def on_enter_attente_hdv(fsm):
-    _send_state("ATTENTE_HDV")
+    _enqueue_state("ATTENTE_HDV")
 
 
 def on_tick_attente_hdv(fsm):
-    find_template_on_screen = _ensure_vision()
-    res = find_template_on_screen(
-        template_path=str(ATTENTE_HDV_PATH),
-        debug=True,
+    # Same idea: the kamas widget belongs to the opened HDV window.
+    hit = fsm.ctx.find_any(
+        (str(ATTENTE_HDV_PATH), str(KAMAS_PATH)),
+        region=_state_region(fsm, "ATTENTE_HDV"),
+        pyramid_levels=PYRAMID_LEVELS,
+        debug=DEBUG,
     )
 
-    if res:
-        time.sleep(1)
+    if hit:
+        if hit[0] != str(KAMAS_PATH):
+            _wait_visible(fsm, "GET_KAMAS", KAMAS_PATH)
         return "GET_KAMAS"
 
 
 def on_enter_get_kamas(fsm):
-    _send_state("GET_KAMAS")
+    _enqueue_state("GET_KAMAS")
 
 
 def on_tick_get_kamas(fsm):
     kamas_value = _try_read_kamas_amount()
 
     if kamas_value is not None:
-        fsm.ctx.current_kamas = kamas_value
+        set_current_kamas(fsm.ctx, kamas_value)
         logger.info("Fortune actuelle : %d K", kamas_value)
         _send_kamas(kamas_value)
         return "ENTRER_RESSOURCE"
 
 
 def on_enter_clic_recherche(fsm):
-    _send_state("CLIC_RECHERCHE")
+    _enqueue_state("CLIC_RECHERCHE")
+
+
+def _next_resource(fsm) -> str:
+    fsm.ctx.resource_index += 1
+    if fsm.ctx.resource_index < fsm.ctx.resources_len:
+        return "ENTRER_RESSOURCE"
+    return "END"
 
 
 def on_tick_clic_recherche(fsm):
-    if getattr(fsm.ctx, "skip_recherche_click", False):
+    if fsm.ctx.skip_recherche_click:
+        # The sale step already waited after its last click.
         fsm.ctx.skip_recherche_click = False
-        time.sleep(0.5)
-        fsm.ctx.resource_index += 1
-        if fsm.ctx.resource_index < len(fsm.ctx.resources):
-            return "ENTRER_RESSOURCE"
-        return "END"
-
-    find_template_on_screen = _ensure_vision()
-    res = find_template_on_screen(
+        return _next_resource(fsm)
+
+    res = fsm.ctx.find(
         template_path=str(RECHERCHE_PATH),
-        debug=True,
+        region=_state_region(fsm, "CLIC_RECHERCHE"),
+        pyramid_levels=PYRAMID_LEVELS,
+        debug=DEBUG,
     )
 
     if res:
+        res = _settled_match(fsm, "CLIC_RECHERCHE", RECHERCHE_PATH, res)
+        fsm.ctx.click(res.center[0], res.center[1])
+        # Le champ de recherche ne change pas visuellement : délai fixe conservé.
         time.sleep(1)
-        move_click = _ensure_mouse()
-        move_click(res.center[0], res.center[1])
-        time.sleep(1)
-        fsm.ctx.resource_index += 1
-        if fsm.ctx.resource_index < len(fsm.ctx.resources):
-            return "ENTRER_RESSOURCE"
-        return "END"
+        return _next_resource(fsm)
 
 
 def on_enter_end(fsm):
-    _send_state("END")
+    _enqueue_state("END")
     close_dofus()
-    if os.name == "nt":
-        os.system("shutdown /s /t 0")
-    else:
-        os.system("shutdown -h now")
+    # Windows only: a test/dev run on another OS must never power the machine off.
+    if os.name != "nt":
+        logger.info("Arrêt de la machine ignoré (hors Windows)")
+        return
+    # Fire and forget: the 5 s grace lets run() delete the temporary
+    # templates before Windows goes down.
+    try:
+        subprocess.Popen(["shutdown", "/s", "/t", "5"])
+    except OSError as exc:
+        logger.error("Impossible de lancer l'arrêt de la machine: %s", exc)
 
 
 COMMON_STATES = {
@@ -198,25 +268,60 @@ ALL_STATES = {
 }
 
 
+def _safe_unlink(path: str) -> None:
+    with contextlib.suppress(OSError):
+        os.unlink(path)
+
+
+def _existing_paths(paths: Sequence[str]) -> List[str]:
+    """Keep the paths that exist, listing each parent directory once."""
+
+    by_dir: Dict[str, List[str]] = defaultdict(list)
+    for path in paths:
+        by_dir[os.path.dirname(os.path.abspath(path))].append(path)
+
+    existing: List[str] = []
+    for directory, members in by_dir.items():
+        try:
+            with os.scandir(directory) as it:
+                # Names only: is_file() may cost a stat per entry, and a
+                # directory with a matching name just fails the unlink.
+                names = {os.path.normcase(entry.name) for entry in it}
+        except OSError:
+            continue
+        existing.extend(
+            p for p in members if os.path.normcase(os.path.basename(p)) in names
+        )
+    return existing
+
+
+def _cleanup_templates(resources: Sequence[dict]) -> None:
+    """Delete the temporary template PNGs, overlapping the unlink syscalls."""
+
+    paths = _existing_paths(
+        [res["template_path"] for res in resources if res.get("template_path")]
+    )
+    if not paths:
+        return
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        ex.map(_safe_unlink, paths)
+
+
 def run(resources: Sequence[dict], fortune_lines: Optional[Sequence[dict]] = None) -> None:
     """Run the marketplace FSM with the provided resources."""
 
     fortune_lines = list(fortune_lines or [])
     ctx = create_context(resources=resources, fortune_lines=fortune_lines, monitor_index=MONITOR_INDEX)
 
+    _bind_io(ctx)
+
     fsm = FSM(states=ALL_STATES, start="LANCEMENT", end="END")
     fsm.ctx = ctx
 
     try:
         fsm.run(tick_hz=TICK_HZ)
     finally:
-        try:
-            for res in resources:
-                template_path = res.get("template_path")
-                if template_path and os.path.isfile(template_path):
-                    os.remove(template_path)
-        except Exception:
-            pass
+        _cleanup_templates(resources)
 
 
 __all__ = ["run"]
@@ -1,10 +1,11 @@
 """Configuration helpers for the marketplace workflow."""
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional, Sequence
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
 
 from settings import CONFIG_PATH
 from utils.config_io import load_config_yaml, parse_yaml_to_dict
@@ -21,9 +22,21 @@ DEFAULT_VENTE_FALLBACK_OFFSET_PX = 240
 DEFAULT_PURCHASE_MAX_RETRIES = 5
 DEFAULT_KAMAS_CHECK_MAX_ATTEMPTS = 10
 DEFAULT_TICK_HZ = 2
+DEFAULT_PREFILTER_K = 3.0
+DEFAULT_PYRAMID_LEVELS = 1
 
+# Per-state search areas (``rois`` section): [left, top, width, height] in
+# monitor coordinates, or "right_half" for the context's right half region.
+# States without an entry keep their default area: the whole monitor, or the
+# right half for VENTE_SELECTION_RESSOURCE / VENTE_CLIQUER_VENTE.
+RIGHT_HALF_ROI = "right_half"
+StateRoi = Union[Tuple[int, int, int, int], str]
 
-@dataclass(frozen=True)
+# Debug overlays (template/OCR rectangles) are opt-in: PROTRADER_DEBUG=1.
+DEBUG = os.getenv("PROTRADER_DEBUG", "0").strip().lower() in {"1", "true", "yes", "on"}
+
+
+@dataclass(frozen=True, slots=True)
 class MarketplaceConfig:
     """Container for resolved marketplace configuration values."""
 
@@ -53,6 +66,9 @@ class MarketplaceConfig:
     kamas_check_max_attempts: int
     monitor_index: int
     tick_hz: int
+    prefilter_k: float
+    pyramid_levels: int
+    roi_by_state: Dict[str, StateRoi]
 
 
 def _resolve_template(base_dir: Path, templates: Dict[str, str], key: str) -> Path:
@@ -85,6 +101,25 @@ def _resolve_group(
     return resolved
 
 
+def _parse_rois(section: Dict[str, Any]) -> Dict[str, StateRoi]:
+    rois: Dict[str, StateRoi] = {}
+    for state, value in (section or {}).items():
+        key = str(state).strip().upper()
+        if isinstance(value, str) and value.strip().lower() == RIGHT_HALF_ROI:
+            rois[key] = RIGHT_HALF_ROI
+            continue
+        try:
+            left, top, width, height = (int(v) for v in value)
+        except (TypeError, ValueError):
+            logger.warning("ROI invalide pour %s: %r", key, value)
+            continue
+        if width <= 0 or height <= 0:
+            logger.warning("ROI vide pour %s: %r", key, value)
+            continue
+        rois[key] = (left, top, width, height)
+    return rois
+
+
 @lru_cache(maxsize=1)
 def load_marketplace_config() -> MarketplaceConfig:
     """Load and resolve the marketplace configuration file."""
@@ -145,6 +180,9 @@ def load_marketplace_config() -> MarketplaceConfig:
         ),
         monitor_index=monitor_index,
         tick_hz=int(raw_config.get("tick_hz", DEFAULT_TICK_HZ)),
+        prefilter_k=float(raw_config.get("prefilter_k", DEFAULT_PREFILTER_K)),
+        pyramid_levels=max(0, int(raw_config.get("pyramid_levels", DEFAULT_PYRAMID_LEVELS))),
+        roi_by_state=_parse_rois(raw_config.get("rois", {}) or {}),
     )
 
 
@@ -175,9 +213,13 @@ PURCHASE_MAX_RETRIES = CONFIG.purchase_max_retries
 KAMAS_CHECK_MAX_ATTEMPTS = CONFIG.kamas_check_max_attempts
 MONITOR_INDEX = CONFIG.monitor_index
 TICK_HZ = CONFIG.tick_hz
+PREFILTER_K = CONFIG.prefilter_k
+PYRAMID_LEVELS = CONFIG.pyramid_levels
+ROI_BY_STATE = CONFIG.roi_by_state
 
 __all__ = [
     "CONFIG",
+    "DEBUG",
     "BTN_JOUER_PATH",
     "EST_EN_JEU_PATH",
     "OUVRIR_HDV_PATH",
@@ -203,6 +245,10 @@ __all__ = [
     "KAMAS_CHECK_MAX_ATTEMPTS",
     "MONITOR_INDEX",
     "TICK_HZ",
+    "PREFILTER_K",
+    "PYRAMID_LEVELS",
+    "RIGHT_HALF_ROI",
+    "ROI_BY_STATE",
     "load_marketplace_config",
     "MarketplaceConfig",
 ]
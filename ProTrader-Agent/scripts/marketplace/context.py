@@ -2,7 +2,10 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 try:  # pragma: no cover - optional dependency at runtime
     import mss  # type: ignore
@@ -11,74 +14,139 @@ except Exception:  # pragma: no cover - fallback when mss is unavailable
 
 from utils.logger import get_logger
 
-from .config import MONITOR_INDEX
+from .config import CONFIG, MONITOR_INDEX, RIGHT_HALF_ROI, ROI_BY_STATE
 
 logger = get_logger(__name__)
 
 ScreenRegion = Optional[Tuple[int, int, int, int]]
 
 
-@dataclass
+def _read_monitors() -> List[Dict[str, int]]:
+    """Monitor geometry from a short-lived mss handle (``[]`` if unavailable)."""
+
+    if mss is None:
+        return []
+    try:
+        with mss.mss() as sct:
+            return [dict(mon) for mon in sct.monitors]
+    except Exception as exc:  # pragma: no cover - headless/unsupported session
+        logger.debug("Impossible de lire la géométrie des moniteurs: %s", exc)
+        return []
+
+
+# Monitor geometry is stable for the lifetime of the process: read it once, on
+# first use (importing this module must not open a capture handle).
+_MONITORS: Optional[List[Dict[str, int]]] = None
+
+
+def _monitors() -> List[Dict[str, int]]:
+    global _MONITORS
+    if _MONITORS is None:
+        _MONITORS = _read_monitors()
+    return _MONITORS
+
+
+@dataclass(slots=True)
 class MarketplaceContext:
     """Encapsulates the mutable data shared across FSM states."""
 
     resources: Sequence[Dict[str, Any]]
+    resources_len: int = 0
     fortune_lines: Sequence[Dict[str, Any]] = field(default_factory=list)
-    fortune_lookup: Dict[str, Dict[str, Dict[str, Any]]] = field(default_factory=dict)
+    fortune_lookup: Dict[Tuple[str, str], Dict[str, Any]] = field(default_factory=dict)
     resource_index: int = 0
     slug: str = ""
     template_path: str = ""
     pending_purchase: Optional[Dict[str, Any]] = None
     reset_scan: bool = True
-    targets: List[Tuple[str, str]] = field(default_factory=list)
-    scanned: Dict[str, Optional[int]] = field(default_factory=dict)
-    attempts: Dict[str, int] = field(default_factory=dict)
+    # Scan state indexed by quantity position (see purchase._QTY_KEYS):
+    # -2 = not scanned yet, -1 = skipped, >= 0 = price read.
+    scanned: Optional[np.ndarray] = None
+    attempts: Optional[np.ndarray] = None
+    # Fortune line and purchase threshold per quantity position of the current
+    # resource, resolved once on ENTRER_RESSOURCE (-1 = no usable threshold).
+    qty_fortune_lines: List[Optional[Dict[str, Any]]] = field(default_factory=list)
+    qty_thresholds: Optional[np.ndarray] = None
     completed_purchases: List[Dict[str, Any]] = field(default_factory=list)
     current_sale: Optional[Dict[str, Any]] = None
     current_kamas: Optional[int] = None
+    # Prix maximal d'un lot (10 % de current_kamas), mis à jour avec la fortune
+    # (voir set_current_kamas) ; None tant que la fortune est inconnue.
+    max_purchase_price: Optional[int] = None
     right_half_region: ScreenRegion = None
     skip_recherche_click: bool = False
-
-
-def _build_fortune_lookup(fortune_lines: Sequence[Dict[str, Any]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
-    """Return a lookup dictionary indexed by slug then quantity label."""
-
-    lookup: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    # time.monotonic() deadline before which purchase ticks do nothing (UI settle
+    # delays without blocking the FSM thread).
+    wait_until: float = 0.0
+    # Cible de l'état déjà vue une fois : on attend que l'UI se stabilise puis
+    # on clique sur une détection fraîche.
+    selection_seen: bool = False
+    # Mouse/vision callables bound once by run() (see marketplace._bind_io).
+    click: Optional[Callable[..., Any]] = None
+    find: Optional[Callable[..., Any]] = None
+    find_any: Optional[Callable[..., Any]] = None
+
+
+def _build_fortune_lookup(fortune_lines: Sequence[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Return a lookup dictionary indexed by ``(slug, quantity label)``."""
+
+    lookup: Dict[Tuple[str, str], Dict[str, Any]] = {}
     for line in fortune_lines or []:
         slug = (line.get("slug") or "").strip().lower()
         qty = (line.get("qty") or "").strip()
         if slug and qty:
-            lookup.setdefault(slug, {})[qty] = line
+            lookup[(slug, qty)] = line
     return lookup
 
 
 def get_fortune_line(ctx: MarketplaceContext, slug: str, qty: str) -> Optional[Dict[str, Any]]:
     """Lookup a fortune line within the context."""
 
-    slug_key = (slug or "").strip().lower()
-    if not slug_key:
-        return None
-    return (ctx.fortune_lookup or {}).get(slug_key, {}).get(qty)
+    return ctx.fortune_lookup.get(((slug or "").strip().lower(), qty))
+
 
+# Part maximale de la fortune engagée sur un seul lot : 1/10.
+_MAX_FORTUNE_DIVISOR = 10
 
+
+def set_current_kamas(ctx: MarketplaceContext, kamas: Optional[int]) -> None:
+    """Store the kamas fortune and the per-lot price ceiling derived from it."""
+
+    ctx.current_kamas = kamas
+    ctx.max_purchase_price = None if kamas is None else max(0, kamas // _MAX_FORTUNE_DIVISOR)
+
+
+def state_region(
+    ctx: MarketplaceContext, state: str, default: Optional[str] = None
+) -> ScreenRegion:
+    """Return the configured search area for ``state``.
+
+    ``default`` applies when the ``rois`` section has no entry (``None`` = whole
+    monitor, ``RIGHT_HALF_ROI`` = the context's right half).
+    """
+
+    roi = ROI_BY_STATE.get(state, default)
+    if roi == RIGHT_HALF_ROI:
+        return ctx.right_half_region
+    return roi
+
+
+@lru_cache(maxsize=4)
 def compute_right_half_region(monitor_index: int = MONITOR_INDEX) -> ScreenRegion:
     """Return the bounding box describing the right half of the selected monitor."""
 
     monitor_idx = int(monitor_index or 1)
-    if mss is None:
+    monitors = _monitors()
+    if not monitors:
         logger.debug("Bibliothèque mss indisponible, aucune région écran déterminée")
         return None
-    try:
-        with mss.mss() as sct:
-            monitors = sct.monitors
-            if monitor_idx < 1 or monitor_idx >= len(monitors):
-                monitor_idx = 1
-            mon = monitors[monitor_idx]
-            width = int(mon.get("width", 0))
-            height = int(mon.get("height", 0))
-    except Exception as exc:  # pragma: no cover - best effort logging only
-        logger.debug("Impossible de déterminer la moitié droite de l'écran: %s", exc)
+    if monitor_idx < 1 or monitor_idx >= len(monitors):
+        monitor_idx = 1
+    if monitor_idx >= len(monitors):
         return None
+    mon = monitors[monitor_idx]
+    width = int(mon.get("width", 0))
+    height = int(mon.get("height", 0))
 
     if width <= 0 or height <= 0:
         return None
@@ -87,6 +155,42 @@ def compute_right_half_region(monitor_index: int = MONITOR_INDEX) -> ScreenRegio
     return (half_width, 0, width - half_width, height)
 
 
+def _template_paths(resources: Sequence[Dict[str, Any]]) -> List[str]:
+    paths = [
+        CONFIG.btn_jouer_path,
+        CONFIG.est_en_jeu_path,
+        CONFIG.ouvrir_hdv_path,
+        CONFIG.attente_hdv_path,
+        CONFIG.qte_x1_path,
+        CONFIG.qte_x10_path,
+        CONFIG.qte_x100_path,
+        CONFIG.qte_x1000_path,
+        CONFIG.recherche_path,
+        CONFIG.kamas_path,
+        CONFIG.onglet_achat_path,
+        CONFIG.onglet_vente_path,
+        CONFIG.confirmer_achat_path,
+        *CONFIG.sel_vente_paths.values(),
+        *CONFIG.vente_paths.values(),
+    ]
+    out = [str(p) for p in paths if p]
+    out.extend(str(res["template_path"]) for res in resources or [] if res.get("template_path"))
+    return out
+
+
+def preload_templates(resources: Sequence[Dict[str, Any]]) -> None:
+    """Decode every template used by the workflow once, before the first tick."""
+
+    try:
+        from utils.vision import preload_templates as _preload
+    except Exception as exc:  # pragma: no cover - vision stack unavailable
+        logger.debug("Préchargement des templates ignoré: %s", exc)
+        return
+    paths = _template_paths(resources)
+    loaded = _preload(paths)
+    logger.debug("Templates préchargés: %d/%d", loaded, len(paths))
+
+
 def create_context(
     resources: Sequence[Dict[str, Any]],
     fortune_lines: Optional[Sequence[Dict[str, Any]]] = None,
@@ -95,8 +199,10 @@ def create_context(
     """Create and initialise the FSM context for the marketplace workflow."""
 
     lines = fortune_lines or []
+    preload_templates(resources)
     return MarketplaceContext(
         resources=resources,
+        resources_len=len(resources),
         fortune_lines=lines,
         fortune_lookup=_build_fortune_lookup(lines),
         resource_index=0,
@@ -104,9 +210,8 @@ def create_context(
         template_path="",
         pending_purchase=None,
         reset_scan=True,
-        targets=[],
-        scanned={},
-        attempts={},
+        scanned=None,
+        attempts=None,
         completed_purchases=[],
         current_sale=None,
         current_kamas=None,
@@ -119,6 +224,9 @@ __all__ = [
     "MarketplaceContext",
     "_build_fortune_lookup",
     "get_fortune_line",
+    "set_current_kamas",
+    "state_region",
     "compute_right_half_region",
+    "preload_templates",
     "create_context",
 ]
@@ -2,106 +2,89 @@
 from __future__ import annotations
 
 import time
-from typing import Optional, TYPE_CHECKING
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
 
 from utils.fsm import StateDef
+from utils.lazy import LazyModule
 from utils.logger import get_logger
 
 from .config import (
     CLIC_ACHAT_OFFSET_PX,
     CONFIRMER_ACHAT_PATH,
+    DEBUG,
     KAMAS_CHECK_MAX_ATTEMPTS,
     KAMAS_PATH,
+    PREFILTER_K,
     PURCHASE_MAX_RETRIES,
+    PYRAMID_LEVELS,
     QTE_X1000_PATH,
     QTE_X100_PATH,
     QTE_X10_PATH,
     QTE_X1_PATH,
     SCAN_MAX_ATTEMPTS_PER_QTY,
 )
-from .context import get_fortune_line
+from .context import get_fortune_line, set_current_kamas
 from .telemetry import (
+    _enqueue_state,
     _send_kamas,
     _send_price,
     _send_purchase_event,
-    _send_state,
 )
 
-if TYPE_CHECKING:  # pragma: no cover - imported for type checking only
-    from typing import Callable, Tuple
-
-    from utils.keyboard import hotkey as HotkeyFn, press_key as PressKeyFn, type_text as TypeTextFn
-    from utils.mouse import move_click as MoveClickFn
-    from utils.ocr import ocr_read_int as OcrReadIntFn
-    from utils.vision import (
-        find_template_on_screen as FindTemplateFn,
-        find_template_on_screen_alpha as FindTemplateAlphaFn,
-    )
-
 logger = get_logger(__name__)
 
-_hotkey = None
-_press_key = None
-_type_text = None
-_move_click_impl = None
-_find_template_impl = None
-_find_template_alpha_impl = None
-_ocr_reader = None
-
-
-def _ensure_keyboard():
-    global _hotkey, _press_key, _type_text
-    if _hotkey is None or _press_key is None or _type_text is None:
-        from utils.keyboard import hotkey as hk, press_key as pk, type_text as tt
-
-        _hotkey, _press_key, _type_text = hk, pk, tt
-    return _hotkey, _press_key, _type_text
-
-
-def _ensure_mouse():
-    global _move_click_impl
-    if _move_click_impl is None:
-        from utils.mouse import move_click as mc
-
-        _move_click_impl = mc
-    return _move_click_impl
-
+_QTY_KEYS = ("x1", "x10", "x100", "x1000")
+_QTY_IDX = {qty: i for i, qty in enumerate(_QTY_KEYS)}
+_QTY_VALUES = {qty: int(qty[1:]) for qty in _QTY_KEYS}
+_QTY_TPL_S = (
+    str(QTE_X1_PATH),
+    str(QTE_X10_PATH),
+    str(QTE_X100_PATH),
+    str(QTE_X1000_PATH),
+)
+_KAMAS_TPL_S = str(KAMAS_PATH)
+_CONFIRMER_ACHAT_TPL_S = str(CONFIRMER_ACHAT_PATH) if CONFIRMER_ACHAT_PATH else ""
+_SCAN_UNSCANNED = -2
+_SCAN_SKIPPED = -1
 
-def _ensure_vision():
-    global _find_template_impl, _find_template_alpha_impl
-    if _find_template_impl is None or _find_template_alpha_impl is None:
-        from utils.vision import find_template_on_screen, find_template_on_screen_alpha
+# Imported on first use: importing this module must not pull OpenCV/mss/interception.
+_keyboard = LazyModule("utils.keyboard")
+_mouse = LazyModule("utils.mouse")
+_ocr = LazyModule("utils.ocr")
+_screen = LazyModule("utils.screen")
+_vision = LazyModule("utils.vision")
 
-        _find_template_impl = find_template_on_screen
-        _find_template_alpha_impl = find_template_on_screen_alpha
-    return _find_template_impl, _find_template_alpha_impl
 
+def _ocr_zone(res, dx: int = 150, w: int = 245):
+    """Return the OCR rectangle located ``dx`` pixels right of a template match.
 
-def _ensure_ocr():
-    global _ocr_reader
-    if _ocr_reader is None:
-        from utils.ocr import ocr_read_int as reader
+    ``MatchResult`` coordinates are already Python ints, no coercion needed.
+    The tuple is built only after a hit and is immutable, so ``pending_purchase``
+    keeps it as-is instead of copying a scratch buffer.
+    """
 
-        _ocr_reader = reader
-    return _ocr_reader
+    return (res.left + dx, res.top, w, res.height)
 
 
 def _try_read_kamas_amount() -> Optional[int]:
     """Attempt to read the kamas fortune from the screen."""
 
-    find_template_on_screen, _ = _ensure_vision()
-    res = find_template_on_screen(
-        template_path=str(KAMAS_PATH),
-        debug=True,
-    )
+    frame, _ = _screen.grab_region(1, None)
+    res = _vision.find_templates_on_screen(
+        [_KAMAS_TPL_S],
+        prefilter_k=PREFILTER_K,
+        debug=DEBUG,
+        frame=frame,
+    )[_KAMAS_TPL_S]
 
     if not res:
         return None
 
-    ocrzone = (res.left - 250, res.top, 245, res.height)
-    ocrzone = tuple(int(v) for v in ocrzone)
-    ocr_read_int = _ensure_ocr()
-    val = ocr_read_int(ocrzone, debug=True)
+    ocrzone = _ocr_zone(res, dx=-250)
+    val = _ocr.ocr_read_int_in_frame(frame, ocrzone, debug=DEBUG)
 
     if val is None:
         return None
@@ -116,6 +99,10 @@ def _try_read_kamas_amount() -> Optional[int]:
 def _parse_quantity_label(qty: str) -> int:
     """Convert quantity labels such as 'x10' into integers."""
 
+    try:
+        return _QTY_VALUES[qty]
+    except (KeyError, TypeError):
+        pass
     if not qty:
         return 0
     qty = str(qty).strip().lower()
@@ -163,214 +150,307 @@ def _compute_purchase_threshold(fortune_line):
     return int(threshold)
 
 
+# Codes renvoyés par _purchase_decision (les logs restent au site d'appel).
+_BUY = 0
+_NO_THRESHOLD = 1
+_ABOVE_THRESHOLD = 2
+_KAMAS_UNKNOWN = 3
+_ABOVE_FORTUNE_SHARE = 4
+
+
+def _as_int(value) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _purchase_decision(
+    price: int, target_price: Optional[int], max_price: Optional[int]
+) -> int:
+    """Decide whether a scanned lot is bought; returns one of the ``_BUY``... codes.
+
+    ``max_price`` is the context's ``max_purchase_price`` (None = fortune unknown).
+    """
+
+    if target_price is None:
+        return _NO_THRESHOLD
+    if price > target_price:
+        return _ABOVE_THRESHOLD
+    if max_price is None:
+        return _KAMAS_UNKNOWN
+    if price > max_price:
+        return _ABOVE_FORTUNE_SHARE
+    return _BUY
+
+
+def _log_purchase_skip(reason, slug, qty, price_val, target_price, max_price, fortune_line) -> None:
+    if reason == _NO_THRESHOLD:
+        logger.info(
+            "Seuil d'achat introuvable pour %s (%s), marge=%s",
+            slug,
+            qty,
+            fortune_line.get("margin_type"),
+        )
+    elif reason == _ABOVE_THRESHOLD:
+        logger.debug(
+            "Prix %d supérieur au seuil %d pour %s (%s), achat ignoré",
+            price_val,
+            target_price,
+            slug,
+            qty,
+        )
+    elif reason == _KAMAS_UNKNOWN:
+        logger.info(
+            "Fortune en kamas inconnue, achat ignoré pour %s (%s)",
+            slug,
+            qty,
+        )
+    elif reason == _ABOVE_FORTUNE_SHARE:
+        logger.info(
+            "Prix %d supérieur à 10%% de la fortune (%d) pour %s (%s), achat ignoré",
+            price_val,
+            max_price,
+            slug,
+            qty,
+        )
+
+
+# Délai laissé à l'interface après un clic (fenêtre de confirmation, débit kamas).
+_UI_SETTLE_S = 1.0
+_KAMAS_RETRY_BASE_S = 0.2
+_KAMAS_RETRY_MAX_S = 1.6
+
+
+def _wait(fsm, delay: float = _UI_SETTLE_S) -> None:
+    """Make the next ticks of the current state no-ops for ``delay`` seconds."""
+
+    fsm.ctx.wait_until = time.monotonic() + delay
+
+
+def _should_wait(fsm) -> bool:
+    return time.monotonic() < fsm.ctx.wait_until
+
+
+_NO_TARGET = -1
+
+
+def _precompute_thresholds(ctx, slug: str):
+    """Return the fortune lines and purchase thresholds of ``slug``, per quantity."""
+
+    lines = [get_fortune_line(ctx, slug, qty) for qty in _QTY_KEYS]
+    thresholds = np.full(len(_QTY_KEYS), _NO_TARGET, np.int64)
+    for i, line in enumerate(lines):
+        if line:
+            target = _compute_purchase_threshold(line)
+            if target is not None:
+                thresholds[i] = target
+    return lines, thresholds
+
+
 def on_enter_entrer_ressource(fsm):
-    _send_state("ENTRER_RESSOURCE")
+    _enqueue_state("ENTRER_RESSOURCE")
     current = fsm.ctx.resources[fsm.ctx.resource_index]
-    fsm.ctx.slug = current.get("slug", "")
-    fsm.ctx.template_path = current.get("template_path", "")
+    # Jamais None : les ticks lisent ces champs sans garde.
+    fsm.ctx.slug = current.get("slug") or ""
+    fsm.ctx.template_path = current.get("template_path") or ""
     fsm.ctx.reset_scan = True
     fsm.ctx.pending_purchase = None
     fsm.ctx.completed_purchases = []
     fsm.ctx.current_sale = None
     fsm.ctx.skip_recherche_click = False
-    _, _, type_text = _ensure_keyboard()
-    type_text(fsm.ctx.slug or " ")
+    _keyboard.type_text(fsm.ctx.slug or " ")
     return "SELECTION_RESSOURCE"
 
 
 def on_enter_selection_ressource(fsm):
-    _send_state("SELECTION_RESSOURCE")
+    _enqueue_state("SELECTION_RESSOURCE")
+    fsm.ctx.selection_seen = False
 
 
 def on_tick_selection_ressource(fsm):
-    template_path = getattr(getattr(fsm, "ctx", None), "template_path", "") or ""
+    template_path = fsm.ctx.template_path
     if not template_path:
-        _send_state("ERREUR_TEMPLATE_MANQUANT")
+        _enqueue_state("ERREUR_TEMPLATE_MANQUANT")
         return "END"
+    if _should_wait(fsm):
+        return None
 
-    _, find_template_on_screen_alpha = _ensure_vision()
-    res = find_template_on_screen_alpha(
+    res = _vision.find_template_on_screen_alpha(
         template_path=template_path,
         scales=(0.58, 1.3, 1.1),
         threshold=0.67,
-        debug=True,
+        debug=DEBUG,
         use_color=True,
+        pyramid_levels=PYRAMID_LEVELS,
     )
     if res:
-        time.sleep(1)
-        move_click = _ensure_mouse()
-        move_click(res.center[0], res.center[1])
+        if not fsm.ctx.selection_seen:
+            # Laisser la liste se stabiliser, puis recliquer sur une détection fraîche.
+            fsm.ctx.selection_seen = True
+            _wait(fsm)
+            return None
+        _mouse.move_click(res.center[0], res.center[1])
         return "SCAN_PRIX"
 
 
 def on_enter_scan_prix(fsm):
-    _send_state("SCAN_PRIX")
-
-    reset_scan = getattr(fsm.ctx, "reset_scan", True)
-
-    if reset_scan or not getattr(fsm.ctx, "targets", None):
-        fsm.ctx.targets = [
-            ("x1", str(QTE_X1_PATH)),
-            ("x10", str(QTE_X10_PATH)),
-            ("x100", str(QTE_X100_PATH)),
-            ("x1000", str(QTE_X1000_PATH)),
-        ]
-    if reset_scan or not getattr(fsm.ctx, "scanned", None):
-        fsm.ctx.scanned = {k: None for k, _ in fsm.ctx.targets}
-    if reset_scan or not getattr(fsm.ctx, "attempts", None):
-        fsm.ctx.attempts = {k: 0 for k, _ in fsm.ctx.targets}
+    _enqueue_state("SCAN_PRIX")
+
+    reset_scan = fsm.ctx.reset_scan
+
+    # Arrays allocated once per context, then refilled in place on reset.
+    if fsm.ctx.scanned is None:
+        # int64: x1000 lot prices can exceed the int32 range.
+        fsm.ctx.scanned = np.full(len(_QTY_KEYS), _SCAN_UNSCANNED, np.int64)
+    elif reset_scan:
+        fsm.ctx.scanned.fill(_SCAN_UNSCANNED)
+    if fsm.ctx.attempts is None:
+        fsm.ctx.attempts = np.zeros(len(_QTY_KEYS), np.int32)
+    elif reset_scan:
+        fsm.ctx.attempts.fill(0)
+
+    if reset_scan or fsm.ctx.qty_thresholds is None:
+        fsm.ctx.qty_fortune_lines, fsm.ctx.qty_thresholds = _precompute_thresholds(
+            fsm.ctx, fsm.ctx.slug
+        )
 
     fsm.ctx.reset_scan = False
     fsm.ctx.pending_purchase = None
 
 
+def _register_scan_failure(fsm, idx: int) -> None:
+    """Count a failed scan attempt and skip the quantity once exhausted."""
+
+    fsm.ctx.attempts[idx] += 1
+    if fsm.ctx.attempts[idx] >= SCAN_MAX_ATTEMPTS_PER_QTY:
+        fsm.ctx.scanned[idx] = _SCAN_SKIPPED
+
+
+# Tesseract relâche le GIL : les OCR des prix d'une même capture tournent en
+# parallèle (OMP_THREAD_LIMIT=1 par appel, voir utils.ocr).
+_OCR_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ocr-prix")
+
+
+def _submit_price_reads(frame, matches):
+    """Start the price OCR of every ``(index, match)`` hit on ``frame``.
+
+    Returns ``{index: (ocrzone, price or Future)}``; a lone hit is read inline.
+    """
+
+    zones = [(i, _ocr_zone(res)) for i, res in matches if res]
+    read = _ocr.ocr_read_int_in_frame
+    if len(zones) == 1:
+        i, zone = zones[0]
+        return {i: (zone, read(frame, zone, debug=DEBUG))}
+    return {i: (zone, _OCR_POOL.submit(read, frame, zone, debug=DEBUG)) for i, zone in zones}
+
+
 def on_tick_scan_prix(fsm):
-    slug = getattr(getattr(fsm, "ctx", None), "slug", "") or ""
-    find_template_on_screen, _ = _ensure_vision()
-    ocr_read_int = _ensure_ocr()
+    slug = fsm.ctx.slug
+
+    scanned = fsm.ctx.scanned
+    pending = [i for i in range(len(_QTY_KEYS)) if scanned[i] == _SCAN_UNSCANNED]
+    # Un seul grab pour toutes les quantités restantes, templates et OCR.
+    frame = _screen.grab_region(1, None)[0] if pending else None
+    hits = (
+        _vision.find_templates_on_screen(
+            [_QTY_TPL_S[i] for i in pending], debug=DEBUG, frame=frame
+        )
+        if pending
+        else {}
+    )
+    # Toutes les quantités restantes sont traitées sur la même capture : on ne
+    # quitte l'état que pour un achat ou quand tout est résolu. Un échec compte
+    # une tentative pour sa quantité et passe à la suivante.
+    reads = _submit_price_reads(frame, [(i, hits.get(_QTY_TPL_S[i])) for i in pending])
+    for i in pending:
+        qty = _QTY_KEYS[i]
+
+        read = reads.get(i)
+        if read is None:
+            _register_scan_failure(fsm, i)
+            continue
 
-    for qty, tpl in fsm.ctx.targets:
-        if fsm.ctx.scanned.get(qty) is not None:
+        ocrzone, price = read
+        price_val = _as_int(price.result() if isinstance(price, Future) else price)
+        if price_val is None:
+            _register_scan_failure(fsm, i)
             continue
 
-        res = find_template_on_screen(template_path=tpl, debug=True)
-
-        if not res:
-            fsm.ctx.attempts[qty] += 1
-            if fsm.ctx.attempts[qty] >= SCAN_MAX_ATTEMPTS_PER_QTY:
-                fsm.ctx.scanned[qty] = -1
-            break
-
-        ocrzone = (res.left + 150, res.top, 245, res.height)
-        ocrzone = tuple(int(v) for v in ocrzone)
-        val = ocr_read_int(ocrzone, debug=True)
-
-        if val is not None:
-            try:
-                price_val = int(val)
-            except (TypeError, ValueError):
-                price_val = None
-            if price_val is not None:
-                _send_price(slug=slug, qty=qty, price=price_val)
-                fortune_line = get_fortune_line(fsm.ctx, slug, qty)
-                should_purchase = False
-                target_price = None
-                if fortune_line:
-                    target_price = _compute_purchase_threshold(fortune_line)
-                    if target_price is None:
-                        logger.info(
-                            "Seuil d'achat introuvable pour %s (%s), marge=%s",
-                            slug,
-                            qty,
-                            fortune_line.get("margin_type"),
-                        )
-                    elif price_val > target_price:
-                        logger.debug(
-                            "Prix %d supérieur au seuil %d pour %s (%s), achat ignoré",
-                            price_val,
-                            target_price,
-                            slug,
-                            qty,
-                        )
-                    else:
-                        current_kamas = getattr(getattr(fsm, "ctx", None), "current_kamas", None)
-                        kamas_value = None
-                        if current_kamas is not None:
-                            try:
-                                kamas_value = int(current_kamas)
-                            except (TypeError, ValueError):
-                                kamas_value = None
-                        if kamas_value is None:
-                            logger.info(
-                                "Fortune en kamas inconnue, achat ignoré pour %s (%s)",
-                                slug,
-                                qty,
-                            )
-                        else:
-                            max_allowed_price = max(0, int(kamas_value * 0.10))
-                            if price_val > max_allowed_price:
-                                logger.info(
-                                    "Prix %d supérieur à 10%% de la fortune (%d) pour %s (%s), achat ignoré",
-                                    price_val,
-                                    max_allowed_price,
-                                    slug,
-                                    qty,
-                                )
-                            else:
-                                should_purchase = True
-                if should_purchase:
-                    fsm.ctx.pending_purchase = {
-                        "slug": slug,
-                        "qty": qty,
-                        "price": price_val,
-                        "ocrzone": ocrzone,
-                        "fortune_line": fortune_line,
-                        "click_done": False,
-                        "retry_count": 0,
-                    }
-                    logger.info(
-                        "Fortune active pour %s (%s), déclenchement de l'achat (prix=%d, seuil=%s)",
-                        slug,
-                        qty,
-                        price_val,
-                        target_price,
-                    )
-                    return "CLIC_ACHAT"
-                fsm.ctx.scanned[qty] = price_val
-            else:
-                fsm.ctx.attempts[qty] += 1
-                if fsm.ctx.attempts[qty] >= SCAN_MAX_ATTEMPTS_PER_QTY:
-                    fsm.ctx.scanned[qty] = -1
-        else:
-            fsm.ctx.attempts[qty] += 1
-            if fsm.ctx.attempts[qty] >= SCAN_MAX_ATTEMPTS_PER_QTY:
-                fsm.ctx.scanned[qty] = -1
-        break
-
-    if all(v is not None for v in fsm.ctx.scanned.values()):
-        if getattr(fsm.ctx, "current_sale", None) is None and getattr(
-            fsm.ctx, "completed_purchases", []
-        ):
+        _send_price(slug=slug, qty=qty, price=price_val)
+        fortune_line = fsm.ctx.qty_fortune_lines[i]
+        if fortune_line:
+            target = int(fsm.ctx.qty_thresholds[i])
+            target_price = None if target == _NO_TARGET else target
+            max_price = fsm.ctx.max_purchase_price
+            reason = _purchase_decision(price_val, target_price, max_price)
+            _log_purchase_skip(
+                reason, slug, qty, price_val, target_price, max_price, fortune_line
+            )
+            if reason == _BUY:
+                fsm.ctx.pending_purchase = {
+                    "slug": slug,
+                    "qty": qty,
+                    "price": price_val,
+                    "ocrzone": ocrzone,
+                    "fortune_line": fortune_line,
+                    "click_done": False,
+                    "retry_count": 0,
+                }
+                logger.info(
+                    "Fortune active pour %s (%s), déclenchement de l'achat (prix=%d, seuil=%s)",
+                    slug,
+                    qty,
+                    price_val,
+                    target_price,
+                )
+                return "CLIC_ACHAT"
+        scanned[i] = price_val
+
+    if (scanned != _SCAN_UNSCANNED).all():
+        if fsm.ctx.current_sale is None and fsm.ctx.completed_purchases:
             fsm.ctx.current_sale = fsm.ctx.completed_purchases.pop(0)
             return "VENTE_ONGLET"
-        if getattr(fsm.ctx, "current_sale", None) is not None:
+        if fsm.ctx.current_sale is not None:
             return "VENTE_ONGLET"
         return "CLIC_RECHERCHE"
 
 
 def on_enter_clic_achat(fsm):
-    _send_state("CLIC_ACHAT")
+    _enqueue_state("CLIC_ACHAT")
 
 
 def on_tick_clic_achat(fsm):
-    pending = getattr(fsm.ctx, "pending_purchase", None)
+    pending = fsm.ctx.pending_purchase
     if not pending:
         logger.warning("CLIC_ACHAT sans achat en attente, retour au scan")
         return "SCAN_PRIX"
-
-    move_click = _ensure_mouse()
+    if _should_wait(fsm):
+        return None
 
     if not pending.get("click_done"):
         left, top, width, height = pending.get("ocrzone", (0, 0, 0, 0))
         click_x = int(left + width + CLIC_ACHAT_OFFSET_PX)
         click_y = int(top + height / 2)
         logger.debug("CLIC_ACHAT: clic sur Acheter en (%d, %d)", click_x, click_y)
-        pending["attempt_start_kamas"] = getattr(fsm.ctx, "current_kamas", None)
-        move_click(click_x, click_y)
+        pending["attempt_start_kamas"] = fsm.ctx.current_kamas
+        _mouse.move_click(click_x, click_y)
         pending["click_done"] = True
-        time.sleep(1)
+        _wait(fsm)
         return
 
-    if not CONFIRMER_ACHAT_PATH:
+    if not _CONFIRMER_ACHAT_TPL_S:
         logger.warning("Template confirmer_achat indisponible, validation ignorée")
-        fsm.ctx.scanned[pending["qty"]] = pending["price"]
+        fsm.ctx.scanned[_QTY_IDX[pending["qty"]]] = pending["price"]
         fsm.ctx.pending_purchase = None
         return "SCAN_PRIX"
 
-    find_template_on_screen, _ = _ensure_vision()
-    res = find_template_on_screen(
-        template_path=str(CONFIRMER_ACHAT_PATH),
-        debug=True,
+    res = _vision.find_template_on_screen(
+        template_path=_CONFIRMER_ACHAT_TPL_S,
+        debug=DEBUG,
     )
 
     if res:
@@ -379,26 +459,30 @@ def on_tick_clic_achat(fsm):
             res.center[0],
             res.center[1],
         )
-        move_click(res.center[0], res.center[1])
-        time.sleep(1)
+        _mouse.move_click(res.center[0], res.center[1])
+        _wait(fsm)
         pending["kamas_check_attempts"] = 0
         return "VERIFIER_ACHAT"
 
 
 def on_enter_verifier_achat(fsm):
-    _send_state("VERIFIER_ACHAT")
+    _enqueue_state("VERIFIER_ACHAT")
 
 
 def on_tick_verifier_achat(fsm):
-    pending = getattr(fsm.ctx, "pending_purchase", None)
+    pending = fsm.ctx.pending_purchase
     if not pending:
         logger.warning("VERIFIER_ACHAT sans achat en attente, retour au scan")
         return "SCAN_PRIX"
+    if _should_wait(fsm):
+        return None
 
     kamas_value = _try_read_kamas_amount()
     if kamas_value is None:
         attempts = int(pending.get("kamas_check_attempts", 0)) + 1
         pending["kamas_check_attempts"] = attempts
+        # Backoff 0.2, 0.4, 0.8 s... entre deux lectures ratées.
+        _wait(fsm, min(_KAMAS_RETRY_BASE_S * (1 << (attempts - 1)), _KAMAS_RETRY_MAX_S))
         if attempts >= KAMAS_CHECK_MAX_ATTEMPTS:
             logger.warning(
                 "Impossible de lire la fortune après achat pour %s (%s) (tentative %d)",
@@ -411,7 +495,7 @@ def on_tick_verifier_achat(fsm):
 
     previous_kamas = pending.get("attempt_start_kamas")
     if previous_kamas is None:
-        previous_kamas = getattr(fsm.ctx, "current_kamas", None)
+        previous_kamas = fsm.ctx.current_kamas
     try:
         previous_kamas = int(previous_kamas) if previous_kamas is not None else None
     except (TypeError, ValueError):
@@ -432,12 +516,12 @@ def on_tick_verifier_achat(fsm):
                 pending.get("slug"),
                 pending.get("qty"),
             )
-            fsm.ctx.scanned[pending["qty"]] = pending.get("price")
+            fsm.ctx.scanned[_QTY_IDX[pending["qty"]]] = pending["price"]
             fsm.ctx.pending_purchase = None
             return "SCAN_PRIX"
         pending["click_done"] = False
         pending["kamas_check_attempts"] = 0
-        time.sleep(1)
+        _wait(fsm)
         return "CLIC_ACHAT"
 
     slug = pending.get("slug", "")
@@ -462,7 +546,7 @@ def on_tick_verifier_achat(fsm):
         kamas_value,
     )
 
-    fsm.ctx.current_kamas = kamas_value
+    set_current_kamas(fsm.ctx, kamas_value)
     _send_kamas(kamas_value)
     _send_purchase_event(
         resource=slug,
@@ -472,7 +556,7 @@ def on_tick_verifier_achat(fsm):
         total_amount=total_amount,
     )
 
-    sale_queue = getattr(fsm.ctx, "completed_purchases", None)
+    sale_queue = fsm.ctx.completed_purchases
     if isinstance(sale_queue, list):
         sale_queue.append(
             {
@@ -480,11 +564,11 @@ def on_tick_verifier_achat(fsm):
                 "qty": qty_label,
                 "price": total_amount,
                 "fortune_line": pending.get("fortune_line", {}),
-                "template_path": getattr(fsm.ctx, "template_path", ""),
+                "template_path": fsm.ctx.template_path,
             }
         )
 
-    fsm.ctx.scanned[pending["qty"]] = pending.get("price")
+    fsm.ctx.scanned[_QTY_IDX[pending["qty"]]] = pending["price"]
     fsm.ctx.pending_purchase = None
     return "SCAN_PRIX"
 
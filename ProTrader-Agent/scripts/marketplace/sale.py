@@ -1,15 +1,21 @@
 """Sale-related FSM states for the marketplace workflow."""
 from __future__ import annotations
 
+import math
 import time
-from typing import Dict, Optional, Tuple, TYPE_CHECKING
+from typing import Dict, Optional, Tuple
 
 from utils.fsm import StateDef
+from utils.lazy import LazyModule
 from utils.logger import get_logger
 
 from .config import (
+    DEBUG,
     ONGLET_ACHAT_PATH,
     ONGLET_VENTE_PATH,
+    PREFILTER_K,
+    PYRAMID_LEVELS,
+    RIGHT_HALF_ROI,
     SALE_QTY_ORDER,
     SEL_VENTE_PATHS,
     VENTE_CLICK_MAX_ATTEMPTS,
@@ -17,132 +23,158 @@ from .config import (
     VENTE_FALLBACK_REGION_RATIO,
     VENTE_PATHS,
 )
-from .purchase import _parse_quantity_label
-from .telemetry import _send_sale_event, _send_state
+from .context import state_region
+from .purchase import _parse_quantity_label, _should_wait, _wait
+from .telemetry import _enqueue_state, _send_sale_event
 
 logger = get_logger(__name__)
 
-if TYPE_CHECKING:  # pragma: no cover - imported for type checking only
-    from typing import Callable
+# Chemins des templates de quantité et ordres de recherche, fixés par la config.
+_SEL_TPL_S = {q: str(p) for q, p in SEL_VENTE_PATHS.items() if p}
+_VENTE_TPL_S = {q: str(p) for q, p in VENTE_PATHS.items() if p}
+_SEL_ORDER = tuple(q for q in SALE_QTY_ORDER if q in _SEL_TPL_S)
+_VENTE_ORDER = tuple(q for q in SALE_QTY_ORDER if q in _VENTE_TPL_S)
+# Quantité préférée d'abord, puis les autres dans l'ordre de SALE_QTY_ORDER.
+_VENTE_ORDER_FROM = {
+    p: (p,) + tuple(q for q in _VENTE_ORDER if q != p) for p in _VENTE_TPL_S
+}
 
-    from utils.keyboard import hotkey as HotkeyFn, press_key as PressKeyFn, type_text as TypeTextFn
-    from utils.mouse import move_click as MoveClickFn
-    from utils.vision import (
-        find_template_on_screen as FindTemplateFn,
-        find_template_on_screen_alpha as FindTemplateAlphaFn,
-    )
+# Importés au premier usage : importer ce module ne charge ni OpenCV ni mss/interception.
+_keyboard = LazyModule("utils.keyboard")
+_mouse = LazyModule("utils.mouse")
+_vision = LazyModule("utils.vision")
 
-_hotkey = None
-_press_key = None
-_type_text = None
-_move_click_impl = None
-_find_template_impl = None
-_find_template_alpha_impl = None
 
+def _first_match(paths: Dict[str, str], candidates, region=None):
+    """Search every candidate template on one grab; return the first hit in order.
 
-def _ensure_keyboard():
-    global _hotkey, _press_key, _type_text
-    if _hotkey is None or _press_key is None or _type_text is None:
-        from utils.keyboard import hotkey as hk, press_key as pk, type_text as tt
+    ``paths`` maps each candidate to its template path (``_SEL_TPL_S``...).
+    Returns ``(candidate, match)`` or ``(None, None)``.
+    """
 
-        _hotkey, _press_key, _type_text = hk, pk, tt
-    return _hotkey, _press_key, _type_text
+    if not candidates:
+        return None, None
+    hits = _vision.find_templates_on_screen(
+        [paths[q] for q in candidates], region=region, debug=DEBUG
+    )
+    for candidate in candidates:
+        res = hits.get(paths[candidate])
+        if res:
+            return candidate, res
+    return None, None
 
 
-def _ensure_mouse():
-    global _move_click_impl
-    if _move_click_impl is None:
-        from utils.mouse import move_click as mc
+def _first_sighting(fsm, delay: float = 1.0) -> bool:
+    """On the first detection of the state's target, wait ``delay`` and say so.
 
-        _move_click_impl = mc
-    return _move_click_impl
+    The target is clicked on a fresh detection once the UI has settled.
+    """
 
+    if fsm.ctx.selection_seen:
+        return False
+    fsm.ctx.selection_seen = True
+    _wait(fsm, delay)
+    return True
 
-def _ensure_vision():
-    global _find_template_impl, _find_template_alpha_impl
-    if _find_template_impl is None or _find_template_alpha_impl is None:
-        from utils.vision import find_template_on_screen, find_template_on_screen_alpha
 
-        _find_template_impl = find_template_on_screen
-        _find_template_alpha_impl = find_template_on_screen_alpha
-    return _find_template_impl, _find_template_alpha_impl
+def _coerce_price(value) -> Optional[int]:
+    """Round ``value`` to a whole price; ``None`` if missing or not a finite number.
+
+    Numbers (the usual case) skip the try/except; strings still go through float().
+    """
+
+    if not isinstance(value, (int, float)):
+        if value is None:
+            return None
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+    return int(round(value)) if math.isfinite(value) else None
 
 
 def _fill_price(price_text: str) -> None:
     """Fill the price input and validate with the Enter key."""
 
-    hotkey, press_key, type_text = _ensure_keyboard()
-
-    hotkey(["ctrl", "a"])
-    type_text(price_text)
+    _keyboard.hotkey(["ctrl", "a"])
+    _keyboard.type_text(price_text)
     time.sleep(0.15)
-    press_key("enter")
+    _keyboard.press_key("enter")
 
 
 def on_enter_vente_onglet(fsm):
-    _send_state("VENTE_ONGLET")
+    _enqueue_state("VENTE_ONGLET")
+    fsm.ctx.selection_seen = False
 
 
 def on_tick_vente_onglet(fsm):
-    sale = getattr(fsm.ctx, "current_sale", None)
+    sale = fsm.ctx.current_sale
     if not sale:
         logger.warning("VENTE_ONGLET sans vente en cours, retour à la recherche")
         return "CLIC_RECHERCHE"
+    if _should_wait(fsm):
+        return None
 
-    find_template_on_screen, _ = _ensure_vision()
-    res = find_template_on_screen(
+    res = _vision.find_template_on_screen(
         template_path=str(ONGLET_VENTE_PATH),
-        debug=True,
+        region=state_region(fsm.ctx, "VENTE_ONGLET"),
+        prefilter_k=PREFILTER_K,
+        # Onglets larges et bien délimités : passe grossière à mi-résolution,
+        # affinée en pleine résolution autour des pics seulement.
+        pyramid_levels=PYRAMID_LEVELS,
+        debug=DEBUG,
     )
 
     if res:
-        time.sleep(1)
-        move_click = _ensure_mouse()
-        move_click(res.center[0], res.center[1])
-        time.sleep(1)
+        if _first_sighting(fsm):
+            return None
+        _mouse.move_click(res.center[0], res.center[1])
+        _wait(fsm, 1.0)
         return "VENTE_SELECTION_RESSOURCE"
 
 
 def on_enter_vente_selection_ressource(fsm):
-    _send_state("VENTE_SELECTION_RESSOURCE")
+    _enqueue_state("VENTE_SELECTION_RESSOURCE")
+    fsm.ctx.selection_seen = False
 
 
 def on_tick_vente_selection_ressource(fsm):
-    sale = getattr(fsm.ctx, "current_sale", None)
+    sale = fsm.ctx.current_sale
     if not sale:
         logger.warning(
             "VENTE_SELECTION_RESSOURCE sans vente en cours, retour à la recherche"
         )
         return "CLIC_RECHERCHE"
+    if _should_wait(fsm):
+        return None
 
-    template_path = sale.get("template_path") or getattr(fsm.ctx, "template_path", "")
+    template_path = sale.get("template_path") or fsm.ctx.template_path
     if not template_path:
         logger.warning("Template ressource manquant pour la vente, on annule")
         fsm.ctx.current_sale = None
         return "CLIC_RECHERCHE"
 
-    region = getattr(fsm.ctx, "right_half_region", None)
-    _, find_template_on_screen_alpha = _ensure_vision()
-    res = find_template_on_screen_alpha(
+    region = state_region(fsm.ctx, "VENTE_SELECTION_RESSOURCE", RIGHT_HALF_ROI)
+    res = _vision.find_template_on_screen_alpha(
         template_path=template_path,
         scales=(0.58, 1.3, 1.1),
         threshold=0.67,
         use_color=True,
         region=region,
-        debug=True,
+        debug=DEBUG,
     )
 
     if res:
-        time.sleep(1)
-        move_click = _ensure_mouse()
-        move_click(res.center[0], res.center[1])
-        time.sleep(0.5)
+        if _first_sighting(fsm):
+            return None
+        _mouse.move_click(res.center[0], res.center[1])
+        _wait(fsm, 0.5)
         return "VENTE_SELECTION_QTE"
 
 
 def on_enter_vente_selection_qte(fsm):
-    _send_state("VENTE_SELECTION_QTE")
-    sale = getattr(fsm.ctx, "current_sale", None)
+    _enqueue_state("VENTE_SELECTION_QTE")
+    sale = fsm.ctx.current_sale
     if isinstance(sale, dict):
         sale["sel_attempts"] = 0
         sale["sel_use_alternatives"] = False
@@ -153,46 +185,43 @@ def on_enter_vente_selection_qte(fsm):
 
 
 def on_tick_vente_selection_qte(fsm):
-    sale = getattr(fsm.ctx, "current_sale", None)
+    sale = fsm.ctx.current_sale
     if not sale:
         logger.warning("VENTE_SELECTION_QTE sans vente en cours, retour à la recherche")
         return "CLIC_RECHERCHE"
+    if _should_wait(fsm):
+        return None
 
     use_alternatives = sale.get("sel_use_alternatives", False)
     qty = sale.get("qty")
-    find_template_on_screen, _ = _ensure_vision()
-    move_click = _ensure_mouse()
 
-    candidate_qtys = []
-    if not use_alternatives and qty in SEL_VENTE_PATHS:
-        candidate_qtys = [qty]
+    if not use_alternatives and qty in _SEL_TPL_S:
+        candidate_qtys = (qty,)
     else:
         sale["sel_use_alternatives"] = True
-        candidate_qtys = [q for q in SALE_QTY_ORDER if q in SEL_VENTE_PATHS]
+        candidate_qtys = _SEL_ORDER
 
-    for candidate in candidate_qtys:
-        path = SEL_VENTE_PATHS.get(candidate)
-        if not path:
-            continue
-        res = find_template_on_screen(template_path=str(path), debug=True)
-        if res:
-            sale["selected_sel_qty"] = candidate
-            sale["selected_sel_bbox"] = (
-                int(res.left),
-                int(res.top),
-                int(res.width),
-                int(res.height),
-            )
-            if candidate == qty:
-                time.sleep(1)
-                sale["selected_sale_qty"] = candidate
-                sale.pop("vente_fallback_click", None)
-                sale.pop("saisie_force_tab", None)
-                sale["vente_attempts"] = 0
-                return "VENTE_SAISIE"
-            move_click(res.center[0], res.center[1])
-            time.sleep(0.5)
-            return "VENTE_CLIQUER_VENTE"
+    candidate, res = _first_match(
+        _SEL_TPL_S, candidate_qtys, state_region(fsm.ctx, "VENTE_SELECTION_QTE")
+    )
+    if res:
+        sale["selected_sel_qty"] = candidate
+        sale["selected_sel_bbox"] = (
+            int(res.left),
+            int(res.top),
+            int(res.width),
+            int(res.height),
+        )
+        if candidate == qty:
+            _wait(fsm, 1.0)
+            sale["selected_sale_qty"] = candidate
+            sale.pop("vente_fallback_click", None)
+            sale.pop("saisie_force_tab", None)
+            sale["vente_attempts"] = 0
+            return "VENTE_SAISIE"
+        _mouse.move_click(res.center[0], res.center[1])
+        _wait(fsm, 0.5)
+        return "VENTE_CLIQUER_VENTE"
 
     if not use_alternatives:
         sale["sel_attempts"] = sale.get("sel_attempts", 0) + 1
@@ -201,8 +230,8 @@ def on_tick_vente_selection_qte(fsm):
 
 
 def on_enter_vente_cliquer_vente(fsm):
-    _send_state("VENTE_CLIQUER_VENTE")
-    sale = getattr(fsm.ctx, "current_sale", None)
+    _enqueue_state("VENTE_CLIQUER_VENTE")
+    sale = fsm.ctx.current_sale
     if isinstance(sale, dict):
         sale["vente_attempts"] = 0
         sale.pop("vente_fallback_click", None)
@@ -210,40 +239,26 @@ def on_enter_vente_cliquer_vente(fsm):
 
 
 def on_tick_vente_cliquer_vente(fsm):
-    sale = getattr(fsm.ctx, "current_sale", None)
+    sale = fsm.ctx.current_sale
     if not sale:
         logger.warning("VENTE_CLIQUER_VENTE sans vente en cours, retour à la recherche")
         return "CLIC_RECHERCHE"
+    if _should_wait(fsm):
+        return None
 
     preferred = sale.get("selected_sel_qty") or sale.get("qty")
-    candidate_qtys = []
-    if preferred in VENTE_PATHS:
-        candidate_qtys.append(preferred)
-    candidate_qtys.extend(
-        [q for q in SALE_QTY_ORDER if q in VENTE_PATHS and q not in candidate_qtys]
-    )
+    candidate_qtys = _VENTE_ORDER_FROM.get(preferred, _VENTE_ORDER)
 
-    region = getattr(fsm.ctx, "right_half_region", None)
-    find_template_on_screen, _ = _ensure_vision()
-    move_click = _ensure_mouse()
-
-    for candidate in candidate_qtys:
-        path = VENTE_PATHS.get(candidate)
-        if not path:
-            continue
-        res = find_template_on_screen(
-            template_path=str(path),
-            debug=True,
-            region=region,
-        )
-        if res:
-            move_click(res.center[0], res.center[1])
-            sale["selected_sale_qty"] = candidate
-            sale["vente_attempts"] = 0
-            sale.pop("vente_fallback_click", None)
-            sale.pop("saisie_force_tab", None)
-            time.sleep(0.5)
-            return "VENTE_SAISIE"
+    region = state_region(fsm.ctx, "VENTE_CLIQUER_VENTE", RIGHT_HALF_ROI)
+    candidate, res = _first_match(_VENTE_TPL_S, candidate_qtys, region)
+    if res:
+        _mouse.move_click(res.center[0], res.center[1])
+        sale["selected_sale_qty"] = candidate
+        sale["vente_attempts"] = 0
+        sale.pop("vente_fallback_click", None)
+        sale.pop("saisie_force_tab", None)
+        _wait(fsm, 0.5)
+        return "VENTE_SAISIE"
 
     sale["vente_attempts"] = sale.get("vente_attempts", 0) + 1
 
@@ -291,61 +306,51 @@ def on_tick_vente_cliquer_vente(fsm):
 
 
 def on_enter_vente_saisie(fsm):
-    _send_state("VENTE_SAISIE")
-    sale = getattr(fsm.ctx, "current_sale", None)
+    _enqueue_state("VENTE_SAISIE")
+    sale = fsm.ctx.current_sale
     if isinstance(sale, dict):
         sale["saisie_done"] = False
+        sale["saisie_step"] = 0
 
 
 def on_tick_vente_saisie(fsm):
-    sale = getattr(fsm.ctx, "current_sale", None)
+    sale = fsm.ctx.current_sale
     if not sale:
         logger.warning("VENTE_SAISIE sans vente en cours, retour à la recherche")
         return "CLIC_RECHERCHE"
 
     if sale.get("saisie_done"):
         return "VENTE_RETOUR_ACHAT"
+    if _should_wait(fsm):
+        return None
+
+    # Étapes : 0 = clic de secours, 1 = tab forcé, 2 = saisie du prix.
+    step = sale.get("saisie_step", 0)
+    if step == 0:
+        sale["saisie_step"] = 1
+        fallback_click = sale.pop("vente_fallback_click", None)
+        if fallback_click:
+            _mouse.move_click(int(fallback_click[0]), int(fallback_click[1]))
+            _wait(fsm, 0.4)
+            return None
+    if step <= 1:
+        sale["saisie_step"] = 2
+        delay = 1.0
+        if sale.pop("saisie_force_tab", False):
+            _keyboard.press_key("tab")
+            delay += 0.2
+        _wait(fsm, delay)
+        return None
 
-    move_click = _ensure_mouse()
-    _, press_key, _ = _ensure_keyboard()
-
-    fallback_click = sale.pop("vente_fallback_click", None)
-    if fallback_click:
-        move_click(int(fallback_click[0]), int(fallback_click[1]))
-        time.sleep(0.4)
-
-    if sale.pop("saisie_force_tab", False):
-        press_key("tab")
-        time.sleep(0.2)
-
-    time.sleep(1)
-
-    price_value = None
     fortune_line: Dict[str, object] = sale.get("fortune_line") or {}
-    median_value = fortune_line.get("median_price_7d")
-    if median_value is not None:
-        try:
-            price_value = int(round(float(median_value)))
-        except (TypeError, ValueError):
-            price_value = None
-
+    price_value = _coerce_price(fortune_line.get("median_price_7d"))
     if price_value is None:
-        fallback_price = sale.get("price")
-        if fallback_price is not None:
-            try:
-                price_value = int(round(float(fallback_price)))
-            except (TypeError, ValueError):
-                price_value = None
-
+        price_value = _coerce_price(sale.get("price"))
     if price_value is None:
         logger.warning("Impossible de déterminer le prix de vente, valeur 0 utilisée")
         price_value = 0
 
-    try:
-        total_amount = int(price_value)
-    except (TypeError, ValueError):
-        total_amount = 0
-    total_amount = max(0, total_amount)
+    total_amount = max(0, price_value)
     price_text = str(total_amount)
 
     _fill_price(price_text)
@@ -374,27 +379,32 @@ def on_tick_vente_saisie(fsm):
 
 
 def on_enter_vente_retour_achat(fsm):
-    _send_state("VENTE_RETOUR_ACHAT")
+    _enqueue_state("VENTE_RETOUR_ACHAT")
+    fsm.ctx.selection_seen = False
 
 
 def on_tick_vente_retour_achat(fsm):
-    sale = getattr(fsm.ctx, "current_sale", None)
-    if not sale and not getattr(fsm.ctx, "completed_purchases", []):
+    sale = fsm.ctx.current_sale
+    if not sale and not fsm.ctx.completed_purchases:
         return "CLIC_RECHERCHE"
+    if _should_wait(fsm):
+        return None
 
-    find_template_on_screen, _ = _ensure_vision()
-    res = find_template_on_screen(
+    res = _vision.find_template_on_screen(
         template_path=str(ONGLET_ACHAT_PATH),
-        debug=True,
+        region=state_region(fsm.ctx, "VENTE_RETOUR_ACHAT"),
+        prefilter_k=PREFILTER_K,
+        pyramid_levels=PYRAMID_LEVELS,
+        debug=DEBUG,
     )
 
     if res:
-        time.sleep(1)
-        move_click = _ensure_mouse()
-        move_click(res.center[0], res.center[1])
-        time.sleep(1)
+        if _first_sighting(fsm):
+            return None
+        _mouse.move_click(res.center[0], res.center[1])
+        _wait(fsm, 1.0)
         fsm.ctx.current_sale = None
-        if getattr(fsm.ctx, "completed_purchases", []):
+        if fsm.ctx.completed_purchases:
             fsm.ctx.current_sale = fsm.ctx.completed_purchases.pop(0)
             return "VENTE_ONGLET"
         fsm.ctx.skip_recherche_click = True
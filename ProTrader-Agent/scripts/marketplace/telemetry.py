@@ -1,13 +1,24 @@
-"""Telemetry helpers for the marketplace workflow."""
+"""Telemetry helpers for the marketplace workflow.
+
+Every helper is fire-and-forget from the FSM thread: ``bus.client`` (see
+:class:`server.agent_client.RealtimeClient`) only hands the frame to its
+asyncio loop thread, which serialises and writes it to the socket.
+"""
 from __future__ import annotations
 
+import atexit
+import json
+import threading
 import time
-from datetime import datetime, timezone
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
 
 import bus
 
 __all__ = [
     "_send_state",
+    "_enqueue_state",
+    "_flush_states",
     "_send_price",
     "_send_kamas",
     "_send_purchase_event",
@@ -15,15 +26,121 @@ __all__ = [
 ]
 
 
-def _send_state(name: str) -> None:
-    """Send the current FSM state to the backend bus if available."""
+# Encoded ``login_state`` frames, keyed by state name or by the tuple of states
+# of a batched burst (the same transitions repeat for every resource).
+_STATE_FRAMES: Dict[Any, str] = {}
+_STATE_FRAMES_MAX = 256
+_last_state: Optional[str] = None
+
+
+def _state_frame(name: str, history: Optional[List[str]] = None) -> str:
+    key = tuple(history) if history else name
+    frame = _STATE_FRAMES.get(key)
+    if frame is None:
+        msg: Dict[str, Any] = {"type": "login_state", "state": name}
+        if history:
+            msg["history"] = list(history)
+        frame = json.dumps(msg)
+        if len(_STATE_FRAMES) >= _STATE_FRAMES_MAX:
+            _STATE_FRAMES.clear()
+        _STATE_FRAMES[key] = frame
+    return frame
+
 
+def _send_state(name: str, history: Optional[List[str]] = None) -> None:
+    """Send the current FSM state to the backend bus if available.
+
+    Consecutive identical states are coalesced and the JSON frame for each
+    state name (or batched burst) is encoded only once. ``history`` lists the states traversed
+    since the previous frame when several were batched together.
+    """
+
+    global _last_state
+    if name == _last_state and not history:
+        return
     if bus.client:
-        bus.client.send({"type": "login_state", "state": name})
+        if bus.client.send_raw(_state_frame(name, history)):
+            _last_state = name
     else:
         print("ERREUR CLIENT")
 
 
+# États en attente d'envoi : les rafales de transitions (EN_JEU -> OUVRIR_HDV,
+# CLIC_RECHERCHE -> ENTRER_RESSOURCE...) partent en une seule trame.
+STATE_FLUSH_INTERVAL_S = 0.05
+_STATE_QUEUE: Deque[str] = deque(maxlen=64)
+_state_wake = threading.Event()
+_state_lock = threading.Lock()
+_state_flusher: Optional[threading.Thread] = None
+# Dernier état mis en file (donc en file, en cours d'envoi ou envoyé), protégé
+# par _state_lock : _last_state n'est à jour qu'après l'envoi, côté flusher.
+_last_queued: Optional[str] = None
+
+
+def _flush_states() -> None:
+    """Send the queued states as one ``login_state`` frame (latest state wins)."""
+
+    global _last_queued
+    with _state_lock:
+        pending = list(_STATE_QUEUE)
+        _STATE_QUEUE.clear()
+    if not pending:
+        return
+    _send_state(pending[-1], pending if len(pending) > 1 else None)
+    if _last_state != pending[-1]:
+        # Envoi échoué : le même état remis en file doit repartir
+        with _state_lock:
+            if not _STATE_QUEUE and _last_queued == pending[-1]:
+                _last_queued = _last_state
+
+
+def _state_flush_loop() -> None:
+    while True:
+        _state_wake.wait()
+        time.sleep(STATE_FLUSH_INTERVAL_S)
+        _state_wake.clear()
+        _flush_states()
+
+
+def _enqueue_state(name: str) -> None:
+    """Queue ``name`` for the background flusher instead of sending it inline.
+
+    A state equal to the last queued one (still queued, in flight or sent) is
+    dropped here without waking the flusher.
+    """
+
+    global _state_flusher, _last_queued
+    with _state_lock:
+        if name == _last_queued:
+            return
+        _STATE_QUEUE.append(name)
+        _last_queued = name
+        if _state_flusher is None:
+            _state_flusher = threading.Thread(
+                target=_state_flush_loop, name="StateTelemetry", daemon=True
+            )
+            _state_flusher.start()
+            atexit.register(_flush_states)
+    _state_wake.set()
+
+
+# ``send`` lié du client courant : bus.client est assigné au démarrage (après
+# l'import de ce module), la méthode n'est résolue qu'une fois par client.
+_send_owner: Any = None
+_send: Any = None
+
+
+def _emit(frame: Dict[str, Any]) -> None:
+    global _send_owner, _send
+    client = bus.client
+    if not client:
+        print("[WARN] bus.client indisponible, payload:", frame)
+        return
+    if client is not _send_owner:
+        _send_owner, _send = client, client.send
+    _send(frame)
+
+
 def _send_price(slug: str, qty: str, price: int) -> None:
     """Send a detected marketplace price through the bus."""
 
@@ -36,10 +153,7 @@ def _send_price(slug: str, qty: str, price: int) -> None:
             "price": int(price),
         },
     }
-    if bus.client:
-        bus.client.send(frame)
-    else:
-        print("[WARN] bus.client indisponible, payload:", frame)
+    _emit(frame)
 
 
 def _send_kamas(amount: int) -> None:
@@ -50,21 +164,27 @@ def _send_kamas(amount: int) -> None:
         "ts": int(time.time()),
         "data": {"amount": int(amount)},
     }
-    if bus.client:
-        bus.client.send(frame)
-    else:
-        print("[WARN] bus.client indisponible, payload:", frame)
+    _emit(frame)
+
+
+# (seconde epoch, date ISO 8601) de la dernière date formatée.
+_iso_cache = (0, "")
 
 
-def _current_iso_datetime() -> str:
-    """Return the current UTC datetime formatted using ISO 8601."""
+def _current_iso_datetime(now: Optional[int] = None) -> str:
+    """Return the UTC datetime of epoch second ``now`` (default: now) in ISO 8601.
 
-    return (
-        datetime.now(timezone.utc)
-        .replace(microsecond=0)
-        .isoformat()
-        .replace("+00:00", "Z")
-    )
+    The string is formatted once per second.
+    """
+
+    global _iso_cache
+    if now is None:
+        now = int(time.time())
+    cached = _iso_cache
+    if cached[0] != now:
+        cached = (now, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)))
+        _iso_cache = cached
+    return cached[1]
 
 
 def _send_purchase_event(
@@ -76,22 +196,20 @@ def _send_purchase_event(
 ) -> None:
     """Send the payload describing a confirmed purchase."""
 
+    now = int(time.time())
     frame = {
         "type": "purchase_event",
-        "ts": int(time.time()),
+        "ts": now,
         "data": {
             "resource": resource,
             "quantity_label": quantity_label,
             "quantity": quantity_value,
             "price": float(unit_price),
             "amount": int(total_amount),
-            "date": _current_iso_datetime(),
+            "date": _current_iso_datetime(now),
         },
     }
-    if bus.client:
-        bus.client.send(frame)
-    else:
-        print("[WARN] bus.client indisponible, payload:", frame)
+    _emit(frame)
 
 
 def _send_sale_event(
@@ -103,19 +221,17 @@ def _send_sale_event(
 ) -> None:
     """Send the payload describing a confirmed sale."""
 
+    now = int(time.time())
     frame = {
         "type": "sale_event",
-        "ts": int(time.time()),
+        "ts": now,
         "data": {
             "resource": resource,
             "quantity_label": quantity_label,
             "quantity": quantity_value,
             "price": float(unit_price),
             "amount": int(total_amount),
-            "date": _current_iso_datetime(),
+            "date": _current_iso_datetime(now),
         },
     }
-    if bus.client:
-        bus.client.send(frame)
-    else:
-        print("[WARN] bus.client indisponible, payload:", frame)
+    _emit(frame)
@@ -3,19 +3,66 @@ import asyncio
 import json
 import threading
 import time
-from typing import Any, Callable, Dict, Optional
-from queue import Queue, Empty
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Union
 
 import websockets
 from utils.logger import get_logger
 
+try:  # pragma: no cover - optional dependency at runtime
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover - fallback to the stdlib encoder
+    orjson = None  # type: ignore
+
 logger = get_logger(__name__)
 
+# Ping applicatif (en plus du ping WS) : le sender ne se réveille que pour un
+# message, un arrêt ou ce ping, jamais en simple polling.
+APP_PING_INTERVAL_S = 30.0
+# Messages regroupés au plus par trame {"type": "batch", "items": [...]}.
+MAX_BATCH_ITEMS = 32
+
+
+def _dumps(msg: Dict[str, Any]) -> str:
+    """Encode ``msg`` en JSON texte (orjson si disponible).
+
+    Une ``str`` envoyée en trame texte. Le serveur lit avec ``ws.receive()`` et
+    accepte aussi des trames binaires (JSON UTF-8) : un message ``bytes`` seul
+    part tel quel en binaire (voir _batch_frame), un ``batch`` toujours en texte.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(msg).decode()
+        except TypeError:
+            pass  # clés non str, entiers > 64 bits... : encodeur stdlib
+    return json.dumps(msg)
+
+
+def _encoded(msg: Union[Dict[str, Any], str, bytes]) -> str:
+    if isinstance(msg, str):
+        return msg
+    if isinstance(msg, bytes):
+        return msg.decode()
+    return _dumps(msg)
+
+
+def _batch_frame(msgs: list) -> Union[str, bytes]:
+    """Une trame pour ``msgs`` : le message seul, ou un ``batch`` de plusieurs.
+
+    send_raw()/send(bytes) queuent du JSON déjà encodé, inséré tel quel ; seul,
+    un message ``bytes`` part sans copie dans une trame binaire.
+    """
+    if len(msgs) == 1:
+        msg = msgs[0]
+        return msg if isinstance(msg, bytes) else _encoded(msg)
+    return '{"type": "batch", "items": [' + ", ".join(map(_encoded, msgs)) + "]}"
+
+
 class RealtimeClient:
     """
     Client WebSocket qui tourne dans un thread.
     - start() / stop()
-    - send(msg: dict) thread-safe
+    - send(msg: dict | bytes) / send_raw(json_text: str) thread-safe
     - on_message(callback) OU get_message(timeout) via queue
     - reconnexion auto avec backoff
     """
@@ -31,9 +78,17 @@ class RealtimeClient:
         self.on_message_cb = on_message
         self.ping_interval = ping_interval
 
-        # Queues thread-safe
-        self._out_q_async: Optional[asyncio.Queue] = None           # côté loop
-        self._in_q_thread: Queue = Queue(maxsize=max_queue)         # côté utilisateur
+        # Sortant : tampon partagé, vidé par lots par _sender_loop. La loop n'est
+        # réveillée qu'au passage vide -> non vide (un seul saut de thread par lot).
+        self._out_buf: deque = deque()
+        self._out_max = max_queue
+        self._out_lock = threading.Lock()
+        self._out_wakeup: Optional[asyncio.Event] = None             # côté loop
+        self._wake_scheduled = False
+        # Entrant (côté utilisateur) : au-delà de max_queue le plus vieux est
+        # écarté par le deque lui-même.
+        self._in_q: deque = deque(maxlen=max_queue)
+        self._in_cond = threading.Condition()
 
         # Infra thread/loop
         self._loop: Optional[asyncio.AbstractEventLoop] = None
@@ -58,43 +113,77 @@ class RealtimeClient:
         """Arrête proprement."""
         logger.info("Stopping realtime client thread")
         self._stop_evt.set()
-        if self._loop:
-            # réveiller la loop
-            self._call_soon_threadsafe(asyncio.sleep, 0)
+        loop, wakeup = self._loop, self._out_wakeup
+        if loop and wakeup is not None:
+            # réveiller le sender pour qu'il voie l'arrêt
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                pass  # loop déjà fermée
         if self._thread:
             self._thread.join(timeout=5)
 
-    def send(self, msg: Dict[str, Any]) -> bool:
+    def send(self, msg: Union[Dict[str, Any], bytes, bytearray]) -> bool:
         """
-        Envoie un message (dict) vers le serveur.
+        Envoie un message (dict, ou JSON déjà encodé en bytes) vers le serveur.
         Thread-safe. Retourne True si le message est queué, False sinon.
         """
-        if not isinstance(msg, dict):
-            raise TypeError("msg doit être un dict JSON-sérialisable")
-        if not self._loop or not self._out_q_async:
+        if isinstance(msg, bytearray):
+            msg = bytes(msg)  # figé : l'appelant peut réutiliser son tampon
+        elif not isinstance(msg, (dict, bytes)):
+            raise TypeError("msg doit être un dict JSON-sérialisable ou des bytes JSON")
+        return self._enqueue(msg)
+
+    def send_raw(self, data: str) -> bool:
+        """
+        Envoie un message déjà encodé en JSON (texte), sans re-sérialisation.
+        Thread-safe. Retourne True si le message est queué, False sinon.
+        """
+        if not isinstance(data, str):
+            raise TypeError("data doit être une chaîne JSON")
+        return self._enqueue(data)
+
+    def _enqueue(self, msg: Union[Dict[str, Any], str, bytes]) -> bool:
+        loop, wakeup = self._loop, self._out_wakeup
+        if not loop or wakeup is None:
             return False
+        with self._out_lock:
+            if len(self._out_buf) >= self._out_max:
+                logger.warning("Outgoing queue full; dropping message")
+                return False
+            self._out_buf.append(msg)
+            wake = not self._wake_scheduled
+            self._wake_scheduled = True
+        logger.debug("Queued message: %s", msg)
+        if not wake:
+            return True
         try:
-            def _put():
-                try:
-                    self._out_q_async.put_nowait(msg)
-                    logger.debug("Queued message: %s", msg)
-                except asyncio.QueueFull:
-                    logger.warning("Outgoing queue full; dropping message")
-
-            self._loop.call_soon_threadsafe(_put)
+            if threading.current_thread() is self._thread:
+                wakeup.set()
+            else:
+                loop.call_soon_threadsafe(wakeup.set)
             return True
         except Exception as e:
             logger.exception("Failed to queue message: %s", e)
             return False
 
+    def _take_batch(self) -> list:
+        """Vide le tampon sortant (appelé depuis la loop)."""
+        with self._out_lock:
+            self._out_wakeup.clear()
+            self._wake_scheduled = False
+            batch = list(self._out_buf)
+            self._out_buf.clear()
+        return batch
+
     def get_message(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
         """
         Récupère un message entrant depuis la queue (si pas de callback).
         """
-        try:
-            return self._in_q_thread.get(timeout=timeout)
-        except Empty:
-            return None
+        with self._in_cond:
+            if not self._in_q and not self._in_cond.wait_for(lambda: self._in_q, timeout):
+                return None
+            return self._in_q.popleft()
 
     def set_on_message(self, cb: Optional[Callable[[Dict[str, Any]], None]]) -> None:
         """Définit/retire le callback de réception."""
@@ -105,7 +194,7 @@ class RealtimeClient:
     def _thread_main(self):
         self._loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self._loop)
-        self._out_q_async = asyncio.Queue(maxsize=1000)
+        self._out_wakeup = asyncio.Event()
         try:
             self._loop.run_until_complete(self._run())
         finally:
@@ -142,9 +231,10 @@ class RealtimeClient:
 
             send_task = asyncio.create_task(self._sender_loop(ws))
             recv_task = asyncio.create_task(self._receiver_loop(ws))
+            # le sender s'arrête sur stop(), le receiver sur déconnexion
             done, pending = await asyncio.wait(
                 {send_task, recv_task},
-                return_when=asyncio.FIRST_EXCEPTION
+                return_when=asyncio.FIRST_COMPLETED
             )
             for t in pending:
                 t.cancel()
@@ -154,20 +244,37 @@ class RealtimeClient:
 
     async def _sender_loop(self, ws):
         # Envoi périodique d’un ping applicatif optionnel (en plus du ping WS)
-        last_ping = time.time()
+        last_ping = time.monotonic()
         while not self._stop_evt.is_set():
             try:
-                # priorité aux messages utilisateurs
-                try:
-                    msg = await asyncio.wait_for(self._out_q_async.get(), timeout=1.0)
-                    await ws.send(json.dumps(msg))
-                except asyncio.TimeoutError:
-                    pass
+                # priorité aux messages utilisateurs ; attente jusqu'au prochain ping
+                timeout = APP_PING_INTERVAL_S - (time.monotonic() - last_ping)
+                if timeout > 0:
+                    try:
+                        await asyncio.wait_for(self._out_wakeup.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                if self._stop_evt.is_set():
+                    break
+                batch = self._take_batch()
+                for i in range(0, len(batch), MAX_BATCH_ITEMS):
+                    chunk = batch[i:i + MAX_BATCH_ITEMS]
+                    try:
+                        await ws.send(_batch_frame(chunk))
+                    except BaseException:
+                        # remettre les messages non envoyés en tête pour la reconnexion,
+                        # et réarmer le réveil : le sender suivant les envoie dès la
+                        # connexion au lieu d'attendre le ping (jusqu'à 30 s)
+                        with self._out_lock:
+                            self._out_buf.extendleft(reversed(batch[i:]))
+                            self._wake_scheduled = True
+                        self._out_wakeup.set()
+                        raise
 
                 # ping applicatif
-                if time.time() - last_ping >= 30:
-                    await ws.send(json.dumps({"type": "ping", "ts": int(time.time())}))
-                    last_ping = time.time()
+                if time.monotonic() - last_ping >= APP_PING_INTERVAL_S:
+                    await ws.send(_dumps({"type": "ping", "ts": int(time.time())}))
+                    last_ping = time.monotonic()
             except (asyncio.CancelledError, websockets.ConnectionClosed):
                 break
 
@@ -187,22 +294,13 @@ class RealtimeClient:
                 self.on_message_cb(msg)
             except Exception:
                 logger.exception("Error in on_message callback")
-        # Pousse aussi dans la queue thread-safe (pour polling si besoin)
-        try:
-            self._in_q_thread.put_nowait(msg)
-        except Exception:
-            # si la queue est pleine, on drop le plus vieux pour garder le flux frais
-            try:
-                _ = self._in_q_thread.get_nowait()
-                self._in_q_thread.put_nowait(msg)
-            except Exception:
-                pass
+        # Pousse aussi dans la file thread-safe (pour polling si besoin) ; pleine,
+        # elle écarte le plus vieux pour garder le flux frais.
+        with self._in_cond:
+            self._in_q.append(msg)
+            self._in_cond.notify()
 
     def _emit_local(self, msg: Dict[str, Any]):
         # messages d’état locaux
         logger.debug("Local event: %s", msg)
         self._handle_incoming(msg)
-
-    def _call_soon_threadsafe(self, coro_func, *args, **kwargs):
-        if self._loop:
-            asyncio.run_coroutine_threadsafe(coro_func(*args, **kwargs), self._loop)
@@ -14,17 +14,27 @@ client.start()
 # Exemple : envoyer périodiquement ta frame d’affichage depuis "n'importe où" dans ton code:
 import psutil, time
 
+# virtual_memory() relit /proc/meminfo à chaque appel : rafraîchi toutes les
+# 5 s seulement, la dernière valeur est renvoyée entre deux lectures.
+MEM_REFRESH_S = 5.0
+
 try:
     i = 0
+    mem = psutil.virtual_memory().percent
+    mem_at = time.monotonic()
     while True:
+        now = time.monotonic()
+        if now - mem_at >= MEM_REFRESH_S:
+            mem = psutil.virtual_memory().percent
+            mem_at = now
         frame = {
             "type": "display",
             "ts": int(time.time()),
             "channel": "main",
             "data": {
                 "headline": "Etat machine",
-                "cpu": psutil.cpu_percent(),
-                "mem": psutil.virtual_memory().percent,
+                "cpu": psutil.cpu_percent(interval=None),  # écart depuis l'appel précédent
+                "mem": mem,
                 "step": i % 7,
                 "progress": (i % 100)
             }
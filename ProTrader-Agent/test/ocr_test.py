@@ -1,3 +1,4 @@
+import contextlib
 import time
 import cv2
 import numpy as np
@@ -6,6 +7,29 @@ from mss import mss
 from PIL import Image
 import sys
 import os
+import zlib
+
+try:
+    import tesserocr  # optionnel : API Tesseract en processus, gardée ouverte
+    from tesserocr import RIL
+except Exception:
+    tesserocr = None
+
+try:
+    import xxhash  # optionnel : empreinte plus rapide que crc32
+except Exception:
+    xxhash = None
+
+try:
+    from numba import njit, prange  # optionnel : prétraitement fusionné en une passe
+except Exception:
+    njit = None
+    prange = range
+
+try:
+    import bettercam  # optionnel (Windows) : capture DXGI Desktop Duplication
+except Exception:
+    bettercam = None
 
 # ----- (Windows) DPI awareness pour éviter les captures floues avec le scaling -----
 try:
@@ -25,16 +49,46 @@ LANG = "fra"  # "fra" pour français, "eng+fra" pour multi
 PSM = "6"     # Page segmentation mode (6 = assume un bloc de texte)
 OEM = "1"     # Engine mode (1 = LSTM) ; 3 = default
 
-# OCR options : ajuste selon ton cas
+# OCR options : ajuste selon ton cas (résolues une fois ici, pas à chaque frame)
 TESSERACT_CONFIG = f'--oem {OEM} --psm {PSM}'
+PSM_INT = int(PSM)
+OEM_INT = int(OEM)
+# Dossier tessdata : TESSDATA_PREFIX, sinon celui de l'installation Windows
+TESSDATA_DIR = os.environ.get("TESSDATA_PREFIX") or os.path.join(
+    os.path.dirname(TESSERACT_PATH), "tessdata")
+if not os.path.isdir(TESSDATA_DIR):
+    TESSDATA_DIR = None  # tesserocr cherche alors à son emplacement par défaut
 
 # Pré-traitement : mets True si tu veux binariser/agrandir
 UPSCALE = True
 THRESH = True
+# Binarisation : "adaptive" (seuil = moyenne locale - ADAPTIVE_C, robuste aux fonds
+# en dégradé ; suppose un texte plus sombre que son fond) ou "otsu" (seuil global)
+THRESH_METHOD = "adaptive"
+ADAPTIVE_BLOCK = 31  # voisinage en pixels après upscale x1.5 (hauteur des glyphes)
+ADAPTIVE_C = 10
 
 # Affichage des bounding boxes + conf
 DRAW_BOXES = True
 
+# Zone jugée vide (pas d'appel Tesseract) : écart-type sous MIN_STDDEV, ou
+# moins de MIN_INK_RATIO de pixels d'une des deux couleurs après binarisation
+MIN_STDDEV = 8.0
+MIN_INK_RATIO = 0.01
+
+# Seuil d'Otsu (chemin Numba) recalculé toutes les N frames, sur une copie réduite
+OTSU_EVERY = 10
+
+# tesserocr + binarisation : OCR bande de texte par bande de texte (psm 7, ligne
+# unique) au lieu de la zone entière ; les lignes vides ne passent plus dans le LSTM
+LINE_SPLIT = True
+BAND_PAD = 3       # marge (px) gardée autour de chaque bande
+MIN_BAND_INK = 2   # pixels d'encre minimum pour qu'une ligne de pixels compte
+SPLIT_LINES = LINE_SPLIT and THRESH  # bandes seulement sur image binaire
+
+# Cadence du thread de capture DXGI (bettercam) ; sans bettercam : mss à chaque tour
+CAPTURE_FPS = 30
+
 # ----- Fonctions utilitaires -----
 def select_roi_once(mon):
     """
@@ -58,54 +112,310 @@ def select_roi_once(mon):
             "width": int(w),
             "height": int(h)}
 
-def preprocess_for_ocr(frame_bgr):
+def dxgi_region(monitor, roi):
+    """ROI mss (coordonnées globales) -> région bettercam (relative à la sortie)."""
+    left = roi["left"] - monitor["left"]
+    top = roi["top"] - monitor["top"]
+    return (left, top, left + roi["width"], top + roi["height"])
+
+@contextlib.contextmanager
+def dxgi_capture(monitor, mon_index, roi):
     """
-    Pré-traitement simple pour améliorer l'OCR : niveaux de gris, upscale, threshold.
+    Capture DXGI de la ROI dans un thread bettercam (dernière frame dispo via
+    get_latest_frame). Donne None si bettercam est absent ou échoue (non Windows) :
+    on reste alors sur mss.
     """
-    gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
-    if UPSCALE:
-        # Agrandit pour aider l'OCR sur petites polices
-        gray = cv2.resize(gray, None, fx=1.5, fy=1.5, interpolation=cv2.INTER_LINEAR)
-    if THRESH:
-        gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+    cam = None
+    if bettercam is not None:
+        try:
+            cam = bettercam.create(output_idx=mon_index - 1, output_color="BGRA")
+            # video_mode : la dernière frame est répétée sur écran statique, la
+            # boucle (et cv2.waitKey) continue de tourner
+            cam.start(target_fps=CAPTURE_FPS, region=dxgi_region(monitor, roi), video_mode=True)
+        except Exception as e:
+            print("bettercam indisponible, capture mss :", e)
+            cam = None
+    try:
+        yield cam
+    finally:
+        if cam is not None:
+            cam.stop()
+            cam.release()
+
+def _reuse(bufs, name, shape):
+    """Tampon ``name`` de ``bufs``, réalloué seulement si la forme change (ROI)."""
+    buf = bufs.get(name)
+    if buf is None or buf.shape != shape:
+        buf = bufs[name] = np.empty(shape, np.uint8)
+    return buf
+
+def _fused_gray_up_thresh(frame, out, thr):
+    """
+    Niveaux de gris + agrandissement bilinéaire + seuillage en une passe :
+    chaque pixel source est lu une fois, sans image intermédiaire.
+    """
+    h, w = frame.shape[0], frame.shape[1]
+    oh, ow = out.shape
+    fy = h / oh
+    fx = w / ow
+    for y in prange(oh):
+        # même grille que cv2.INTER_LINEAR (centres de pixels alignés)
+        sy = max((y + 0.5) * fy - 0.5, 0.0)
+        y0 = min(int(sy), h - 1)
+        y1 = min(y0 + 1, h - 1)
+        dy = sy - y0
+        for x in range(ow):
+            sx = max((x + 0.5) * fx - 0.5, 0.0)
+            x0 = min(int(sx), w - 1)
+            x1 = min(x0 + 1, w - 1)
+            dx = sx - x0
+            l00 = 0.114 * frame[y0, x0, 0] + 0.587 * frame[y0, x0, 1] + 0.299 * frame[y0, x0, 2]
+            l01 = 0.114 * frame[y0, x1, 0] + 0.587 * frame[y0, x1, 1] + 0.299 * frame[y0, x1, 2]
+            l10 = 0.114 * frame[y1, x0, 0] + 0.587 * frame[y1, x0, 1] + 0.299 * frame[y1, x0, 2]
+            l11 = 0.114 * frame[y1, x1, 0] + 0.587 * frame[y1, x1, 1] + 0.299 * frame[y1, x1, 2]
+            top = l00 + (l01 - l00) * dx
+            bottom = l10 + (l11 - l10) * dx
+            lum = top + (bottom - top) * dy
+            out[y, x] = 255 if lum > thr else 0
+
+_fused_jit = None
+# Le noyau fusionné ne sert qu'au pipeline upscale + Otsu : pas de JIT sinon
+if njit is not None and UPSCALE and THRESH and THRESH_METHOD == "otsu":
+    try:
+        _fused_jit = njit(cache=True, parallel=True, fastmath=True)(_fused_gray_up_thresh)
+        # compilation au chargement, pas sur la première frame
+        _fused_jit(np.zeros((2, 2, 4), np.uint8), np.empty((3, 3), np.uint8), 127.0)
+    except Exception:
+        _fused_jit = None
+
+def _otsu_threshold(frame, bufs):
+    """Seuil d'Otsu sur la frame réduite (1 pixel sur 4), mis en cache OTSU_EVERY frames."""
+    count, thr = bufs.get("otsu", (0, None))
+    if thr is None or count >= OTSU_EVERY:
+        code = cv2.COLOR_BGRA2GRAY if frame.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        small = cv2.cvtColor(np.ascontiguousarray(frame[::4, ::4]), code)
+        thr = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[0]
+        count = 0
+    bufs["otsu"] = (count + 1, thr)
+    return thr
+
+# ----- Pré-traitement pour l'OCR : niveaux de gris, upscale, threshold -----
+# Une fonction par combinaison UPSCALE/THRESH, choisie une fois au chargement :
+# pas de test de config par frame. ``frame`` est en BGR ou BGRA ; ``bufs`` (dict)
+# garde les tampons d'une frame à l'autre.
+
+def _gray(frame, bufs):
+    code = cv2.COLOR_BGRA2GRAY if frame.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+    return cv2.cvtColor(frame, code, dst=_reuse(bufs, "gray", frame.shape[:2]))
+
+def _upscale(gray, bufs):
+    # Agrandit pour aider l'OCR sur petites polices
+    h, w = gray.shape
+    up = _reuse(bufs, "gray_up", (round(h * 1.5), round(w * 1.5)))
+    return cv2.resize(gray, None, dst=up, fx=1.5, fy=1.5, interpolation=cv2.INTER_LINEAR)
+
+def _otsu(gray):
+    cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU, dst=gray)
     return gray
 
+def _adaptive(gray):
+    cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY,
+                          ADAPTIVE_BLOCK, ADAPTIVE_C, dst=gray)
+    return gray
+
+_binarize = _otsu if THRESH_METHOD == "otsu" else _adaptive
+
+def _gray_only(frame, bufs=None):
+    return _gray(frame, {} if bufs is None else bufs)
+
+def _gray_up(frame, bufs=None):
+    bufs = {} if bufs is None else bufs
+    return _upscale(_gray(frame, bufs), bufs)
+
+def _gray_thr(frame, bufs=None):
+    return _binarize(_gray(frame, {} if bufs is None else bufs))
+
+def _gray_up_thr(frame, bufs=None):
+    bufs = {} if bufs is None else bufs
+    return _binarize(_upscale(_gray(frame, bufs), bufs))
+
+def _fused_up_thr(frame, bufs=None):
+    bufs = {} if bufs is None else bufs
+    h, w = frame.shape[:2]
+    out = _reuse(bufs, "gray_up", (round(h * 1.5), round(w * 1.5)))
+    _fused_jit(frame, out, float(_otsu_threshold(frame, bufs)))
+    return out
+
+preprocess_for_ocr = {
+    (False, False): _gray_only,
+    (True, False): _gray_up,
+    (False, True): _gray_thr,
+    # noyau Numba : seuil global seulement
+    (True, True): _fused_up_thr if _fused_jit is not None and _binarize is _otsu else _gray_up_thr,
+}[(UPSCALE, THRESH)]
+
+EMPTY_OCR_DATA = {"text": [], "conf": [], "left": [], "top": [], "width": [], "height": []}
+
+def is_blank(image_gray):
+    """True si la zone est uniforme / sans contraste : rien à lire pour Tesseract."""
+    if cv2.meanStdDev(image_gray)[1][0, 0] < MIN_STDDEV:
+        return True
+    if THRESH:
+        white = cv2.countNonZero(image_gray) / image_gray.size
+        return white < MIN_INK_RATIO or white > 1.0 - MIN_INK_RATIO
+    return False
+
+def text_from_data(data):
+    """Reconstitue le texte (mots joints par ligne, lignes non vides) depuis image_to_data."""
+    lines = []
+    last_line = None
+    keys = zip(data.get("page_num", []), data.get("block_num", []),
+               data.get("par_num", []), data.get("line_num", []))
+    for line_key, word in zip(keys, data.get("text", [])):
+        word = str(word).strip()
+        if not word:
+            continue
+        if line_key != last_line:
+            lines.append([])
+            last_line = line_key
+        lines[-1].append(word)
+    return "\n".join(" ".join(words) for words in lines)
+
+# API tesserocr créée au premier appel et gardée pour toute la session
+_tess_api = None
+
+def get_tess_api():
+    global _tess_api
+    if _tess_api is None:
+        psm = int(tesserocr.PSM.SINGLE_LINE) if SPLIT_LINES else PSM_INT
+        kwargs = {"lang": LANG, "psm": psm, "oem": OEM_INT}
+        if TESSDATA_DIR:
+            kwargs["path"] = TESSDATA_DIR
+        # Les .traineddata sont chargés ici, une seule fois pour la session
+        _tess_api = tesserocr.PyTessBaseAPI(**kwargs)
+        _tess_api.SetVariable("debug_file", os.devnull)
+        # Pas d'apprentissage adaptatif d'une frame à l'autre (moteur legacy) :
+        # les frames successives se ressemblent, rien à gagner, du temps à perdre
+        _tess_api.SetVariable("classify_enable_learning", "0")
+        _tess_api.SetVariable("classify_enable_adaptive_matcher", "0")
+    return _tess_api
+
+def text_bands(binary):
+    """
+    Bandes (y0, y1) contenant du texte, par projection horizontale de l'image
+    binarisée : une ligne de pixels compte si elle a MIN_BAND_INK pixels de la
+    couleur minoritaire (l'encre). Bandes élargies de BAND_PAD et fusionnées si
+    elles se touchent (accents, points des i).
+    """
+    h, w = binary.shape
+    white = cv2.reduce(binary, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel() // 255
+    ink = white if 2 * int(white.sum()) < binary.size else w - white
+    rows = np.flatnonzero(ink >= MIN_BAND_INK)
+    if rows.size == 0:
+        return []
+    gaps = np.flatnonzero(np.diff(rows) > 1)
+    starts = np.maximum(np.r_[rows[0], rows[gaps + 1]] - BAND_PAD, 0)
+    ends = np.minimum(np.r_[rows[gaps], rows[-1]] + 1 + BAND_PAD, h)
+    bands = []
+    for y0, y1 in zip(starts.tolist(), ends.tolist()):
+        if bands and y0 <= bands[-1][1]:
+            bands[-1] = (bands[-1][0], y1)
+        else:
+            bands.append((y0, y1))
+    return bands
+
+def _collect_words(api, data, y_off=0, block_base=0):
+    """Ajoute les mots reconnus par api à data, boîtes décalées de y_off en y."""
+    ri = api.GetIterator()
+    if ri is None:
+        return
+    block = par = line = word = 0
+    for it in tesserocr.iterate_level(ri, RIL.WORD):
+        if it.IsAtBeginningOf(RIL.BLOCK):
+            block, par, line = block + 1, 0, 0
+        if it.IsAtBeginningOf(RIL.PARA):
+            par, line = par + 1, 0
+        if it.IsAtBeginningOf(RIL.TEXTLINE):
+            line, word = line + 1, 0
+        word += 1
+        box = it.BoundingBox(RIL.WORD)
+        if box is None:
+            continue
+        x1, y1, x2, y2 = box
+        for k, v in (("page_num", 1), ("block_num", block_base + block), ("par_num", par),
+                     ("line_num", line), ("word_num", word), ("left", x1), ("top", y1 + y_off),
+                     ("width", x2 - x1), ("height", y2 - y1), ("conf", it.Confidence(RIL.WORD)),
+                     ("text", it.GetUTF8Text(RIL.WORD) or "")):
+            data[k].append(v)
+
+def tesserocr_data(image_gray):
+    """
+    Même dict que image_to_data (niveau mot), via l'API tesserocr persistante.
+    Avec SPLIT_LINES, une reconnaissance psm 7 par bande de texte : chaque bande
+    devient un bloc, les boîtes sont remises en coordonnées de la zone entière.
+    """
+    api = get_tess_api()
+    gray = np.ascontiguousarray(image_gray)
+    h, w = gray.shape
+    data = {k: [] for k in ("page_num", "block_num", "par_num", "line_num", "word_num",
+                            "left", "top", "width", "height", "conf", "text")}
+    # Pixels bruts 8 bits, sans passer par PIL : tesserocr n'expose pas de PIX
+    # réutilisable (pas de SetImagePix), une copie par frame reste le minimum.
+    # Les frames identiques n'arrivent pas ici (empreinte dans main()).
+    bands = text_bands(gray) if SPLIT_LINES else [(0, h)]
+    for i, (y0, y1) in enumerate(bands):
+        # Tranche de lignes d'un tableau C-contigu : tobytes() ne copie que la bande
+        api.SetImageBytes(gray[y0:y1].tobytes(), w, y1 - y0, 1, w)
+        api.Recognize()
+        _collect_words(api, data, y0, i)
+    return data
+
 def ocr_image(image_gray):
     """
     Retourne:
       - texte concaténé (nettoyé)
       - data pandas-like sous forme de dict (image_to_data)
+    Un seul appel Tesseract : le texte est reconstruit depuis les mots de image_to_data.
+    Passe par tesserocr (sans processus ni PNG par frame) si installé, sinon pytesseract.
     """
+    if tesserocr is not None:
+        data = tesserocr_data(image_gray)
+        return text_from_data(data), data
     # pytesseract accepte un array ou une PIL Image
-    text = pytesseract.image_to_string(image_gray, lang=LANG, config=TESSERACT_CONFIG) or ""
     data = pytesseract.image_to_data(image_gray, lang=LANG, config=TESSERACT_CONFIG,
                                      output_type=pytesseract.Output.DICT)
-    # Nettoyage texte global
-    text_clean = "\n".join([line.strip() for line in text.splitlines() if line.strip()])
-    return text_clean, data
-
-def draw_boxes(frame_bgr, data, scale_x=1.0, scale_y=1.0):
-    n = len(data.get("text", []))
-    for i in range(n):
-        conf = safe_int(data["conf"][i], -1)
-        txt  = str(data["text"][i]).strip()
+    return text_from_data(data), data
 
-        if conf > 50 and txt:
-            x = safe_int(data["left"][i], 0)
-            y = safe_int(data["top"][i], 0)
-            w = safe_int(data["width"][i], 0)
-            h = safe_int(data["height"][i], 0)
+def frame_digest(image_gray):
+    """Empreinte des pixels, pour ne relancer Tesseract que si l'image change."""
+    buf = np.ascontiguousarray(image_gray)
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(buf)
+    return zlib.crc32(buf)
 
-            # redimensionne vers l’image d’affichage
-            x = int(x / scale_x)
-            y = int(y / scale_y)
-            w = int(w / scale_x)
-            h = int(h / scale_y)
-
-            cv2.rectangle(frame_bgr, (x, y), (x+w, y+h), (0, 255, 0), 1)
-            cv2.putText(frame_bgr, f'{txt} ({conf})', (x, max(0, y-5)),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1, cv2.LINE_AA)
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+BOX_FIELDS = ("left", "top", "width", "height")
 
+def draw_boxes(frame_bgr, data, scale_x=1.0, scale_y=1.0):
+    texts = data.get("text", [])
+    if not texts:
+        return
+    # Filtre sur la confiance en un passage, puis seules les boîtes retenues sont
+    # converties et redimensionnées vers l’image d’affichage (en bloc)
+    conf = np.fromiter((safe_int(c, -1) for c in data["conf"]), dtype=np.int64, count=len(texts))
+    keep = np.flatnonzero(conf > 50)
+    if keep.size == 0:
+        return
+    boxes = np.stack([np.asarray(data[k], dtype=np.float64)[keep] for k in BOX_FIELDS], axis=1)
+    boxes /= (scale_x, scale_y, scale_x, scale_y)
+
+    for i, (x, y, w, h) in zip(keep.tolist(), boxes.astype(np.int64).tolist()):
+        txt = str(texts[i]).strip()
+        if not txt:
+            continue
+        cv2.rectangle(frame_bgr, (x, y), (x+w, y+h), (0, 255, 0), 1)
+        cv2.putText(frame_bgr, f'{txt} ({conf[i]})', (x, max(0, y-5)),
+                    FONT, 0.4, (0, 255, 0), 1, cv2.LINE_AA)
 
 def main():
     print("Démarrage OCR temps réel...")
@@ -118,63 +428,90 @@ def main():
         sys.exit(0)
 
     last_text = None
+    # Dernier résultat OCR et l'image (forme + empreinte) qui l'a produit
+    last_ocr_key = None
+    text, data = "", None
+    # Tampons des images intermédiaires, réutilisés d'une frame à l'autre
+    bufs = {}
     fps_last = time.time()
     frames = 0
 
     with mss() as sct:
-        while True:
-            # Capture ROI
-            sct_img = sct.grab(roi)
-            frame = np.array(sct_img)[:, :, :3]  # BGR
-
-            # Copie pour affichage
-            display = frame.copy()
-
-            # Pré-traitement pour OCR
-            gray = preprocess_for_ocr(frame)
-            # ratios entre l’image OCR (gray) et l’image affichée (display)
-            scale_x = gray.shape[1] / display.shape[1]
-            scale_y = gray.shape[0] / display.shape[0]
-
-            # Calcule le facteur d'échelle si UPSCALE True (affichage vs OCR)
-            scale = 1.5 if UPSCALE else 1.0
-
-            # OCR
-            text, data = ocr_image(gray)
-
-            # Dessine les boxes sur l'image affichée si demandé
-            if DRAW_BOXES and data is not None:
-                draw_boxes(display, data, scale_x=scale_x, scale_y=scale_y)
-
-            # Affiche FPS
-            frames += 1
-            now = time.time()
-            if now - fps_last >= 1.0:
-                fps = frames / (now - fps_last)
-                fps_last = now
-                frames = 0
-                cv2.setWindowTitle("OCR Zone", f"OCR Zone - {fps:.1f} FPS")
-
-            # Affiche résultat
-            cv2.imshow("OCR Zone", display)
-
-            # Log seulement si le texte a changé
-            if text and text != last_text:
-                print("="*40)
-                print(text)
-                last_text = text
-
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
-                break
-            elif key == ord('r'):
-                cv2.destroyWindow("OCR Zone")
-                new_roi = select_roi_once(MONITOR_INDEX)
-                if new_roi:
-                    roi = new_roi
-                cv2.namedWindow("OCR Zone")
+        monitor = sct.monitors[MONITOR_INDEX]
+        with dxgi_capture(monitor, MONITOR_INDEX, roi) as cam:
+            while True:
+                if cam is not None:
+                    # Dernière frame du thread de capture (None tant qu'aucune n'est prête)
+                    raw = cam.get_latest_frame()
+                    if raw is None:
+                        time.sleep(1 / 60)
+                        continue
+                else:
+                    # Capture ROI : vue BGRA sur le tampon mss, sans copie
+                    sct_img = sct.grab(roi)
+                    raw = np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(sct_img.height, sct_img.width, 4)
+
+                # Copie BGR pour affichage (on dessine dessus), dans un tampon réutilisé
+                display = cv2.cvtColor(raw, cv2.COLOR_BGRA2BGR,
+                                       dst=_reuse(bufs, "display", (raw.shape[0], raw.shape[1], 3)))
+
+                # Pré-traitement pour OCR
+                gray = preprocess_for_ocr(raw, bufs)
+                # ratios entre l’image OCR (gray) et l’image affichée (display)
+                scale_x = gray.shape[1] / display.shape[1]
+                scale_y = gray.shape[0] / display.shape[0]
+
+                # Calcule le facteur d'échelle si UPSCALE True (affichage vs OCR)
+                scale = 1.5 if UPSCALE else 1.0
+
+                # OCR, seulement si l'image prétraitée a changé (écran statique : rien à refaire)
+                ocr_key = (gray.shape, frame_digest(gray))
+                if ocr_key != last_ocr_key:
+                    if is_blank(gray):
+                        text, data = "", EMPTY_OCR_DATA
+                    else:
+                        text, data = ocr_image(gray)
+                    last_ocr_key = ocr_key
+
+                # Dessine les boxes sur l'image affichée si demandé
+                if DRAW_BOXES and data is not None:
+                    draw_boxes(display, data, scale_x=scale_x, scale_y=scale_y)
+
+                # Affiche FPS
+                frames += 1
+                now = time.time()
+                if now - fps_last >= 1.0:
+                    fps = frames / (now - fps_last)
+                    fps_last = now
+                    frames = 0
+                    cv2.setWindowTitle("OCR Zone", f"OCR Zone - {fps:.1f} FPS")
+
+                # Affiche résultat
+                cv2.imshow("OCR Zone", display)
+
+                # Log seulement si le texte a changé
+                if text and text != last_text:
+                    print("="*40)
+                    print(text)
+                    last_text = text
+
+                key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
+                    break
+                elif key == ord('r'):
+                    cv2.destroyWindow("OCR Zone")
+                    new_roi = select_roi_once(MONITOR_INDEX)
+                    if new_roi:
+                        roi = new_roi
+                        if cam is not None:
+                            cam.stop()
+                            cam.start(target_fps=CAPTURE_FPS, region=dxgi_region(monitor, roi),
+                                      video_mode=True)
+                    cv2.namedWindow("OCR Zone")
 
     cv2.destroyAllWindows()
+    if _tess_api is not None:
+        _tess_api.End()
 
 
 def safe_int(x, default=-1):
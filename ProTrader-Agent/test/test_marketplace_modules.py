@@ -1,13 +1,25 @@
 import os
 import sys
+from types import SimpleNamespace
 
 import pytest
 
 # Ensure project root is on sys.path for direct test execution
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from scripts.marketplace.context import _build_fortune_lookup
-from scripts.marketplace.purchase import _compute_purchase_threshold
+from scripts.marketplace.context import _build_fortune_lookup, set_current_kamas
+from scripts.marketplace.purchase import (
+    _ABOVE_FORTUNE_SHARE,
+    _ABOVE_THRESHOLD,
+    _BUY,
+    _KAMAS_UNKNOWN,
+    _NO_THRESHOLD,
+    _compute_purchase_threshold,
+    _parse_quantity_label,
+    _precompute_thresholds,
+    _purchase_decision,
+)
+from scripts.marketplace.sale import _coerce_price
 
 
 def test_compute_purchase_threshold_percent_margin():
@@ -34,6 +46,61 @@ def test_compute_purchase_threshold_invalid_configuration():
     assert _compute_purchase_threshold(fortune_line) is None
 
 
+@pytest.mark.parametrize(
+    "label, expected",
+    [("x1", 1), ("x1000", 1000), (" X100 ", 100), ("x5", 5), ("", 0), (None, 0), ("lot", 0)],
+)
+def test_parse_quantity_label(label, expected):
+    assert _parse_quantity_label(label) == expected
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (1234, 1234),
+        (1234.6, 1235),
+        ("99.4", 99),
+        (0, 0),
+        (None, None),
+        ("n/a", None),
+        (float("nan"), None),
+        (float("inf"), None),
+    ],
+)
+def test_coerce_price(value, expected):
+    assert _coerce_price(value) == expected
+
+
+@pytest.mark.parametrize(
+    "price, target, kamas, expected",
+    [
+        (900, None, 100_000, _NO_THRESHOLD),
+        (900, 800, 100_000, _ABOVE_THRESHOLD),
+        (700, 800, None, _KAMAS_UNKNOWN),
+        (700, 800, 5_000, _ABOVE_FORTUNE_SHARE),
+        (700, 800, 7_000, _BUY),
+    ],
+)
+def test_purchase_decision(price, target, kamas, expected):
+    ctx = SimpleNamespace()
+    set_current_kamas(ctx, kamas)
+    assert _purchase_decision(price, target, ctx.max_purchase_price) == expected
+
+
+def test_precompute_thresholds_per_quantity():
+    ctx = SimpleNamespace(
+        fortune_lookup=_build_fortune_lookup(
+            [
+                {"slug": "bois", "qty": "x10", "margin_type": "absolute", "margin_value": 500},
+                {"slug": "bois", "qty": "x100", "margin_type": "unknown", "margin_value": 5},
+            ]
+        )
+    )
+    lines, thresholds = _precompute_thresholds(ctx, "bois")
+    assert [bool(line) for line in lines] == [False, True, True, False]
+    assert thresholds.tolist() == [-1, 500, -1, -1]
+
+
 @pytest.mark.parametrize(
     "entries, expected_keys",
     [
@@ -43,7 +110,7 @@ def test_compute_purchase_threshold_invalid_configuration():
                 {"slug": "bois", "qty": "x1", "value": 25},
                 {"slug": "Pierre", "qty": "x100", "value": 250},
             ],
-            {"bois": {"x10", "x1"}, "pierre": {"x100"}},
+            {("bois", "x10"), ("bois", "x1"), ("pierre", "x100")},
         ),
         (
             [
@@ -51,13 +118,11 @@ def test_compute_purchase_threshold_invalid_configuration():
                 {"slug": "", "qty": "x10", "value": 50},
                 {"slug": "Champ", "qty": "", "value": 0},
             ],
-            {"herbe": {"x1"}},
+            {("herbe", "x1")},
         ),
     ],
 )
 def test_build_fortune_lookup(entries, expected_keys):
     lookup = _build_fortune_lookup(entries)
-    assert set(lookup.keys()) == set(expected_keys.keys())
-    for slug, expected_qtys in expected_keys.items():
-        assert set(lookup[slug].keys()) == expected_qtys
+    assert set(lookup.keys()) == expected_keys
 
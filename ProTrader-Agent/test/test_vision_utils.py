@@ -0,0 +1,182 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+import utils.vision as vision
+import utils.vision_fft as vision_fft
+
+# Ensure project root is on sys.path for direct test execution
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.vision import (
+    _dhash64_kernel,
+    _dhash64_numpy,
+    _frame_digest,
+    _match_on_haystack,
+    _match_scale,
+    _prefilter_rejects,
+    dhash64,
+    hamming64,
+    image_dhash,
+    load_template,
+)
+from utils.vision_numba import ncc_search
+
+
+def test_dhash64_flat_image_is_zero():
+    assert dhash64(np.zeros((8, 9), np.uint8)) == 0
+
+
+def test_dhash64_increasing_rows_sets_every_bit():
+    gray = np.tile(np.arange(9, dtype=np.uint8), (8, 1))
+    assert dhash64(gray) == (1 << 64) - 1
+
+
+def test_dhash64_kernel_matches_numpy_fallback():
+    rng = np.random.default_rng(0)
+    gray = rng.integers(0, 256, size=(8, 9), dtype=np.uint8)
+    assert int(_dhash64_kernel(gray)) == _dhash64_numpy(gray)
+
+
+def test_image_dhash_tolerates_small_noise():
+    rng = np.random.default_rng(1)
+    img = np.tile(np.linspace(0, 255, 180, dtype=np.uint8), (160, 1))
+    noisy = np.clip(img.astype(np.int16) + rng.integers(-2, 3, img.shape), 0, 255).astype(np.uint8)
+    assert hamming64(image_dhash(img), image_dhash(noisy)) <= 4
+
+
+def test_prefilter_rejects_only_implausible_areas():
+    rng = np.random.default_rng(2)
+    template = rng.integers(60, 200, size=(20, 30), dtype=np.uint8)
+    similar = rng.integers(60, 200, size=(120, 160), dtype=np.uint8)
+    black = np.zeros((120, 160), np.uint8)
+    assert not _prefilter_rejects(similar, template, None, 3.0)
+    assert _prefilter_rejects(black, template, None, 3.0)
+
+
+def test_prefilter_keeps_small_template_in_large_frame_of_other_brightness():
+    rng = np.random.default_rng(3)
+    button = rng.integers(200, 256, size=(40, 120, 3), dtype=np.uint8)
+    frame = np.full((1080, 1920, 3), 15, np.uint8)
+    frame[500:540, 900:1020] = button
+    assert not _prefilter_rejects(frame, button, None, 3.0)
+
+    mask = np.zeros((40, 120), np.uint8)
+    mask[5:35, 10:110] = 255
+    assert not _prefilter_rejects(frame, button, mask, 3.0)
+
+    empty = np.full((1080, 1920, 3), 15, np.uint8)
+    assert _prefilter_rejects(empty, button, None, 3.0)
+    assert _prefilter_rejects(empty, button, mask, 3.0)
+
+
+def test_load_template_decodes_once_and_reloads_on_change(tmp_path):
+    path = tmp_path / "tpl.png"
+    cv2.imwrite(str(path), np.full((4, 6, 3), 10, np.uint8))
+    first = load_template(str(path))
+    assert load_template(str(path)) is first
+    assert not first.flags.writeable
+
+    cv2.imwrite(str(path), np.full((5, 7, 3), 20, np.uint8))
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert load_template(str(path)).shape == (5, 7, 3)
+
+
+def test_ncc_search_matches_opencv_ccoeff_normed():
+    rng = np.random.default_rng(4)
+    src = rng.integers(0, 256, size=(24, 30), dtype=np.uint8)
+    tmpl = src[5:11, 7:15].copy()
+    expected = cv2.matchTemplate(src, tmpl, cv2.TM_CCOEFF_NORMED)
+    got = ncc_search(src, tmpl)
+    assert got.shape == expected.shape
+    assert np.allclose(got, expected, atol=1e-4)
+    assert np.unravel_index(np.argmax(got), got.shape) == (5, 7)
+
+
+def test_pyramid_search_finds_the_full_resolution_match():
+    rng = np.random.default_rng(5)
+    noise = rng.integers(0, 256, size=(240, 320), dtype=np.uint8)
+    hay = cv2.GaussianBlur(noise, (0, 0), 3)
+    hay = cv2.normalize(hay, None, 0, 255, cv2.NORM_MINMAX)
+    tmpl = hay[90:154, 130:210].copy()
+
+    full = _match_scale(hay, tmpl, 0.95, 0)
+    coarse = _match_scale(hay, tmpl, 0.95, 2)
+    assert max(full, key=lambda h: h[2])[:2] == (130, 90)
+    assert max(coarse, key=lambda h: h[2])[:2] == (130, 90)
+    assert {h[:2] for h in coarse} <= {h[:2] for h in full}
+
+
+def test_pyramid_search_keeps_repeated_icons():
+    rng = np.random.default_rng(6)
+    icon = cv2.GaussianBlur(rng.integers(0, 256, size=(40, 40), dtype=np.uint8), (0, 0), 2)
+    icon = cv2.normalize(icon, None, 0, 255, cv2.NORM_MINMAX)
+    hay = np.full((200, 300), 128, np.uint8)
+    spots = [(20, 30), (64, 30), (108, 30), (20, 120)]
+    for (x, y) in spots:
+        hay[y:y + 40, x:x + 40] = icon
+
+    hits = {h[:2] for h in _match_scale(hay, icon, 0.95, 2)}
+    assert set(spots) <= hits
+
+
+def test_match_is_memoized_on_identical_frames(tmp_path, monkeypatch):
+    rng = np.random.default_rng(7)
+    hay = rng.integers(0, 256, size=(60, 80), dtype=np.uint8)
+    path = tmp_path / "tpl.png"
+    cv2.imwrite(str(path), hay[10:30, 20:44])
+
+    calls = []
+    search = vision._search_haystack
+
+    def counting_search(*args, **kwargs):
+        calls.append(1)
+        return search(*args, **kwargs)
+
+    monkeypatch.setattr(vision, "_search_haystack", counting_search)
+    kwargs = {
+        "threshold": 0.9,
+        "max_results": 1,
+        "iou_nms": 0.35,
+        "scales": (1.0, 1.0, 1.0),
+        "use_color": False,
+        "prefilter_k": None,
+    }
+
+    first = _match_on_haystack(hay, (0, 0), str(path), digest=_frame_digest(hay), **kwargs)
+    again = _match_on_haystack(hay, (0, 0), str(path), digest=_frame_digest(hay), **kwargs)
+    assert first == again and first[0].bbox == (20, 10, 24, 20)
+    assert len(calls) == 1
+
+    changed = hay.copy()
+    changed[0, 0] ^= 0xFF
+    _match_on_haystack(changed, (0, 0), str(path), digest=_frame_digest(changed), **kwargs)
+    assert len(calls) == 2
+
+
+def test_prepared_template_caches_scales_until_reload(tmp_path):
+    path = tmp_path / "tpl.png"
+    cv2.imwrite(str(path), np.full((20, 30, 3), 90, np.uint8))
+    prepared = vision._prepared_template(str(path), False)
+    assert prepared.image.ndim == 2
+    assert prepared.at_scale(0.5) is prepared.at_scale(0.5)
+    assert vision._prepared_template(str(path), False) is prepared
+
+    cv2.imwrite(str(path), np.full((10, 10, 3), 90, np.uint8))
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert vision._prepared_template(str(path), False).image.shape == (10, 10)
+
+
+def test_fft_ncc_matches_opencv_ccoeff_normed():
+    rng = np.random.default_rng(8)
+    src = rng.integers(0, 256, size=(48, 64), dtype=np.uint8)
+    frame = vision_fft.FftFrame(src)
+    for (y, x, h, w) in [(5, 7, 6, 8), (20, 30, 12, 20)]:
+        tmpl = src[y:y + h, x:x + w].copy()
+        expected = cv2.matchTemplate(src, tmpl, cv2.TM_CCOEFF_NORMED)
+        got = vision_fft.ncc_search(frame, tmpl)
+        assert got.shape == expected.shape
+        assert np.allclose(got, expected, atol=1e-4)
+        assert np.unravel_index(np.argmax(got), got.shape) == (y, x)
@@ -1,11 +1,18 @@
 # agent/utils/config_io.py
 from __future__ import annotations
+import os
+import shutil
 from pathlib import Path
 from typing import Any, Dict, List
 
 import yaml
 from utils.logger import get_logger
 
+try:  # libyaml (C), bien plus rapide ; sinon les classes pur Python
+    from yaml import CSafeDumper as _Dumper, CSafeLoader as _Loader
+except ImportError:  # pragma: no cover - PyYAML built without libyaml
+    from yaml import SafeDumper as _Dumper, SafeLoader as _Loader
+
 logger = get_logger(__name__)
 
 # ---------- I/O ----------
@@ -23,93 +30,115 @@ def safe_write_text(p: Path, content: str):
     _ensure_parent_exists(p)
     if p.exists():
         bak = p.with_suffix(p.suffix + ".bak")
-        bak.write_text(p.read_text(encoding="utf-8"), encoding="utf-8")
+        shutil.copyfile(p, bak)  # copie brute : pas de décodage/ré-encodage
         logger.info("Backup created for %s", p)
     logger.info("Writing text to %s", p)
-    p.write_text(content, encoding="utf-8")
+    # Écriture atomique : un crash en cours d'écriture ne tronque jamais p
+    tmp = p.with_suffix(p.suffix + ".tmp")
+    tmp.write_text(content, encoding="utf-8")
+    os.replace(tmp, p)
 
 # ---------- Merge ----------
 def deep_merge(dst: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    # Itératif : seuls les mappings sur le chemin d'une clé du patch sont copiés,
+    # les sous-arbres non touchés sont partagés avec dst (qui n'est pas modifié).
     out = dict(dst)
-    for k, v in patch.items():
-        if isinstance(v, dict) and isinstance(out.get(k), dict):
-            out[k] = deep_merge(out[k], v)
-        else:
-            out[k] = v
+    stack = [(out, patch)]
+    while stack:
+        node, sub = stack.pop()
+        for k, v in sub.items():
+            cur = node.get(k)
+            if isinstance(v, dict) and isinstance(cur, dict):
+                cur = node[k] = dict(cur)
+                stack.append((cur, v))
+            else:
+                node[k] = v
     return out
 
 # ---------- Validation "maison" ----------
+# type() exact : True/False (sous-classes de int) sont refusés sans second test.
+_NUMBER_TYPES = frozenset((int, float))
+
 def _is_int(x) -> bool:
-    return isinstance(x, int) and not isinstance(x, bool)
+    return type(x) is int
 
 def _is_float(x) -> bool:
-    return isinstance(x, (int, float)) and not isinstance(x, bool)
-
-def validate_config_dict(data: Any) -> List[str]:
-    errs: List[str] = []
-    if not isinstance(data, dict):
-        return ["Le YAML racine doit être un mapping (dict)."]
-
-    # base_dir
-    if "base_dir" in data and not isinstance(data["base_dir"], str):
-        errs.append("base_dir doit être une chaîne.")
+    return type(x) in _NUMBER_TYPES
 
-    # click_points
-    cp = data.get("click_points", {})
+def _validate_click_points(cp: Any, errs: List[str]) -> None:
     if cp and not isinstance(cp, dict):
         errs.append("click_points doit être un mapping de points.")
-    else:
-        for name, point in cp.items() if isinstance(cp, dict) else []:
-            if not isinstance(point, dict):
-                errs.append(f"click_points.{name} doit être un mapping.")
-                continue
-            x, y = point.get("x"), point.get("y")
-            if not _is_int(x) or not _is_int(y):
-                errs.append(f"click_points.{name}.x/y doivent être des entiers.")
-            jit = point.get("jitter", 5)
-            if not _is_int(jit) or jit < 0:
-                errs.append(f"click_points.{name}.jitter doit être un entier >= 0.")
-
-    # ocr_zones
-    oz = data.get("ocr_zones", {})
+        return
+    for name, point in cp.items() if isinstance(cp, dict) else []:
+        if not isinstance(point, dict):
+            errs.append(f"click_points.{name} doit être un mapping.")
+            continue
+        x, y = point.get("x"), point.get("y")
+        if not _is_int(x) or not _is_int(y):
+            errs.append(f"click_points.{name}.x/y doivent être des entiers.")
+        jit = point.get("jitter", 5)
+        if not _is_int(jit) or jit < 0:
+            errs.append(f"click_points.{name}.jitter doit être un entier >= 0.")
+
+def _validate_ocr_zones(oz: Any, errs: List[str]) -> None:
     if oz and not isinstance(oz, dict):
         errs.append("ocr_zones doit être un mapping de rectangles.")
-    else:
-        for name, rect in oz.items() if isinstance(oz, dict) else []:
-            if not (isinstance(rect, (list, tuple)) and len(rect) == 4 and all(_is_int(v) for v in rect)):
-                errs.append(f"ocr_zones.{name} doit être [left, top, width, height] (entiers).")
-                continue
-            _, _, w, h = rect
-            if w <= 0 or h <= 0:
-                errs.append(f"ocr_zones.{name}.width/height doivent être > 0.")
-
-    # templates
-    tm = data.get("templates", {})
+        return
+    for name, rect in oz.items() if isinstance(oz, dict) else []:
+        if not (isinstance(rect, (list, tuple)) and len(rect) == 4 and all(_is_int(v) for v in rect)):
+            errs.append(f"ocr_zones.{name} doit être [left, top, width, height] (entiers).")
+            continue
+        _, _, w, h = rect
+        if w <= 0 or h <= 0:
+            errs.append(f"ocr_zones.{name}.width/height doivent être > 0.")
+
+def _validate_templates(tm: Any, errs: List[str]) -> None:
     if tm and not isinstance(tm, dict):
         errs.append("templates doit être un mapping de chemins.")
-    else:
-        for name, path in tm.items() if isinstance(tm, dict) else []:
-            if not isinstance(path, str) or not path:
-                errs.append(f"templates.{name} doit être une chaîne non vide.")
+        return
+    for name, path in tm.items() if isinstance(tm, dict) else []:
+        if not isinstance(path, str) or not path:
+            errs.append(f"templates.{name} doit être une chaîne non vide.")
 
-    # settings
-    st = data.get("settings", {})
+def _validate_settings(st: Any, errs: List[str]) -> None:
     if st and not isinstance(st, dict):
         errs.append("settings doit être un mapping.")
-    else:
-        mi = st.get("monitor_index", 1) if isinstance(st, dict) else 1
-        if not _is_int(mi) or mi < 1:
-            errs.append("settings.monitor_index doit être un entier >= 1.")
-        dt = st.get("default_threshold", 0.88) if isinstance(st, dict) else 0.88
-        if not _is_float(dt) or not (0 <= float(dt) <= 1):
-            errs.append("settings.default_threshold doit être un nombre entre 0 et 1.")
-        th = st.get("thresholds", {}) if isinstance(st, dict) else {}
-        if th and not isinstance(th, dict):
-            errs.append("settings.thresholds doit être un mapping.")
-        else:
-            for k, v in th.items() if isinstance(th, dict) else []:
-                if not _is_float(v) or not (0 <= float(v) <= 1):
-                    errs.append(f"settings.thresholds.{k} doit être un nombre entre 0 et 1.")
+        return
+    if not isinstance(st, dict):
+        st = {}
+    mi = st.get("monitor_index", 1)
+    if not _is_int(mi) or mi < 1:
+        errs.append("settings.monitor_index doit être un entier >= 1.")
+    dt = st.get("default_threshold", 0.88)
+    if not _is_float(dt) or not (0 <= float(dt) <= 1):
+        errs.append("settings.default_threshold doit être un nombre entre 0 et 1.")
+    th = st.get("thresholds", {})
+    if th and not isinstance(th, dict):
+        errs.append("settings.thresholds doit être un mapping.")
+        return
+    for k, v in th.items() if isinstance(th, dict) else []:
+        if not _is_float(v) or not (0 <= float(v) <= 1):
+            errs.append(f"settings.thresholds.{k} doit être un nombre entre 0 et 1.")
+
+# Section -> validateur, dans l'ordre des messages d'erreur
+_VALIDATORS = (
+    ("click_points", _validate_click_points),
+    ("ocr_zones", _validate_ocr_zones),
+    ("templates", _validate_templates),
+    ("settings", _validate_settings),
+)
+
+def validate_config_dict(data: Any) -> List[str]:
+    errs: List[str] = []
+    if not isinstance(data, dict):
+        return ["Le YAML racine doit être un mapping (dict)."]
+
+    # base_dir
+    if "base_dir" in data and not isinstance(data["base_dir"], str):
+        errs.append("base_dir doit être une chaîne.")
+
+    for key, validate in _VALIDATORS:
+        validate(data.get(key, {}), errs)
     return errs
 
 # ---------- Helpers haut niveau ----------
@@ -117,10 +146,10 @@ def load_config_yaml(path: Path) -> str:
     return safe_read_text(path)
 
 def parse_yaml_to_dict(text: str) -> Dict[str, Any]:
-    return yaml.safe_load(text) or {}
+    return yaml.load(text, Loader=_Loader) or {}
 
 def dict_to_yaml(data: Dict[str, Any]) -> str:
-    return yaml.safe_dump(data, sort_keys=False, allow_unicode=True)
+    return yaml.dump(data, Dumper=_Dumper, sort_keys=False, allow_unicode=True)
 
 def validate_yaml_text(text: str) -> List[str]:
     try:
@@ -8,7 +8,7 @@ OnEnter = Callable[['FSM'], Optional[str]]   # return next_state or None to stay
 OnTick  = Callable[['FSM'], Optional[str]]
 OnExit  = Callable[['FSM'], None]
 
-@dataclass
+@dataclass(slots=True)
 class StateDef:
     name: str
     on_enter: Optional[OnEnter] = None
@@ -17,7 +17,7 @@ class StateDef:
     timeout_s: Optional[float]  = None        # None = pas de timeout
     on_timeout: Optional[str]   = None        # cible si timeout
 
-@dataclass
+@dataclass(slots=True)
 class FSM:
     states: Dict[str, StateDef]
     start: str
@@ -27,6 +27,8 @@ class FSM:
     current: str = field(init=False)
     _entered_at: float = field(init=False, default=0.0)
     ctx: dict = field(default_factory=dict)   # contexte partagé (résultats vision/OCR, flags, etc.)
+    # StateDef de l'état courant, résolu à chaque transition (pas à chaque tick)
+    _current_def: Optional[StateDef] = field(init=False, repr=False, default=None)
 
     def __post_init__(self):
         if self.start not in self.states:
@@ -37,40 +39,50 @@ class FSM:
     def _switch(self, next_state: str):
         # exit current state only if it has actually been entered
         # (self._entered_at is set on state entry).
-        if self._entered_at and (st := self.states.get(self.current)) and st.on_exit:
+        if self._entered_at and (st := self._current_def) and st.on_exit:
             st.on_exit(self)
         # entrer dans le nouveau
         self.current = next_state
-        self._entered_at = time.time()
-        if (st := self.states.get(self.current)) and st.on_enter:
+        self._current_def = self.states.get(next_state)
+        self._entered_at = time.monotonic()
+        if (st := self._current_def) and st.on_enter:
             nxt = st.on_enter(self)
             if nxt:  # transition immédiate si on_enter renvoie une cible
                 self._switch(nxt)
 
     def run(self, tick_hz: float = 10.0, max_runtime_s: Optional[float] = None):
         self._switch(self.current)  # on_enter du start
-        start_ts = time.time()
+        start_ts = time.monotonic()
         period = 1.0 / tick_hz
+        # Échéance du prochain tick : la durée de on_tick est déduite du sommeil
+        next_deadline = start_ts
+        # Noms résolus une fois : la boucle ne relit que current/_current_def
+        end, error = self.end, self.error
+        monotonic, sleep_until = time.monotonic, self._sleep_until
 
         while True:
             # fin globale ?
-            if self.current == self.end:
+            cur = self.current
+            if cur == end:
                 return "SUCCESS"
-            if self.current == self.error:
+            if cur == error:
                 return "ERROR"
-            if max_runtime_s is not None and (time.time() - start_ts) > max_runtime_s:
-                self._switch(self.error)
+            now = monotonic()
+            if max_runtime_s is not None and (now - start_ts) > max_runtime_s:
+                self._switch(error)
                 return "TIMEOUT_GLOBAL"
 
-            st = self.states[self.current]
+            st = self._current_def
+            if st is None:
+                raise KeyError(cur)
 
             # timeout local ?
-            if st.timeout_s is not None and (time.time() - self._entered_at) > st.timeout_s:
+            if st.timeout_s is not None and (now - self._entered_at) > st.timeout_s:
                 if st.on_timeout:
                     self._switch(st.on_timeout)
                 else:
-                    self._switch(self.error)
-                time.sleep(period)
+                    self._switch(error)
+                next_deadline = sleep_until(next_deadline + period)
                 continue
 
             # tick
@@ -78,5 +90,31 @@ class FSM:
                 nxt = st.on_tick(self)  # peut renvoyer None (rester), ou un nom d'état
                 if nxt:
                     self._switch(nxt)
+                next_deadline = sleep_until(next_deadline + period)
+                continue
+
+            # Pas de on_tick : rien ne peut changer avant le timeout de l'état (ou
+            # max_runtime_s), on dort jusque-là au lieu de se réveiller à chaque période
+            wake_at = next_deadline + period
+            idle_until = None
+            if st.timeout_s is not None:
+                idle_until = self._entered_at + st.timeout_s
+            if max_runtime_s is not None:
+                run_end = start_ts + max_runtime_s
+                idle_until = run_end if idle_until is None else min(idle_until, run_end)
+            if idle_until is not None and idle_until > wake_at:
+                wake_at = idle_until
+            next_deadline = sleep_until(wake_at)
+
+    @staticmethod
+    def _sleep_until(deadline: float) -> float:
+        """Dort jusqu'à ``deadline`` (monotonic) et renvoie l'échéance effective.
 
-            time.sleep(period)
+        Un tick en retard de plus d'une période repart de maintenant : pas de
+        rafale de ticks pour rattraper le temps perdu.
+        """
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+            return deadline
+        return time.monotonic()
@@ -4,7 +4,9 @@ This module encapsulates the PowerShell logic required to re-enable the
 Interception driver at startup (if it has been disabled previously) and to
 cleanly disable it again once the agent shuts down. The implementation mirrors
 existing administrative scripts that toggle the driver through registry edits
-and requires Windows with administrative privileges.
+and requires Windows with administrative privileges. Driver state checks read
+the registry in process through ``winreg``; PowerShell is only spawned to run
+those restore/disable scripts.
 """
 
 from __future__ import annotations
@@ -13,17 +15,25 @@ import platform
 import subprocess
 import textwrap
 import sys
-from typing import Optional
+from typing import Dict, Optional, Sequence
+
+try:  # Windows only: registry reads without spawning PowerShell
+    import winreg
+except ImportError:  # pragma: no cover - non-Windows platforms
+    winreg = None  # type: ignore
 
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-_SERVICE_REGISTRY_PATHS = (
-    "HKLM:\\SYSTEM\\CurrentControlSet\\Services\\interception",
-    "HKLM:\\SYSTEM\\CurrentControlSet\\Services\\keyboard",
-    "HKLM:\\SYSTEM\\CurrentControlSet\\Services\\mouse",
-)
+_SERVICES_KEY = "SYSTEM\\CurrentControlSet\\Services"
+_MONITORED_SERVICES = ("interception", "keyboard", "mouse")
+
+# Décisions gardées pour la durée du process (la sonde lance un interpréteur
+# Python complet) ; remises à zéro après chaque script qui modifie le registre.
+_UNSET = object()
+_READY_CACHE: Optional[bool] = None
+_PROBE_CACHE: object = _UNSET
 
 _REACTIVATE_SCRIPT = textwrap.dedent(
     r"""
@@ -157,143 +167,143 @@ def disable_interception() -> None:
         raise
 
 
+def invalidate_interception_cache() -> None:
+    """Forget the cached driver state so the next check reads it again."""
+
+    global _READY_CACHE, _PROBE_CACHE
+    _READY_CACHE = None
+    _PROBE_CACHE = _UNSET
+
+
 def _is_windows() -> bool:
     return platform.system().lower().startswith("windows")
 
 
 def _is_interception_ready() -> bool:
-    """Return True when every monitored service is not explicitly disabled."""
+    """Return True when every monitored service is not explicitly disabled.
 
-    for path in _SERVICE_REGISTRY_PATHS:
-        value = _read_registry_dword(path, "Start")
-        if value == 4:
-            logger.debug("Registry Start=4 detected for %s", path)
-            return False
-    return True
+    The answer is cached until :func:`invalidate_interception_cache`.
+    """
+
+    global _READY_CACHE
+    if _READY_CACHE is None:
+        _READY_CACHE = True
+        for service, value in _read_all_starts().items():
+            if value == 4:
+                logger.debug("Registry Start=4 detected for HKLM:\\%s\\%s", _SERVICES_KEY, service)
+                _READY_CACHE = False
+                break
+    return _READY_CACHE
 
 
 def _probe_interception_driver() -> Optional[bool]:
+    """Cached :func:`_run_interception_probe` (at most one probe per process)."""
+
+    global _PROBE_CACHE
+    if _PROBE_CACHE is _UNSET:
+        _PROBE_CACHE = _run_interception_probe()
+    return _PROBE_CACHE  # type: ignore[return-value]
+
+
+def _run_interception_probe() -> Optional[bool]:
     """Check whether the Interception Python bindings can reach the driver.
 
-    We spawn a short-lived Python process that imports ``interception`` and
-    triggers ``auto_capture_devices``. When the driver is missing the library
-    raises ``DriverNotFoundError`` which we translate to ``False`` so the caller
-    can attempt a restoration. ``None`` signals that the bindings are not
-    available (e.g. package not installed) and therefore no decision can be made
-    based on this probe.
+    The probe runs in process: it imports ``interception`` and triggers
+    ``auto_capture_devices``. When the driver is missing the library raises
+    ``DriverNotFoundError`` which we translate to ``False`` so the caller can
+    attempt a restoration. ``None`` signals that the bindings are not available
+    (e.g. package not installed) or failed unexpectedly, and therefore no
+    decision can be made based on this probe.
     """
 
-    script = textwrap.dedent(
-        """
-        import sys
-        try:
-            import interception
-            from interception import exceptions
-        except Exception:
-            sys.exit(2)
-
-        try:
-            interception.auto_capture_devices(mouse=True)
-        except exceptions.DriverNotFoundError:
-            sys.exit(1)
-        except Exception:
-            sys.exit(3)
-
-        sys.exit(0)
-        """
-    ).strip()
+    # utils.mouse / utils.keyboard capturent les périphériques à l'import :
+    # s'ils sont chargés, le driver répond déjà, pas de seconde capture.
+    if "utils.mouse" in sys.modules or "utils.keyboard" in sys.modules:
+        logger.debug("Interception devices already captured; skipping probe")
+        return True
 
     try:
-        result = subprocess.run(
-            [
-                sys.executable,
-                "-c",
-                script,
-            ],
-            capture_output=True,
-            text=True,
-            check=False,
-        )
+        import interception
+        from interception import exceptions
     except Exception:
-        logger.debug("Unable to spawn probe process for Interception driver", exc_info=True)
+        logger.info("Interception Python package not available; skipping driver probe")
         return None
 
-    if result.returncode == 0:
-        logger.debug("Interception probe succeeded")
-        return True
-
-    if result.returncode == 1:
-        logger.debug("Interception probe reported missing driver: %s", result.stderr.strip())
+    try:
+        interception.auto_capture_devices(mouse=True)
+    except exceptions.DriverNotFoundError as exc:
+        logger.debug("Interception probe reported missing driver: %s", exc)
         return False
-
-    if result.returncode == 2:
-        logger.info(
-            "Interception Python package not available; skipping driver probe"
-        )
+    except Exception:
+        logger.debug("Unexpected error from Interception probe", exc_info=True)
         return None
 
-    logger.debug(
-        "Unexpected result from Interception probe (code %s): stdout=%s stderr=%s",
-        result.returncode,
-        result.stdout.strip(),
-        result.stderr.strip(),
-    )
-    return None
-
+    logger.debug("Interception probe succeeded")
+    return True
 
-def _read_registry_dword(path: str, name: str) -> Optional[int]:
-    """Read a DWORD registry value via PowerShell and return it as an int."""
 
-    ps_path = path.replace('"', '`"')
-    ps_name = name.replace('"', '`"')
-    script = (
-        f"(Get-ItemProperty -Path \"{ps_path}\" -Name \"{ps_name}\" "
-        "-ErrorAction SilentlyContinue).{name}"
-    )
+def _read_all_starts() -> Dict[str, Optional[int]]:
+    """Read the ``Start`` DWORD of every monitored service in one registry pass.
 
-    try:
-        result = subprocess.run(
-            [
-                "powershell",
-                "-NoProfile",
-                "-ExecutionPolicy",
-                "Bypass",
-                "-Command",
-                script,
-            ],
-            check=True,
-            capture_output=True,
-            text=True,
-        )
-    except FileNotFoundError:
-        logger.warning("PowerShell not found; assuming Interception is ready")
-        return None
+    The ``Services`` key is opened once and each service subkey is read relative
+    to it. ``None`` marks a missing key/value or a non-integer value, which the
+    caller treats as "not disabled". The 64-bit view is read explicitly so a
+    32-bit interpreter sees the same services as PowerShell.
+    """
 
-    raw_value = result.stdout.strip()
-    if not raw_value:
-        return None
+    starts: Dict[str, Optional[int]] = dict.fromkeys(_MONITORED_SERVICES)
+    if winreg is None:
+        return starts
 
+    access = winreg.KEY_READ | winreg.KEY_WOW64_64KEY
     try:
-        return int(raw_value)
-    except ValueError:
-        logger.debug("Unexpected registry value '%s' for %s", raw_value, path)
-        return None
+        services = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, _SERVICES_KEY, 0, access)
+    except OSError:
+        return starts
+
+    with services:
+        for service in _MONITORED_SERVICES:
+            try:
+                with winreg.OpenKey(services, service, 0, access) as key:
+                    value, _ = winreg.QueryValueEx(key, "Start")
+            except OSError:  # FileNotFoundError included: missing key or value
+                continue
+            try:
+                starts[service] = int(value)
+            except (TypeError, ValueError):
+                logger.debug("Unexpected registry value %r for service %s", value, service)
+    return starts
 
 
 def _run_powershell_script(script: str, description: str) -> None:
     """Execute a multi-line PowerShell script."""
 
-    dedented = textwrap.dedent(script).strip()
+    _run_powershell_scripts([script], description)
+
+
+def _run_powershell_scripts(scripts: Sequence[str], description: str) -> None:
+    """Execute several PowerShell scripts in a single ``powershell`` process.
+
+    Each script runs in its own ``& { ... }`` block, in order, so a multi-step
+    sequence pays PowerShell startup once. The tradeoff is all-or-nothing error
+    handling: a terminating error in one block stops the following ones and the
+    whole run is reported as a single failure.
+    """
+
+    payload = "\n".join(
+        "& {\n" + textwrap.dedent(script).strip() + "\n}" for script in scripts
+    )
     logger.debug("Executing PowerShell script to %s", description)
     try:
         subprocess.run(
             [
                 "powershell",
                 "-NoProfile",
+                "-NonInteractive",
                 "-ExecutionPolicy",
                 "Bypass",
                 "-Command",
-                dedented,
+                payload,
             ],
             check=True,
         )
@@ -303,3 +313,6 @@ def _run_powershell_script(script: str, description: str) -> None:
             description,
         )
         raise
+    finally:
+        # Le script a pu modifier le registre, même en échouant à mi-chemin
+        invalidate_interception_cache()
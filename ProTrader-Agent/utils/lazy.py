@@ -0,0 +1,39 @@
+"""Lazy module proxies for the FSM states.
+
+The marketplace modules must stay importable without OpenCV/mss/interception
+(tests, CLI tooling), so those modules are only imported on first use.
+"""
+
+from __future__ import annotations
+
+import importlib
+from types import ModuleType
+from typing import Any, Optional
+
+
+class LazyModule:
+    """Proxy importing ``name`` on first attribute access.
+
+    Each resolved attribute is stored on the proxy itself: ``__getattr__``
+    only runs for missing attributes, so later lookups are plain attribute
+    loads with no ``is None`` check.
+    """
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr.startswith("__") or attr in ("_name", "_module"):
+            raise AttributeError(attr)
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        value = getattr(self._module, attr)
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self) -> str:
+        return f"<LazyModule {self._name!r}>"
+
+
+__all__ = ["LazyModule"]
@@ -1,5 +1,9 @@
 import os
 import subprocess
+import time
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
 
 
 def open_dofus():
@@ -28,6 +32,23 @@ def close_dofus(force: bool = True) -> bool:
     except FileNotFoundError:
         raise RuntimeError("Commande 'taskkill' introuvable (Windows requis).")
 
+def wait_for(predicate: Callable[[], Optional[T]], timeout: float, poll_hz: float = 20.0) -> Optional[T]:
+    """
+    Appelle ``predicate`` jusqu'à ce qu'il renvoie une valeur vraie ou que
+    ``timeout`` (secondes) soit écoulé, à ``poll_hz`` appels par seconde.
+    Retourne la dernière valeur du prédicat (None/falsy si le délai expire).
+    """
+    period = 1.0 / poll_hz
+    deadline = time.monotonic() + timeout
+    while True:
+        value = predicate()
+        if value:
+            return value
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return value
+        time.sleep(min(period, remaining))
+
 if __name__ == "__main__":
     close_dofus()
 
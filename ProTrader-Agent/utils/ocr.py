@@ -1,13 +1,26 @@
 # ocr.py
 from __future__ import annotations
 
+import hashlib
+import os
+import threading
 from dataclasses import dataclass
-from typing import Optional, Tuple, Literal, List
+from typing import Dict, Optional, Tuple, Literal, List
 
 import cv2
-import mss
 import numpy as np
 
+try:  # pragma: no cover - optional dependency at runtime
+    import tesserocr  # type: ignore
+except Exception:  # pragma: no cover - fallback to pytesseract (one process per call)
+    tesserocr = None  # type: ignore
+
+from utils import screen
+
+# Zones OCR minuscules : OpenMP dans Tesseract n'apporte que du surcoût.
+# Hérité par les processus pytesseract, lu à l'init par tesserocr.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
@@ -31,21 +44,95 @@ def ocr_read_int(
 
     Retourne None si pas de lecture fiable.
     """
-    roi_bgr, (off_x, off_y) = _grab_and_crop(monitor_index, region)
-
-    # Pipeline OCR multi-essais (prétraitements simples)
-    best_val, best_conf = None, -1.0
-    for variant in _preprocess_variants(roi_bgr):
-        text, conf = _tesseract_digits(variant, tesseract_cmd=tesseract_cmd, psm=psm)
-        val = _parse_int(text)
-        if val is not None and conf > best_conf:
-            best_val, best_conf = val, conf
+    roi, origin = _grab_and_crop(monitor_index, region)
+    return ocr_read_int_from_array(
+        roi,
+        tesseract_cmd=tesseract_cmd,
+        psm=psm,
+        debug=debug,
+        debug_origin=origin,
+        debug_ttl=debug_ttl,
+        debug_outline=debug_outline,
+        debug_width_px=debug_width_px,
+    )
+
+
+def ocr_read_int_in_frame(
+    frame: np.ndarray,
+    region: Tuple[int, int, int, int],
+    *,
+    monitor_index: int = 1,
+    tesseract_cmd: str = r"C:\Program Files\Tesseract-OCR\tesseract.exe",
+    psm: int = 7,
+    debug: bool = False,
+    debug_ttl: float = 1.2,
+    debug_outline=(60, 200, 80, 220),
+    debug_width_px: int = 3,
+) -> Optional[int]:
+    """
+    Comme ocr_read_int, mais lit la zone dans ``frame`` (capture BGRA/BGR du
+    moniteur ``monitor_index`` déjà faite) au lieu de refaire une capture.
+    """
+    l2, t2, r2, b2 = screen.clamp_region(region, frame.shape[1], frame.shape[0])
+    mon_left, mon_top = screen.monitor_origin(monitor_index) if debug else (0, 0)
+    return ocr_read_int_from_array(
+        frame[t2:b2, l2:r2],
+        tesseract_cmd=tesseract_cmd,
+        psm=psm,
+        debug=debug,
+        debug_origin=(mon_left + l2, mon_top + t2),
+        debug_ttl=debug_ttl,
+        debug_outline=debug_outline,
+        debug_width_px=debug_width_px,
+    )
+
+
+# (empreinte des pixels, shape, psm) -> (valeur, confiance) des dernières lectures.
+_OCR_MEMO: Dict[tuple, Tuple[Optional[int], float]] = {}
+_OCR_MEMO_MAX = 64
+
+
+def ocr_read_int_from_array(
+    img: np.ndarray,
+    *,
+    tesseract_cmd: str = r"C:\Program Files\Tesseract-OCR\tesseract.exe",
+    psm: int = 7,
+    debug: bool = False,
+    debug_origin: Tuple[int, int] = (0, 0),
+    debug_ttl: float = 1.2,
+    debug_outline=(60, 200, 80, 220),
+    debug_width_px: int = 3,
+) -> Optional[int]:
+    """
+    Lit un entier dans une image BGRA/BGR/GRAY déjà capturée (ex. vue numpy d'une frame).
+    ``debug_origin`` = coin haut-gauche absolu de l'image, pour l'overlay.
+    """
+    # Pixels déjà lus (zone inchangée entre deux ticks) : pas de nouvel OCR.
+    memo_key = (
+        hashlib.blake2b(np.ascontiguousarray(img).data, digest_size=8).digest(),
+        img.shape,
+        psm,
+    )
+    cached = _OCR_MEMO.get(memo_key)
+    if cached is not None:
+        best_val, best_conf = cached
+    else:
+        # Pipeline OCR multi-essais (prétraitements simples)
+        best_val, best_conf = None, -1.0
+        for variant in _preprocess_variants(img):
+            text, conf = _tesseract_digits(variant, tesseract_cmd=tesseract_cmd, psm=psm)
+            val = _parse_int(text)
+            if val is not None and conf > best_conf:
+                best_val, best_conf = val, conf
+        if len(_OCR_MEMO) >= _OCR_MEMO_MAX:
+            _OCR_MEMO.clear()
+        _OCR_MEMO[memo_key] = (best_val, best_conf)
 
     # Overlay debug
     if debug:
         _overlay_rect(
-            left=off_x, top=off_y,
-            width=roi_bgr.shape[1], height=roi_bgr.shape[0],
+            left=debug_origin[0], top=debug_origin[1],
+            width=img.shape[1], height=img.shape[0],
             ttl=debug_ttl, outline=debug_outline, width_px=debug_width_px,
             label=f"OCR: {best_val if best_val is not None else 'None'} (conf≈{best_conf:.0f})"
         )
@@ -65,11 +152,11 @@ def ocr_try_read_ints(
     Variante qui renvoie les meilleurs candidats [(value, confidence, psm)], triés par confiance.
     Utile pour calibrer rapidement.
     """
-    roi_bgr, _ = _grab_and_crop(monitor_index, region)
+    roi, _ = _grab_and_crop(monitor_index, region)
 
     cands: List[Tuple[int, float, int]] = []
     for psm in psm_candidates:
-        for variant in _preprocess_variants(roi_bgr):
+        for variant in _preprocess_variants(roi):
             text, conf = _tesseract_digits(variant, tesseract_cmd=tesseract_cmd, psm=psm)
             val = _parse_int(text)
             if val is not None:
@@ -83,48 +170,70 @@ def ocr_try_read_ints(
 # Screen capture & region crop (identique esprit à ta vision)
 # ---------------------------------------------------------------------------
 
-def _grab_screen(monitor_index: int = 1) -> Tuple[np.ndarray, int, int]:
-    """Retourne (frame BGR, mon_left, mon_top)."""
-    with mss.mss() as sct:
-        monitors = sct.monitors
-        if monitor_index < 1 or monitor_index >= len(monitors):
-            monitor_index = 1
-        mon = monitors[monitor_index]
-        shot = np.array(sct.grab(mon))
-        frame = shot[..., :3]  # BGR
-        return frame, int(mon["left"]), int(mon["top"])
-
-def _crop_region(img: np.ndarray, region: Optional[Tuple[int, int, int, int]]) -> Tuple[np.ndarray, Tuple[int, int]]:
-    """Rogne l'image à region=(l,t,w,h) (coords relatives à img). Retourne (roi, (off_x, off_y))."""
-    if not region:
-        return img, (0, 0)
-    l, t, w, h = region
-    h_img, w_img = img.shape[:2]
-    l2 = max(0, min(w_img - 1, l))
-    t2 = max(0, min(h_img - 1, t))
-    r2 = max(0, min(w_img, l + w))
-    b2 = max(0, min(h_img, t + h))
-    if r2 <= l2 or b2 <= t2:
-        raise ValueError("Region hors de l'image")
-    return img[t2:b2, l2:r2], (l2, t2)
-
 def _grab_and_crop(monitor_index: int, region: Tuple[int, int, int, int]) -> Tuple[np.ndarray, Tuple[int, int]]:
-    """Capture l'écran puis rogne la zone; retourne (roi_bgr, (off_x_abs, off_y_abs))."""
-    screen_bgr, mon_left, mon_top = _grab_screen(monitor_index)
-    roi_bgr_rel, (off_x_rel, off_y_rel) = _crop_region(screen_bgr, region)
+    """Capture uniquement la zone; retourne (roi_bgra, (off_x_abs, off_y_abs))."""
+    roi_bgra, (off_x_rel, off_y_rel) = screen.grab_region(monitor_index, region)
+    mon_left, mon_top = screen.monitor_origin(monitor_index)
     # convertit l'offset relatif en coord. absolues pour overlay
-    return roi_bgr_rel, (mon_left + off_x_rel, mon_top + off_y_rel)
+    return roi_bgra, (mon_left + off_x_rel, mon_top + off_y_rel)
 
 
 # ---------------------------------------------------------------------------
 # OCR core
 # ---------------------------------------------------------------------------
 
+# Lecture de chiffres uniquement : whitelist, moteur LSTM seul (OEM 1) et pas de
+# dictionnaires de mots à charger.
+_DIGITS_OEM = 1
+_DIGITS_VARIABLES = {
+    "tessedit_char_whitelist": "0123456789",
+    "load_system_dawg": "0",
+    "load_freq_dawg": "0",
+}
+_DIGITS_CONFIG_VARS = " ".join(f"-c {k}={v}" for k, v in _DIGITS_VARIABLES.items())
+
+
+# Une API tesserocr par (thread, psm), initialisée une seule fois : évite le
+# chargement du modèle et le lancement d'un processus à chaque lecture.
+_TESS_LOCAL = threading.local()
+
+
+def _tesserocr_api(tesseract_cmd: Optional[str], psm: int):
+    apis: Dict[int, object] = getattr(_TESS_LOCAL, "apis", None)
+    if apis is None:
+        apis = _TESS_LOCAL.apis = {}
+    api = apis.get(psm)
+    if api is None:
+        kwargs = {"lang": "eng", "psm": psm, "oem": _DIGITS_OEM, "variables": _DIGITS_VARIABLES}
+        tessdata = os.path.join(os.path.dirname(tesseract_cmd), "tessdata") if tesseract_cmd else ""
+        if tessdata and os.path.isdir(tessdata):
+            kwargs["path"] = tessdata
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        apis[psm] = api
+    return api
+
+
+def _tesserocr_digits(img_bgr: np.ndarray, *, tesseract_cmd: Optional[str], psm: int) -> Tuple[str, float]:
+    """Même contrat que _tesseract_digits, via l'API tesserocr persistante."""
+    api = _tesserocr_api(tesseract_cmd, psm)
+    gray = np.ascontiguousarray(_to_gray(img_bgr))
+    h, w = gray.shape
+    api.SetImageBytes(gray.tobytes(), w, h, 1, w)
+    text = "".join(ch for ch in api.GetUTF8Text() if ch.isdigit())
+    confs = [float(c) for c in api.AllWordConfidences() if c >= 0]
+    avg_conf = float(np.mean(confs)) if confs else -1.0
+    return text, avg_conf
+
+
 def _tesseract_digits(img_bgr: np.ndarray, *, tesseract_cmd: Optional[str], psm: int) -> Tuple[str, float]:
     """
-    Lance pytesseract sur img_bgr, whitelist=digits, renvoie (texte, conf_moyenne_approx).
+    Lance Tesseract sur img_bgr, whitelist=digits, renvoie (texte, conf_moyenne_approx).
+    Passe par une API tesserocr gardée chaude si installée, sinon pytesseract.
     Si pytesseract absent, raise avec message clair.
     """
+    if tesserocr is not None:
+        return _tesserocr_digits(img_bgr, tesseract_cmd=tesseract_cmd, psm=psm)
+
     try:
         import pytesseract
         from pytesseract import Output
@@ -138,7 +247,7 @@ def _tesseract_digits(img_bgr: np.ndarray, *, tesseract_cmd: Optional[str], psm:
         import pytesseract as _pt
         _pt.pytesseract.tesseract_cmd = tesseract_cmd
 
-    config = f'--psm {psm} -c tessedit_char_whitelist=0123456789'
+    config = f'--psm {psm} --oem {_DIGITS_OEM} {_DIGITS_CONFIG_VARS}'
     data = pytesseract.image_to_data(img_bgr, output_type=Output.DICT, config=config)
 
     # Concatène uniquement les tokens contenant des chiffres
@@ -177,57 +286,69 @@ def _parse_int(text: str) -> Optional[int]:
 # Preprocess variants (légers, efficaces)
 # ---------------------------------------------------------------------------
 
-def _preprocess_variants(bgr: np.ndarray) -> List[np.ndarray]:
+def _to_gray(img: np.ndarray) -> np.ndarray:
+    """BGRA / BGR / GRAY -> GRAY (uint8)."""
+    if img.ndim == 2:
+        return img
+    code = cv2.COLOR_BGRA2GRAY if img.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+    return cv2.cvtColor(img, code)
+
+
+def _preprocess_variants(img: np.ndarray) -> List[np.ndarray]:
     """
     Génère quelques variantes de pré-traitement pour améliorer l'OCR.
-    Retourne des images BGR (Tesseract accepte BGR/RGB/GRAY).
+    Accepte BGRA/BGR/GRAY; retourne des images binaires mono-canal (Tesseract
+    accepte le GRAY, inutile de lui envoyer 3 canaux identiques).
+    La conversion en gris et les agrandissements sont faits une seule fois.
     """
+    gray = _to_gray(img)
+    scaled = {scale: _upscale(gray, scale) for scale in (2.0, 1.8)}
     out: List[np.ndarray] = []
 
     # 1) upscale x2 + gris + Otsu (BINARY)
-    v1 = _prep_one(bgr, scale=2.0, invert=False)
+    v1 = _prep_one(scaled[2.0], invert=False)
     out.append(v1)
 
     # 2) idem mais invert
-    v2 = _prep_one(bgr, scale=2.0, invert=True)
+    v2 = _prep_one(scaled[2.0], invert=True)
     out.append(v2)
 
     # 3) CLAHE + thresh normal
-    v3 = _prep_one(bgr, scale=1.8, invert=False, clahe=True)
+    clahe = _clahe(scaled[1.8])
+    v3 = _prep_one(clahe, invert=False)
     out.append(v3)
 
     # 4) CLAHE + invert
-    v4 = _prep_one(bgr, scale=1.8, invert=True, clahe=True)
+    v4 = _prep_one(clahe, invert=True)
     out.append(v4)
 
     # 5) léger blur + morph close (bouchage des trous)
-    v5 = _prep_one(bgr, scale=2.0, invert=False, blur=True, morph_close=True)
+    v5 = _prep_one(scaled[2.0], invert=False, blur=True, morph_close=True)
     out.append(v5)
 
     return out
 
 
+def _upscale(gray: np.ndarray, scale: float) -> np.ndarray:
+    if scale == 1.0:
+        return gray
+    interp = cv2.INTER_CUBIC if scale > 1.0 else cv2.INTER_AREA
+    return cv2.resize(gray, (0, 0), fx=scale, fy=scale, interpolation=interp)
+
+
+def _clahe(gray: np.ndarray) -> np.ndarray:
+    c = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    return c.apply(gray)
+
+
 def _prep_one(
-    bgr: np.ndarray,
+    gray: np.ndarray,
     *,
-    scale: float = 2.0,
     invert: bool = False,
-    clahe: bool = False,
     blur: bool = False,
     morph_close: bool = False,
 ) -> np.ndarray:
-    """Construit une variante fortement lisible pour chiffres."""
-    img = bgr
-    if scale != 1.0:
-        interp = cv2.INTER_CUBIC if scale > 1.0 else cv2.INTER_AREA
-        img = cv2.resize(img, (0, 0), fx=scale, fy=scale, interpolation=interp)
-
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-    if clahe:
-        c = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        gray = c.apply(gray)
-
+    """Construit une variante fortement lisible pour chiffres (gris déjà mis à l'échelle)."""
     if blur:
         gray = cv2.GaussianBlur(gray, (3, 3), 0)
 
@@ -239,9 +360,7 @@ def _prep_one(
         k = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
         th = cv2.morphologyEx(th, cv2.MORPH_CLOSE, k, iterations=1)
 
-    # Tesseract accepte le GRAY, mais on renvoie BGR pour rester homogène
-    bgr_out = cv2.cvtColor(th, cv2.COLOR_GRAY2BGR)
-    return bgr_out
+    return th
 
 
 # ---------------------------------------------------------------------------
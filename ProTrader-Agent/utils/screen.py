@@ -0,0 +1,91 @@
+"""Screen capture shared by the vision and OCR helpers."""
+
+from __future__ import annotations
+
+import threading
+from typing import Optional, Tuple
+
+import mss
+import numpy as np
+
+# One mss handle per thread, kept open: opening one per grab costs a display
+# connection (X11) / device contexts (Windows) each time, and handles must not
+# be shared between threads.
+_SCT_LOCAL = threading.local()
+
+
+def get_sct():
+    sct = getattr(_SCT_LOCAL, "sct", None)
+    if sct is None:
+        sct = mss.mss()
+        _SCT_LOCAL.sct = sct
+    return sct
+
+
+def _shot_to_bgra(shot) -> np.ndarray:
+    """View the BGRA buffer of an mss screenshot as an array, without copying."""
+
+    return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+
+def pick_monitor(sct, monitor_index: int):
+    monitors = sct.monitors
+    if monitor_index < 1 or monitor_index >= len(monitors):
+        monitor_index = 1
+    return monitors[monitor_index]
+
+
+def clamp_region(
+    region: Tuple[int, int, int, int], w_img: int, h_img: int
+) -> Tuple[int, int, int, int]:
+    """Clamp ``region`` (left, top, width, height) to a ``w_img`` x ``h_img`` frame.
+
+    Returns the (left, top, right, bottom) box.
+    """
+
+    l, t, w, h = region
+    l2 = max(0, min(w_img - 1, l))
+    t2 = max(0, min(h_img - 1, t))
+    r2 = max(0, min(w_img, l + w))
+    b2 = max(0, min(h_img, t + h))
+    if r2 <= l2 or b2 <= t2:
+        raise ValueError("Region hors de l'image")
+    return l2, t2, r2, b2
+
+
+def monitor_origin(monitor_index: int) -> Tuple[int, int]:
+    """Return the (left, top) desktop coordinates of ``monitor_index``."""
+
+    mon = pick_monitor(get_sct(), monitor_index)
+    return int(mon["left"]), int(mon["top"])
+
+
+def grab_region(
+    monitor_index: int, region: Optional[Tuple[int, int, int, int]]
+) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Grab ``region`` (left, top, width, height) of ``monitor_index`` as BGRA.
+
+    Only the region's bounding box is captured; the whole monitor is grabbed
+    when ``region`` is ``None``. Returns the pixels and the region offset
+    relative to the monitor. The pixels are a view of the mss buffer (no
+    copy).
+    """
+
+    sct = get_sct()
+    mon = pick_monitor(sct, monitor_index)
+    if not region:
+        return _shot_to_bgra(sct.grab(mon)), (0, 0)
+
+    l2, t2, r2, b2 = clamp_region(region, int(mon["width"]), int(mon["height"]))
+    shot = sct.grab(
+        {
+            "left": int(mon["left"]) + l2,
+            "top": int(mon["top"]) + t2,
+            "width": r2 - l2,
+            "height": b2 - t2,
+        }
+    )
+    return _shot_to_bgra(shot), (l2, t2)
+
+
+__all__ = ["get_sct", "pick_monitor", "clamp_region", "monitor_origin", "grab_region"]
@@ -2,13 +2,86 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import List, Optional, Tuple, Literal
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Literal
 
 import cv2
-import mss
 import numpy as np
 
+try:  # pragma: no cover - optional dependency at runtime
+    from numba import njit  # type: ignore
+except Exception:  # pragma: no cover - fallback when numba is unavailable
+    njit = None  # type: ignore
+
+try:  # pragma: no cover - optional dependency at runtime
+    import xxhash  # type: ignore
+except Exception:  # pragma: no cover - fallback when xxhash is unavailable
+    xxhash = None  # type: ignore
+
+from utils import screen, vision_fft, vision_numba
+
+# Grayscale NCC through the Numba kernel instead of cv2.matchTemplate (opt-in).
+USE_NUMBA_NCC = (
+    os.getenv("PROTRADER_NUMBA_NCC", "0").strip().lower() in {"1", "true", "yes", "on"}
+    and vision_numba.available()
+)
+
+# Grayscale NCC with the frame spectrum shared by every template searched on
+# the same frame (opt-in, see utils.vision_fft). Only for frames of at least
+# _FFT_MIN_PIXELS: pyramid crops are cheaper through cv2.matchTemplate.
+USE_FFT_NCC = os.getenv("PROTRADER_FFT_NCC", "0").strip().lower() in {"1", "true", "yes", "on"}
+_FFT_MIN_PIXELS = 250_000
+# (haystack, FftFrame) of the last frame: the reference keeps id() stable.
+_FFT_FRAME: Optional[Tuple[np.ndarray, "vision_fft.FftFrame"]] = None
+_FFT_FRAME_LOCK = threading.Lock()
+
+
+def _fft_frame(haystack: np.ndarray) -> "vision_fft.FftFrame":
+    global _FFT_FRAME
+    with _FFT_FRAME_LOCK:
+        cached = _FFT_FRAME
+        if cached is None or cached[0] is not haystack:
+            cached = (haystack, vision_fft.FftFrame(haystack))
+            _FFT_FRAME = cached
+        return cached[1]
+
+
+def _cuda_device_count() -> int:
+    try:
+        return int(cv2.cuda.getCudaEnabledDeviceCount())
+    except Exception:  # pragma: no cover - OpenCV built without CUDA
+        return 0
+
+
+# CUDA NCC for large grayscale frames when OpenCV was built with CUDA and a
+# device is present (PROTRADER_CUDA=0 disables it). Below _CUDA_MIN_PIXELS the
+# upload costs more than the CPU match.
+USE_CUDA_NCC = (
+    os.getenv("PROTRADER_CUDA", "1").strip().lower() not in {"0", "false", "no", "off"}
+    and _cuda_device_count() > 0
+)
+_CUDA_MIN_PIXELS = 1_000_000
+
+# find_templates_on_screen searches its templates in parallel on this many
+# threads (cv2.matchTemplate releases the GIL); PROTRADER_MATCH_THREADS=1 keeps
+# the sequential loop.
+MATCH_THREADS = int(os.getenv("PROTRADER_MATCH_THREADS", "0") or 0) or min(4, os.cpu_count() or 1)
+_MATCH_POOL: Optional[ThreadPoolExecutor] = None
+_MATCH_POOL_LOCK = threading.Lock()
+
+
+def _match_pool() -> ThreadPoolExecutor:
+    global _MATCH_POOL
+    if _MATCH_POOL is None:
+        with _MATCH_POOL_LOCK:
+            if _MATCH_POOL is None:
+                _MATCH_POOL = ThreadPoolExecutor(MATCH_THREADS, thread_name_prefix="match")
+    return _MATCH_POOL
+
 
 @dataclass
 class MatchResult:
@@ -31,42 +104,136 @@ class MatchResult:
 
 
 # ---------------------------------------------------------------------------
-# Screen capture helpers
+# Template cache
 # ---------------------------------------------------------------------------
-def _grab_screen(monitor_index: int = 1) -> Tuple[np.ndarray, int, int]:
-    """Grab the full contents of ``monitor_index`` and return BGR pixels.
+# path -> (mtime_ns, image decoded with IMREAD_UNCHANGED). The mtime check keeps
+# the per-resource templates (rewritten between runs) coherent for a stat().
+_TEMPLATE_CACHE: Dict[str, Tuple[int, np.ndarray]] = {}
+
+
+def load_template(template_path: str) -> np.ndarray:
+    """Return the decoded template (``IMREAD_UNCHANGED``), decoding it once.
 
-    Returns the frame along with the monitor's top-left coordinates.
+    The returned array is shared and read-only.
     """
 
-    with mss.mss() as sct:
-        monitors = sct.monitors
-        if monitor_index < 1 or monitor_index >= len(monitors):
-            monitor_index = 1
-        mon = monitors[monitor_index]
-        shot = np.array(sct.grab(mon))
-        frame = shot[..., :3]
-        return frame, int(mon["left"]), int(mon["top"])
+    key = str(template_path)
+    try:
+        mtime = os.stat(key).st_mtime_ns
+    except OSError:
+        _TEMPLATE_CACHE.pop(key, None)
+        raise FileNotFoundError(f"Template introuvable: {template_path}") from None
 
+    cached = _TEMPLATE_CACHE.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
 
-def _crop_region(img: np.ndarray, region: Optional[Tuple[int, int, int, int]]) -> Tuple[np.ndarray, Tuple[int, int]]:
-    """Crop ``img`` to ``region`` (left, top, width, height).
+    img = cv2.imread(key, cv2.IMREAD_UNCHANGED)
+    if img is None:
+        raise FileNotFoundError(f"Template introuvable: {template_path}")
+    img.setflags(write=False)
+    _TEMPLATE_CACHE[key] = (mtime, img)
+    return img
 
-    Returns the cropped image and the offset applied.
-    """
 
-    if not region:
-        return img, (0, 0)
+@dataclass
+class _PreparedTemplate:
+    """Template ready for matching (BGR or gray) and its resized variants."""
+
+    mtime: int
+    image: np.ndarray
+    mask: Optional[np.ndarray]
+    scaled: Dict[float, np.ndarray] = field(default_factory=dict)
+
+    def at_scale(self, s: float) -> np.ndarray:
+        if s == 1.0:
+            return self.image
+        tmpl = self.scaled.get(s)
+        if tmpl is None:
+            tmpl = cv2.resize(self.image, (0, 0), fx=s, fy=s, interpolation=cv2.INTER_AREA)
+            tmpl.setflags(write=False)
+            self.scaled[s] = tmpl
+        return tmpl
+
+
+# (path, variant...) -> template converted (gray or baked alpha) and resized
+# once, not on every search; invalidated with the decoded template's mtime.
+_PREPARED_CACHE: Dict[tuple, _PreparedTemplate] = {}
+
 
-    l, t, w, h = region
-    h_img, w_img = img.shape[:2]
-    l2 = max(0, min(w_img - 1, l))
-    t2 = max(0, min(h_img - 1, t))
-    r2 = max(0, min(w_img, l + w))
-    b2 = max(0, min(h_img, t + h))
-    if r2 <= l2 or b2 <= t2:
-        raise ValueError("Region hors de l'image")
-    return img[t2:b2, l2:r2], (l2, t2)
+def _prepared_template(template_path: str, use_color: bool) -> _PreparedTemplate:
+    """Return the template ready for matching, in BGR or gray."""
+
+    key = str(template_path)
+    templ_raw = load_template(key)
+    mtime = _TEMPLATE_CACHE[key][0]
+    cached = _PREPARED_CACHE.get((key, use_color))
+    if cached is not None and cached.mtime == mtime:
+        return cached
+
+    templ_bgr, templ_mask = _split_alpha(templ_raw)
+    template = templ_bgr if use_color else cv2.cvtColor(templ_bgr, cv2.COLOR_BGR2GRAY)
+    template.setflags(write=False)
+    prepared = _PreparedTemplate(mtime, template, templ_mask)
+    _PREPARED_CACHE[(key, use_color)] = prepared
+    return prepared
+
+
+def _baked_template(
+    template_path: str,
+    use_color: bool,
+    alpha_bg_bgr: Tuple[int, int, int],
+    alpha_min: int,
+) -> _PreparedTemplate:
+    """Return the BGRA template flattened on ``alpha_bg_bgr``, in BGR or gray."""
+
+    key = str(template_path)
+    templ_rgba = load_template(key)
+    mtime = _TEMPLATE_CACHE[key][0]
+    cache_key = (key, use_color, tuple(alpha_bg_bgr), alpha_min)
+    cached = _PREPARED_CACHE.get(cache_key)
+    if cached is not None and cached.mtime == mtime:
+        return cached
+
+    baked_bgr = _flatten_rgba_to_bgr_on_bg(
+        templ_rgba,
+        bg_bgr=alpha_bg_bgr,
+        alpha_min=alpha_min,
+        crop_to_alpha=True,
+    )
+    template = baked_bgr if use_color else cv2.cvtColor(baked_bgr, cv2.COLOR_BGR2GRAY)
+    template.setflags(write=False)
+    prepared = _PreparedTemplate(mtime, template, None)
+    _PREPARED_CACHE[cache_key] = prepared
+    return prepared
+
+
+def preload_templates(template_paths: Iterable[str]) -> int:
+    """Decode ``template_paths`` ahead of the first tick; return how many loaded."""
+
+    loaded = 0
+    for path in template_paths:
+        try:
+            load_template(path)
+        except FileNotFoundError:
+            continue
+        loaded += 1
+    return loaded
+
+
+def _grab_haystack(
+    monitor_index: int, region: Optional[Tuple[int, int, int, int]], use_color: bool
+) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Grab the search area: a BGR view, or uint8 grayscale straight from BGRA."""
+
+    bgra, offset = screen.grab_region(monitor_index, region)
+    return _haystack_from_bgra(bgra, use_color), offset
+
+
+def _haystack_from_bgra(bgra: np.ndarray, use_color: bool) -> np.ndarray:
+    if use_color:
+        return bgra[..., :3]
+    return cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY)
 
 
 def _nms(results: List[MatchResult], iou_thresh: float = 0.3) -> List[MatchResult]:
@@ -94,6 +261,116 @@ def _nms(results: List[MatchResult], iou_thresh: float = 0.3) -> List[MatchResul
     return keep
 
 
+def _split_alpha(img: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Return ``(bgr, mask)`` for an image read with ``IMREAD_UNCHANGED``.
+
+    ``mask`` is the alpha channel binarised to 0/255, or ``None`` when the
+    image has no alpha.
+    """
+
+    if img.dtype != np.uint8:
+        img = cv2.convertScaleAbs(img, alpha=255.0 / float(np.iinfo(img.dtype).max))
+    if img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR), None
+    if img.shape[2] == 4:
+        mask = np.where(img[..., 3] > 0, 255, 0).astype(np.uint8)
+        return np.ascontiguousarray(img[..., :3]), mask
+    return img, None
+
+
+def _prefilter_rejects(
+    haystack: np.ndarray,
+    template: np.ndarray,
+    mask: Optional[np.ndarray],
+    k: float,
+) -> bool:
+    """Cheap mean/std gate run before ``matchTemplate``.
+
+    Returns ``True`` when no template-sized window of the search area has a
+    mean brightness (per channel) within ``k`` template standard deviations of
+    the template's mean, in which case the template cannot plausibly be
+    present. Window means come from a box filter (masked templates: the mask
+    as a normalised kernel), so a small template stays detectable in a large
+    frame of different overall brightness.
+    """
+
+    th, tw = template.shape[:2]
+    hh, hw = haystack.shape[:2]
+    if th > hh or tw > hw:
+        return False  # matchTemplate tranchera
+
+    tpl_mean, tpl_std = cv2.meanStdDev(template, mask=mask)
+    tol = k * np.maximum(tpl_std.ravel(), 1.0)
+    if mask is None:
+        means = cv2.boxFilter(
+            haystack, cv2.CV_32F, (tw, th), anchor=(0, 0), normalize=True
+        )
+    else:
+        kernel = mask.astype(np.float32)
+        kernel /= max(float(kernel.sum()), 1.0)
+        means = cv2.filter2D(haystack, cv2.CV_32F, kernel, anchor=(0, 0))
+    # anchor (0, 0) : means[y, x] = moyenne de la fenêtre de coin (x, y)
+    means = means[: hh - th + 1, : hw - tw + 1].reshape(hh - th + 1, hw - tw + 1, -1)
+    plausible = np.all(np.abs(means - tpl_mean.ravel().astype(np.float32)) <= tol, axis=2)
+    return not bool(plausible.any())
+
+
+# ---------------------------------------------------------------------------
+# Perceptual hash (dHash)
+# ---------------------------------------------------------------------------
+def _dhash64_numpy(gray9x8: np.ndarray) -> int:
+    """Vectorised dHash used when numba is not installed."""
+
+    bits = (gray9x8[:, 1:] > gray9x8[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _dhash64_kernel(gray9x8):
+    """8x8 neighbour comparisons packed MSB-first into a uint64."""
+
+    h = np.uint64(0)
+    one = np.uint64(1)
+    for y in range(8):
+        for x in range(8):
+            h = h << one
+            if gray9x8[y, x + 1] > gray9x8[y, x]:
+                h = h | one
+    return h
+
+
+_dhash64_jit = None
+if njit is not None:
+    try:
+        _dhash64_jit = njit(cache=True, parallel=False)(_dhash64_kernel)
+        _dhash64_jit(np.zeros((8, 9), np.uint8))  # compile once at import
+    except Exception:  # pragma: no cover - JIT failures fall back to numpy
+        _dhash64_jit = None
+
+
+def dhash64(gray9x8: np.ndarray) -> int:
+    """Return the 64-bit difference hash of an 8x9 (rows x cols) grayscale thumbnail."""
+
+    if _dhash64_jit is not None:
+        return int(_dhash64_jit(gray9x8))
+    return _dhash64_numpy(gray9x8)
+
+
+def image_dhash(img: np.ndarray) -> int:
+    """Return the dHash of ``img`` (grayscale, BGR or BGRA)."""
+
+    if img.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if img.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        img = cv2.cvtColor(img, code)
+    thumb = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+    return dhash64(thumb)
+
+
+def hamming64(a: int, b: int) -> int:
+    """Number of differing bits between two 64-bit hashes."""
+
+    return (a ^ b).bit_count()
+
+
 # ---------------------------------------------------------------------------
 # Public API (standard, sans alpha)
 # ---------------------------------------------------------------------------
@@ -105,6 +382,8 @@ def find_template_on_screen(
     region: Optional[Tuple[int, int, int, int]] = None,
     scales: Tuple[float, float, float] = (0.8, 1.25, 1.0),
     use_color: bool = False,
+    prefilter_k: Optional[float] = None,
+    pyramid_levels: int = 0,
     debug: bool = False,
     debug_draw_mode: Literal["best", "all"] = "best",
     debug_ttl: float = 1.5,
@@ -115,7 +394,8 @@ def find_template_on_screen(
     """Return the best match on screen or ``None``.
 
     Set ``use_color=True`` to perform color-aware template matching instead of the
-    default grayscale detection.
+    default grayscale detection. ``prefilter_k`` and ``pyramid_levels`` are
+    described in :func:`find_all_templates_on_screen`.
     """
 
     matches = find_all_templates_on_screen(
@@ -126,6 +406,8 @@ def find_template_on_screen(
         max_results=1,
         scales=scales,
         use_color=use_color,
+        prefilter_k=prefilter_k,
+        pyramid_levels=pyramid_levels,
         debug=debug,
         debug_draw_mode=debug_draw_mode,
         debug_ttl=debug_ttl,
@@ -146,6 +428,8 @@ def find_all_templates_on_screen(
     iou_nms: float = 0.35,
     scales: Tuple[float, float, float] = (0.8, 1.25, 1.0),
     use_color: bool = False,
+    prefilter_k: Optional[float] = None,
+    pyramid_levels: int = 0,
     debug: bool = False,
     debug_draw_mode: Literal["best", "all"] = "best",
     debug_ttl: float = 1.5,
@@ -158,23 +442,154 @@ def find_all_templates_on_screen(
     By default both the screenshot and template are converted to grayscale for
     robustness. Pass ``use_color=True`` to match directly on the BGR data for
     color-sensitive detection.
+
+    When ``prefilter_k`` is set, the mean of every template-sized window of the
+    search area is compared with the template's (alpha-masked) mean/std first
+    and ``matchTemplate`` is skipped when none lies within ``prefilter_k``
+    standard deviations. Only worth enabling for templates with a distinct
+    color signature.
+
+    ``pyramid_levels > 0`` runs a coarse-to-fine search: each scale is first
+    matched on the frame and template downsampled ``pyramid_levels`` times
+    with ``cv2.pyrDown``, then refined at full resolution only around the
+    coarse candidates. Levels are reduced for small templates.
     """
 
-    screen_bgr, _, _ = _grab_screen(monitor_index)
-    cropped_bgr, (off_x, off_y) = _crop_region(screen_bgr, region)
-    haystack = (
-        cropped_bgr
-        if use_color
-        else cv2.cvtColor(cropped_bgr, cv2.COLOR_BGR2GRAY)
-    )
+    haystack, offset = _grab_haystack(monitor_index, region, use_color)
 
-    templ_bgr = cv2.imread(template_path, cv2.IMREAD_COLOR)
-    if templ_bgr is None:
-        raise FileNotFoundError(f"Template introuvable: {template_path}")
-    template_full = (
-        templ_bgr if use_color else cv2.cvtColor(templ_bgr, cv2.COLOR_BGR2GRAY)
+    pruned = _match_on_haystack(
+        haystack,
+        offset,
+        template_path,
+        digest=_frame_digest(haystack),
+        threshold=threshold,
+        max_results=max_results,
+        iou_nms=iou_nms,
+        scales=scales,
+        use_color=use_color,
+        prefilter_k=prefilter_k,
+        pyramid_levels=pyramid_levels,
     )
 
+    if debug and pruned:
+        to_draw = [pruned[0]] if debug_draw_mode == "best" else pruned
+        _draw_debug(to_draw, debug_ttl, debug_outline, debug_fill, debug_width_px)
+
+    return pruned
+
+
+def find_any_template(
+    template_paths: Sequence[str],
+    *,
+    threshold: float = 0.88,
+    monitor_index: int = 1,
+    region: Optional[Tuple[int, int, int, int]] = None,
+    scales: Tuple[float, float, float] = (0.8, 1.25, 1.0),
+    use_color: bool = False,
+    prefilter_k: Optional[float] = None,
+    pyramid_levels: int = 0,
+    debug: bool = False,
+    debug_ttl: float = 1.5,
+    debug_outline=(255, 80, 0, 230),
+    debug_fill=None,
+    debug_width_px: int = 3,
+) -> Optional[Tuple[str, MatchResult]]:
+    """Match several templates against a single screen grab.
+
+    Templates are tried in order and the first one found wins, so list them by
+    priority. Returns ``(template_path, match)`` or ``None``.
+    """
+
+    haystack, offset = _grab_haystack(monitor_index, region, use_color)
+
+    digest = _frame_digest(haystack)
+    for template_path in template_paths:
+        matches = _match_on_haystack(
+            haystack,
+            offset,
+            str(template_path),
+            digest=digest,
+            threshold=threshold,
+            max_results=1,
+            iou_nms=0.35,
+            scales=scales,
+            use_color=use_color,
+            prefilter_k=prefilter_k,
+            pyramid_levels=pyramid_levels,
+        )
+        if matches:
+            if debug:
+                _draw_debug(matches, debug_ttl, debug_outline, debug_fill, debug_width_px)
+            return str(template_path), matches[0]
+    return None
+
+
+def find_templates_on_screen(
+    template_paths: Sequence[str],
+    *,
+    threshold: float = 0.88,
+    monitor_index: int = 1,
+    region: Optional[Tuple[int, int, int, int]] = None,
+    scales: Tuple[float, float, float] = (0.8, 1.25, 1.0),
+    use_color: bool = False,
+    prefilter_k: Optional[float] = None,
+    pyramid_levels: int = 0,
+    debug: bool = False,
+    debug_ttl: float = 1.5,
+    debug_outline=(255, 80, 0, 230),
+    debug_fill=None,
+    debug_width_px: int = 3,
+    frame: Optional[np.ndarray] = None,
+) -> Dict[str, Optional[MatchResult]]:
+    """Return the best match of every template, all searched on one screen grab.
+
+    Unlike :func:`find_any_template`, every template is searched; missing ones
+    map to ``None``. Pass ``frame`` (a BGRA capture of the whole monitor, see
+    :func:`utils.screen.grab_region`) to search it instead of grabbing, e.g.
+    to OCR the same pixels afterwards; ``region`` then crops it.
+    """
+
+    if frame is None:
+        haystack, offset = _grab_haystack(monitor_index, region, use_color)
+    else:
+        offset = (0, 0)
+        if region:
+            l2, t2, r2, b2 = screen.clamp_region(region, frame.shape[1], frame.shape[0])
+            frame, offset = frame[t2:b2, l2:r2], (l2, t2)
+        haystack = _haystack_from_bgra(frame, use_color)
+
+    digest = _frame_digest(haystack)
+
+    def best(template_path: str) -> Optional[MatchResult]:
+        matches = _match_on_haystack(
+            haystack,
+            offset,
+            template_path,
+            digest=digest,
+            threshold=threshold,
+            max_results=1,
+            iou_nms=0.35,
+            scales=scales,
+            use_color=use_color,
+            prefilter_k=prefilter_k,
+            pyramid_levels=pyramid_levels,
+        )
+        return matches[0] if matches else None
+
+    paths = [str(p) for p in template_paths]
+    if MATCH_THREADS > 1 and len(paths) > 1:
+        results = list(_match_pool().map(best, paths))
+    else:
+        results = [best(p) for p in paths]
+    found: Dict[str, Optional[MatchResult]] = dict(zip(paths, results))
+    if debug:
+        hits = [m for m in found.values() if m is not None]
+        if hits:
+            _draw_debug(hits, debug_ttl, debug_outline, debug_fill, debug_width_px)
+    return found
+
+
+def _scale_values(scales: Tuple[float, float, float]) -> List[float]:
     start, end, mult = scales
     scale_values: List[float] = [1.0]
     if start > 0 and end > 0 and mult > 1.0:
@@ -188,21 +603,110 @@ def find_all_templates_on_screen(
             steps += 1
         if not scale_values:
             scale_values = [1.0]
+    return scale_values
+
+
+# Matches of the last frame seen per (template, search parameters): on an idle
+# screen the FSM keeps grabbing identical frames, so the NCC is skipped when
+# the frame digest did not change.
+_MATCH_MEMO: Dict[tuple, Tuple[int, Tuple[MatchResult, ...]]] = {}
+_MATCH_MEMO_MAX = 256
+
+
+def _frame_digest(img: np.ndarray) -> int:
+    buf = np.ascontiguousarray(img)
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(buf)
+    return zlib.crc32(buf)
+
+
+def _match_on_haystack(
+    haystack: np.ndarray,
+    offset: Tuple[int, int],
+    template_path: str,
+    *,
+    threshold: float,
+    max_results: int,
+    iou_nms: float,
+    scales: Tuple[float, float, float],
+    use_color: bool,
+    prefilter_k: Optional[float],
+    pyramid_levels: int = 0,
+    digest: Optional[int] = None,
+) -> List[MatchResult]:
+    """Run the multi-scale NCC search of ``template_path`` on an already grabbed frame.
+
+    With ``digest`` (see :func:`_frame_digest`), the previous result is
+    returned as-is when the same search already ran on an identical frame.
+    """
+
+    prepared = _prepared_template(template_path, use_color)
+    memo_key = None
+    if digest is not None:
+        memo_key = (
+            template_path,
+            _TEMPLATE_CACHE[str(template_path)][0],
+            offset,
+            haystack.shape,
+            threshold,
+            max_results,
+            iou_nms,
+            scales,
+            use_color,
+            prefilter_k,
+            pyramid_levels,
+        )
+        cached = _MATCH_MEMO.get(memo_key)
+        if cached is not None and cached[0] == digest:
+            return list(cached[1])
+
+    pruned = _search_haystack(
+        haystack,
+        offset,
+        prepared,
+        threshold=threshold,
+        max_results=max_results,
+        iou_nms=iou_nms,
+        scales=scales,
+        prefilter_k=prefilter_k,
+        pyramid_levels=pyramid_levels,
+    )
+
+    if memo_key is not None:
+        if len(_MATCH_MEMO) >= _MATCH_MEMO_MAX:
+            _MATCH_MEMO.clear()
+        _MATCH_MEMO[memo_key] = (digest, tuple(pruned))
+    return pruned
+
+
+def _search_haystack(
+    haystack: np.ndarray,
+    offset: Tuple[int, int],
+    prepared: _PreparedTemplate,
+    *,
+    threshold: float,
+    max_results: int,
+    iou_nms: float,
+    scales: Tuple[float, float, float],
+    prefilter_k: Optional[float],
+    pyramid_levels: int,
+) -> List[MatchResult]:
+    off_x, off_y = offset
+
+    if prefilter_k is not None and _prefilter_rejects(
+        haystack, prepared.image, prepared.mask, prefilter_k
+    ):
+        return []
+
+    scale_values = _scale_values(scales)
 
     candidates: List[MatchResult] = []
     for s in scale_values:
-        tmpl = (
-            template_full
-            if s == 1.0
-            else cv2.resize(template_full, (0, 0), fx=s, fy=s, interpolation=cv2.INTER_AREA)
-        )
+        tmpl = prepared.at_scale(s)
         if haystack.shape[0] < tmpl.shape[0] or haystack.shape[1] < tmpl.shape[1]:
             continue
-        res = cv2.matchTemplate(haystack, tmpl, cv2.TM_CCOEFF_NORMED)
-        ys, xs = np.where(res >= threshold)
         h_t, w_t = tmpl.shape[:2]
-        for (y, x) in zip(ys.tolist(), xs.tolist()):
-            score = float(res[y, x])
+        for (x, y, score) in _match_scale(haystack, tmpl, threshold, pyramid_levels):
             candidates.append(
                 MatchResult(
                     left=int(x + off_x),
@@ -217,33 +721,140 @@ def find_all_templates_on_screen(
     pruned = _nms(candidates, iou_thresh=iou_nms)
     pruned.sort(key=lambda r: r.score, reverse=True)
     pruned = pruned[:max_results]
+    return pruned
 
-    if debug and pruned:
-        try:
-            from core.overlay import RectSpec  # imported lazily to avoid heavy deps
-            import bus
-
-            ov = getattr(bus, "overlay", None)
-            if ov:
-                to_draw = [pruned[0]] if debug_draw_mode == "best" else pruned
-                for r in to_draw:
-                    ov.add_rect(
-                        RectSpec(
-                            r.left,
-                            r.top,
-                            r.left + r.width,
-                            r.top + r.height,
-                            fill_rgba=debug_fill,
-                            outline_rgba=debug_outline,
-                            width=debug_width_px,
-                            ttl=debug_ttl,
-                        )
-                    )
-        except Exception:
-            # Debug overlay should never break detection
-            pass
 
-    return pruned
+# Coarse pyramid levels keep candidates down to ``threshold - _PYRAMID_SLACK``
+# (downsampling blurs fine details), and stop at 8 px templates.
+_PYRAMID_SLACK = 0.15
+_PYRAMID_MIN_TEMPLATE_PX = 8
+_PYRAMID_MAX_CANDIDATES = 64
+_PYRAMID_CLOSE_KERNEL = np.ones((5, 5), np.uint8)
+
+
+_CUDA_LOCAL = threading.local()
+
+
+def _cuda_ncc(haystack: np.ndarray, tmpl: np.ndarray) -> np.ndarray:
+    """``TM_CCOEFF_NORMED`` on the GPU; matcher/stream/buffers reused per thread."""
+
+    state = getattr(_CUDA_LOCAL, "state", None)
+    if state is None:
+        state = {
+            "matcher": cv2.cuda.createTemplateMatching(cv2.CV_8UC1, cv2.TM_CCOEFF_NORMED),
+            "stream": cv2.cuda.Stream(),
+            "frame": cv2.cuda.GpuMat(),
+            "tmpl": cv2.cuda.GpuMat(),
+            "result": cv2.cuda.GpuMat(),
+        }
+        _CUDA_LOCAL.state = state
+    stream = state["stream"]
+    state["frame"].upload(np.ascontiguousarray(haystack), stream)
+    state["tmpl"].upload(np.ascontiguousarray(tmpl), stream)
+    state["result"] = state["matcher"].match(
+        state["frame"], state["tmpl"], state["result"], stream
+    )
+    res = state["result"].download(stream)
+    stream.waitForCompletion()
+    return res
+
+
+def _ncc(haystack: np.ndarray, tmpl: np.ndarray) -> np.ndarray:
+    if haystack.ndim == 2:
+        if USE_CUDA_NCC and haystack.size >= _CUDA_MIN_PIXELS:
+            try:
+                return _cuda_ncc(haystack, tmpl)
+            except cv2.error:  # pragma: no cover - fall back to the CPU path
+                pass
+        if USE_FFT_NCC and haystack.size >= _FFT_MIN_PIXELS:
+            return vision_fft.ncc_search(_fft_frame(haystack), tmpl)
+        if USE_NUMBA_NCC:
+            return vision_numba.ncc_search(haystack, tmpl)
+    return cv2.matchTemplate(haystack, tmpl, cv2.TM_CCOEFF_NORMED)
+
+
+def _threshold_hits(res: np.ndarray, threshold: float, off_x: int = 0, off_y: int = 0):
+    ys, xs = np.where(res >= threshold)
+    return [
+        (x + off_x, y + off_y, float(res[y, x]))
+        for (y, x) in zip(ys.tolist(), xs.tolist())
+    ]
+
+
+def _usable_levels(tmpl: np.ndarray, levels: int) -> int:
+    while levels > 0 and (min(tmpl.shape[:2]) >> levels) < _PYRAMID_MIN_TEMPLATE_PX:
+        levels -= 1
+    return levels
+
+
+def _match_scale(
+    haystack: np.ndarray, tmpl: np.ndarray, threshold: float, pyramid_levels: int
+) -> List[Tuple[int, int, float]]:
+    """Return ``(x, y, score)`` hits of one template scale, full-resolution coords."""
+
+    levels = _usable_levels(tmpl, pyramid_levels)
+    if levels == 0:
+        return _threshold_hits(_ncc(haystack, tmpl), threshold)
+
+    small_hay, small_tmpl = haystack, tmpl
+    for _ in range(levels):
+        small_hay = cv2.pyrDown(small_hay)
+        small_tmpl = cv2.pyrDown(small_tmpl)
+    if small_hay.shape[0] < small_tmpl.shape[0] or small_hay.shape[1] < small_tmpl.shape[1]:
+        return _threshold_hits(_ncc(haystack, tmpl), threshold)
+
+    coarse = _ncc(small_hay, small_tmpl)
+    # Neighbouring coarse hits (one peak spreads over a few pixels, repeated
+    # UI icons sit side by side) are closed into blobs and refined once per blob.
+    mask = (coarse >= threshold - _PYRAMID_SLACK).astype(np.uint8)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, _PYRAMID_CLOSE_KERNEL)
+    n_labels, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if n_labels - 1 > _PYRAMID_MAX_CANDIDATES:
+        return _threshold_hits(_ncc(haystack, tmpl), threshold)
+
+    factor = 1 << levels
+    h_img, w_img = haystack.shape[:2]
+    h_t, w_t = tmpl.shape[:2]
+    hits: Dict[Tuple[int, int], float] = {}
+    for label in range(1, n_labels):
+        x, y, w, h = (int(v) for v in stats[label, :4])
+        x0 = max(0, (x - 1) * factor)
+        y0 = max(0, (y - 1) * factor)
+        x1 = min(w_img, (x + w) * factor + w_t + factor)
+        y1 = min(h_img, (y + h) * factor + h_t + factor)
+        if y1 - y0 < h_t or x1 - x0 < w_t:
+            continue
+        # TM_CCOEFF_NORMED only depends on the window: scores in the ROI are
+        # identical to a full-frame search at those positions.
+        res = _ncc(haystack[y0:y1, x0:x1], tmpl)
+        for (hx, hy, score) in _threshold_hits(res, threshold, x0, y0):
+            hits[(hx, hy)] = score
+    return [(hx, hy, score) for (hx, hy), score in hits.items()]
+
+
+def _draw_debug(results, ttl, outline, fill, width_px) -> None:
+    try:
+        from core.overlay import RectSpec  # imported lazily to avoid heavy deps
+        import bus
+
+        ov = getattr(bus, "overlay", None)
+        if ov:
+            for r in results:
+                ov.add_rect(
+                    RectSpec(
+                        r.left,
+                        r.top,
+                        r.left + r.width,
+                        r.top + r.height,
+                        fill_rgba=fill,
+                        outline_rgba=outline,
+                        width=width_px,
+                        ttl=ttl,
+                    )
+                )
+    except Exception:
+        # Debug overlay should never break detection
+        pass
 
 
 # ---------------------------------------------------------------------------
@@ -295,6 +906,7 @@ def find_template_on_screen_alpha(
     region: Optional[Tuple[int, int, int, int]] = None,
     scales: Tuple[float, float, float] = (0.85, 1.2, 1.03),
     use_color: bool = False,
+    pyramid_levels: int = 0,
     debug: bool = False,
     debug_draw_mode: Literal["best", "all"] = "best",
     debug_ttl: float = 1.5,
@@ -318,6 +930,7 @@ def find_template_on_screen_alpha(
         iou_nms=0.35,
         scales=scales,
         use_color=use_color,
+        pyramid_levels=pyramid_levels,
         debug=debug,
         debug_draw_mode=debug_draw_mode,
         debug_ttl=debug_ttl,
@@ -340,6 +953,7 @@ def find_all_templates_on_screen_alpha(
     iou_nms: float = 0.35,
     scales: Tuple[float, float, float] = (0.85, 1.2, 1.03),
     use_color: bool = False,
+    pyramid_levels: int = 0,
     debug: bool = False,
     debug_draw_mode: Literal["best", "all"] = "best",
     debug_ttl: float = 1.5,
@@ -354,21 +968,12 @@ def find_all_templates_on_screen_alpha(
     2) Remplace l'alpha par une couleur de fond (bake simple).
     3) Détection standard (TM_CCOEFF_NORMED) sur image grise ou couleur selon
        ``use_color``. Pass ``use_color=True`` to match using color information.
-    """
 
-    # Écran → éventuellement gris (zone éventuellement rognée)
-    screen_bgr, _, _ = _grab_screen(monitor_index)
-    cropped_bgr, (off_x, off_y) = _crop_region(screen_bgr, region)
-    haystack = (
-        cropped_bgr
-        if use_color
-        else cv2.cvtColor(cropped_bgr, cv2.COLOR_BGR2GRAY)
-    )
+    ``pyramid_levels`` is described in :func:`find_all_templates_on_screen`.
+    """
 
     # Lecture template (BGRA si dispo)
-    templ_rgba = cv2.imread(template_path, cv2.IMREAD_UNCHANGED)
-    if templ_rgba is None:
-        raise FileNotFoundError(f"Template introuvable: {template_path}")
+    templ_rgba = load_template(template_path)
 
     # S'il n'y a pas de canal alpha -> pipeline standard
     if not (templ_rgba.ndim == 3 and templ_rgba.shape[2] == 4):
@@ -381,6 +986,7 @@ def find_all_templates_on_screen_alpha(
             iou_nms=iou_nms,
             scales=scales,
             use_color=use_color,
+            pyramid_levels=pyramid_levels,
             debug=debug,
             debug_draw_mode=debug_draw_mode,
             debug_ttl=debug_ttl,
@@ -389,92 +995,71 @@ def find_all_templates_on_screen_alpha(
             debug_width_px=debug_width_px,
         )
 
-    # 1) Bake simple (remplacement alpha -> couleur de fond)
-    baked_bgr = _flatten_rgba_to_bgr_on_bg(
-        templ_rgba,
-        bg_bgr=alpha_bg_bgr,
-        alpha_min=alpha_min,
-        crop_to_alpha=True,
-    )
+    # Écran → éventuellement gris (zone éventuellement rognée)
+    haystack, (off_x, off_y) = _grab_haystack(monitor_index, region, use_color)
 
-    # 2) Optionnel: gris
-    template_full = (
-        baked_bgr if use_color else cv2.cvtColor(baked_bgr, cv2.COLOR_BGR2GRAY)
-    )
+    # 1) Bake simple (remplacement alpha -> couleur de fond), 2) gris optionnel :
+    # faits une fois par template et mis en cache avec les échelles.
+    prepared = _baked_template(template_path, use_color, alpha_bg_bgr, alpha_min)
 
-    # 3) Échelles (identiques au standard)
-    start, end, mult = scales
-    scale_values: List[float] = [1.0]
-    if start > 0 and end > 0 and mult and mult > 1.0:
-        scale_values = []
-        s = start
-        steps = 0
-        max_steps = 100
-        while s <= end + 1e-9 and steps < max_steps:
-            scale_values.append(round(s, 4))
-            s *= mult
-            steps += 1
-        if not scale_values:
-            scale_values = [1.0]
-
-    # 4) Matching standard (TM_CCOEFF_NORMED)
-    candidates: List[MatchResult] = []
-    for s in scale_values:
-        tmpl = (
-            template_full
-            if s == 1.0
-            else cv2.resize(template_full, (0, 0), fx=s, fy=s, interpolation=cv2.INTER_AREA)
+    # 3) Échelles + matching + NMS/tri (comme standard), mémorisé tant que les
+    # pixels ne changent pas (ex. attente d'une animation).
+    offset = (off_x, off_y)
+    digest = _frame_digest(haystack)
+    memo_key = (
+        "alpha",
+        str(template_path),
+        prepared.mtime,
+        tuple(alpha_bg_bgr),
+        alpha_min,
+        offset,
+        haystack.shape,
+        threshold,
+        max_results,
+        iou_nms,
+        scales,
+        use_color,
+        pyramid_levels,
+    )
+    cached = _MATCH_MEMO.get(memo_key)
+    if cached is not None and cached[0] == digest:
+        pruned = list(cached[1])
+    else:
+        pruned = _search_haystack(
+            haystack,
+            offset,
+            prepared,
+            threshold=threshold,
+            max_results=max_results,
+            iou_nms=iou_nms,
+            scales=scales,
+            prefilter_k=None,
+            pyramid_levels=pyramid_levels,
         )
-        if haystack.shape[0] < tmpl.shape[0] or haystack.shape[1] < tmpl.shape[1]:
-            continue
-
-        res = cv2.matchTemplate(haystack, tmpl, cv2.TM_CCOEFF_NORMED)
-        ys2, xs2 = np.where(res >= threshold)
-        h_t, w_t = tmpl.shape[:2]
-        for (y, x) in zip(ys2.tolist(), xs2.tolist()):
-            candidates.append(
-                MatchResult(
-                    left=int(x + off_x),
-                    top=int(y + off_y),
-                    width=int(w_t),
-                    height=int(h_t),
-                    score=float(res[y, x]),
-                    scale=float(s),
-                )
-            )
+        if len(_MATCH_MEMO) >= _MATCH_MEMO_MAX:
+            _MATCH_MEMO.clear()
+        _MATCH_MEMO[memo_key] = (digest, tuple(pruned))
 
-    # 5) NMS + tri + overlay (comme standard)
-    pruned = _nms(candidates, iou_thresh=iou_nms)
-    pruned.sort(key=lambda r: r.score, reverse=True)
-    pruned = pruned[:max_results]
+    # 4) Overlay (comme standard)
 
     if debug and pruned:
-        try:
-            from core.overlay import RectSpec  # import lazy
-            import bus
-            ov = getattr(bus, "overlay", None)
-            if ov:
-                to_draw = [pruned[0]] if debug_draw_mode == "best" else pruned
-                for r in to_draw:
-                    ov.add_rect(
-                        RectSpec(
-                            r.left, r.top, r.left + r.width, r.top + r.height,
-                            fill_rgba=debug_fill,
-                            outline_rgba=debug_outline,
-                            width=debug_width_px,
-                            ttl=debug_ttl,
-                        )
-                    )
-        except Exception:
-            pass
+        to_draw = [pruned[0]] if debug_draw_mode == "best" else pruned
+        _draw_debug(to_draw, debug_ttl, debug_outline, debug_fill, debug_width_px)
 
     return pruned
 
 
 __all__ = [
     "MatchResult",
+    "dhash64",
+    "image_dhash",
+    "hamming64",
+    "load_template",
+    "preload_templates",
     "find_template_on_screen",
     "find_all_templates_on_screen",
+    "find_any_template",
+    "find_templates_on_screen",
     "find_template_on_screen_alpha",
     "find_all_templates_on_screen_alpha",
 ]
@@ -0,0 +1,80 @@
+"""FFT NCC sharing the frame spectrum across templates (opt-in).
+
+Computes the same map as ``TM_CCOEFF_NORMED`` on grayscale images, like
+:mod:`utils.vision_numba`, but the cross term comes from one DFT of the frame
+reused by every template searched on it; the window mean/variance come from
+integral images. OpenCV stays the default: enable with ``PROTRADER_FFT_NCC=1``
+(see :mod:`utils.vision`).
+"""
+
+from __future__ import annotations
+
+import cv2
+import numpy as np
+
+
+class FftFrame:
+    """Spectrum and integral images of a grayscale frame, computed once."""
+
+    __slots__ = ("src_shape", "dft_shape", "spectrum", "integral", "integral_sq")
+
+    def __init__(self, src_gray: np.ndarray) -> None:
+        if src_gray.ndim != 2:
+            raise ValueError("FftFrame attend une image en niveaux de gris")
+        h, w = src_gray.shape
+        self.src_shape = (h, w)
+        # Pas de bourrage h + th - 1 : la corrélation circulaire ne se replie
+        # que hors de la zone valide (y <= h - th, x <= w - tw).
+        self.dft_shape = (cv2.getOptimalDFTSize(h), cv2.getOptimalDFTSize(w))
+        padded = np.zeros(self.dft_shape, np.float32)
+        padded[:h, :w] = src_gray
+        self.spectrum = cv2.dft(padded, flags=cv2.DFT_COMPLEX_OUTPUT)
+        self.integral, self.integral_sq = cv2.integral2(
+            src_gray, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F
+        )
+
+
+def _window_sums(integral: np.ndarray, th: int, tw: int, oh: int, ow: int) -> np.ndarray:
+    return (
+        integral[th:th + oh, tw:tw + ow]
+        - integral[:oh, tw:tw + ow]
+        - integral[th:th + oh, :ow]
+        + integral[:oh, :ow]
+    )
+
+
+def ncc_search(frame: FftFrame, tmpl_gray: np.ndarray) -> np.ndarray:
+    """Return the ``TM_CCOEFF_NORMED`` map of ``tmpl_gray`` over ``frame``."""
+
+    if tmpl_gray.ndim != 2:
+        raise ValueError("ncc_search attend des images en niveaux de gris")
+    h, w = frame.src_shape
+    th, tw = tmpl_gray.shape
+    oh, ow = h - th + 1, w - tw + 1
+
+    tmpl = tmpl_gray.astype(np.float64)
+    tmpl_zm = tmpl - tmpl.mean()
+    tmpl_sq = float((tmpl_zm * tmpl_zm).sum())
+    if tmpl_sq <= 1e-6:
+        return np.zeros((oh, ow), np.float32)
+
+    padded = np.zeros(frame.dft_shape, np.float32)
+    padded[:th, :tw] = tmpl_zm
+    spectrum = cv2.dft(padded, flags=cv2.DFT_COMPLEX_OUTPUT)
+    # sum(T' * I') == sum(T' * I) because T' is zero-mean.
+    cross = cv2.idft(
+        cv2.mulSpectrums(frame.spectrum, spectrum, 0, conjB=True),
+        flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE,
+    )[:oh, :ow]
+
+    n = th * tw
+    s = _window_sums(frame.integral, th, tw, oh, ow)
+    s2 = _window_sums(frame.integral_sq, th, tw, oh, ow)
+    var = s2 - s * s / n
+    out = np.zeros((oh, ow), np.float32)
+    ok = var > 1e-6
+    out[ok] = cross[ok] / np.sqrt(var[ok] * tmpl_sq)
+    return out
+
+
+__all__ = ["FftFrame", "ncc_search"]
@@ -0,0 +1,107 @@
+"""Numba NCC kernel, an opt-in alternative to ``cv2.matchTemplate``.
+
+Computes the same map as ``TM_CCOEFF_NORMED`` on grayscale images, using
+integral images for the window mean/variance so only the cross term is
+accumulated per pixel. OpenCV stays the default: enable with
+``PROTRADER_NUMBA_NCC=1`` (see :mod:`utils.vision`).
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:  # pragma: no cover - optional dependency at runtime
+    from numba import njit, prange  # type: ignore
+except Exception:  # pragma: no cover - fallback when numba is unavailable
+    njit = None  # type: ignore
+    prange = range  # type: ignore
+
+
+def _integrals(src: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the (h+1, w+1) sum and squared-sum integral images of ``src``."""
+
+    f = src.astype(np.float64)
+    integral = np.zeros((f.shape[0] + 1, f.shape[1] + 1), np.float64)
+    integral_sq = np.zeros_like(integral)
+    integral[1:, 1:] = f.cumsum(axis=0).cumsum(axis=1)
+    integral_sq[1:, 1:] = (f * f).cumsum(axis=0).cumsum(axis=1)
+    return integral, integral_sq
+
+
+def _ncc_kernel(src, tmpl_zm, tmpl_sq, integral, integral_sq, out):
+    th, tw = tmpl_zm.shape
+    oh, ow = out.shape
+    n = th * tw
+    for y in prange(oh):
+        for x in range(ow):
+            s = (
+                integral[y + th, x + tw]
+                - integral[y, x + tw]
+                - integral[y + th, x]
+                + integral[y, x]
+            )
+            s2 = (
+                integral_sq[y + th, x + tw]
+                - integral_sq[y, x + tw]
+                - integral_sq[y + th, x]
+                + integral_sq[y, x]
+            )
+            var = s2 - s * s / n
+            if var <= 1e-6 or tmpl_sq <= 1e-6:
+                out[y, x] = 0.0
+                continue
+            # sum(T' * I') == sum(T' * I) because T' is zero-mean.
+            acc = 0.0
+            for j in range(th):
+                for i in range(tw):
+                    acc += src[y + j, x + i] * tmpl_zm[j, i]
+            out[y, x] = acc / np.sqrt(var * tmpl_sq)
+
+
+_ncc_jit = None
+if njit is not None:
+    try:
+        _ncc_jit = njit(cache=True, parallel=True, fastmath=True)(_ncc_kernel)
+    except Exception:  # pragma: no cover - JIT failures disable the backend
+        _ncc_jit = None
+
+
+def ncc_search(
+    src_gray: np.ndarray,
+    tmpl_gray: np.ndarray,
+    integral: Optional[np.ndarray] = None,
+    integral_sq: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Return the ``TM_CCOEFF_NORMED`` map of ``tmpl_gray`` over ``src_gray``.
+
+    ``integral``/``integral_sq`` may be passed to reuse them across templates
+    searched on the same frame. Runs the pure Python kernel when Numba is not
+    installed (tests only, far too slow for live frames).
+    """
+
+    if src_gray.ndim != 2 or tmpl_gray.ndim != 2:
+        raise ValueError("ncc_search attend des images en niveaux de gris")
+    if integral is None or integral_sq is None:
+        integral, integral_sq = _integrals(src_gray)
+
+    tmpl = tmpl_gray.astype(np.float64)
+    tmpl_zm = tmpl - tmpl.mean()
+    tmpl_sq = float((tmpl_zm * tmpl_zm).sum())
+    out = np.empty(
+        (src_gray.shape[0] - tmpl.shape[0] + 1, src_gray.shape[1] - tmpl.shape[1] + 1),
+        np.float32,
+    )
+    kernel = _ncc_jit if _ncc_jit is not None else _ncc_kernel
+    kernel(src_gray.astype(np.float64), tmpl_zm, tmpl_sq, integral, integral_sq, out)
+    return out
+
+
+def available() -> bool:
+    """True when the compiled kernel can be used."""
+
+    return _ncc_jit is not None
+
+
+__all__ = ["ncc_search", "available"]
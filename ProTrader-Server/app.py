@@ -49,6 +49,98 @@ async def ws_ui(ws: WebSocket):
     finally:
         if ws in ui_clients: ui_clients.remove(ws)
 
+async def handle_agent_message(msg: Dict[str, Any]):
+    """Persiste un message de l'agent si besoin, puis le relaie à l'UI."""
+    # Persistance auto des prix OCR envoyés par l’agent
+    if msg.get("type") == "hdv_price":
+        try:
+            d = msg.get("data", {}) or {}
+            save_price_row(
+                slug=d.get("slug", ""),
+                qty=d.get("qty", ""),
+                price=int(d.get("price", 0)),
+                ts=msg.get("ts")
+            )
+        except Exception as e:
+            print("[backend] save_price failed:", e)
+
+            print("[backend] from agent:", msg)
+    # Persistance du montant de kamas envoyé par l'agent
+    elif msg.get("type") == "kamas_value":
+        try:
+            d = msg.get("data", {}) or {}
+            save_kamas_row(
+                amount=int(d.get("amount", 0)),
+                ts=msg.get("ts")
+            )
+        except Exception as e:
+            print("[backend] save_kamas failed:", e)
+            print("[backend] from agent:", msg)
+    elif msg.get("type") == "purchase_event":
+        try:
+            d = msg.get("data", {}) or {}
+            quantity = d.get("quantity", 0)
+            amount = d.get("amount", 0)
+            price_value = d.get("price", 0)
+            try:
+                quantity_int = int(quantity)
+            except (TypeError, ValueError):
+                quantity_int = 0
+            try:
+                total_int = int(amount)
+            except (TypeError, ValueError):
+                total_int = 0
+            try:
+                unit_price = float(price_value)
+            except (TypeError, ValueError):
+                unit_price = 0.0
+            quantity_label = d.get("quantity_label") or d.get("qty_label") or d.get("qty") or ""
+            save_purchase_row(
+                resource=d.get("resource", ""),
+                quantity=quantity_int,
+                quantity_label=str(quantity_label),
+                unit_price=unit_price,
+                total_price=total_int,
+                ts=msg.get("ts"),
+                date_str=d.get("date"),
+            )
+        except Exception as e:
+            print("[backend] save_purchase failed:", e)
+            print("[backend] from agent:", msg)
+    elif msg.get("type") == "sale_event":
+        try:
+            d = msg.get("data", {}) or {}
+            quantity = d.get("quantity", 0)
+            amount = d.get("amount", 0)
+            price_value = d.get("price", 0)
+            try:
+                quantity_int = int(quantity)
+            except (TypeError, ValueError):
+                quantity_int = 0
+            try:
+                total_int = int(amount)
+            except (TypeError, ValueError):
+                total_int = 0
+            try:
+                unit_price = float(price_value)
+            except (TypeError, ValueError):
+                unit_price = 0.0
+            quantity_label = d.get("quantity_label") or d.get("qty_label") or d.get("qty") or ""
+            save_sale_row(
+                resource=d.get("resource", ""),
+                quantity=quantity_int,
+                quantity_label=str(quantity_label),
+                unit_price=unit_price,
+                total_price=total_int,
+                ts=msg.get("ts"),
+                date_str=d.get("date"),
+            )
+        except Exception as e:
+            print("[backend] save_sale failed:", e)
+            print("[backend] from agent:", msg)
+    await broadcast_ui(msg)
+
+
 @app.websocket("/ws/agent")
 async def ws_agent(ws: WebSocket):
     global agent_ws
@@ -98,96 +190,16 @@ async def ws_agent(ws: WebSocket):
 
     try:
         while True:
-            text = await ws.receive_text()
-            msg = json.loads(text)
-            # Persistance auto des prix OCR envoyés par l’agent
-            if msg.get("type") == "hdv_price":
-                try:
-                    d = msg.get("data", {}) or {}
-                    save_price_row(
-                        slug=d.get("slug", ""),
-                        qty=d.get("qty", ""),
-                        price=int(d.get("price", 0)),
-                        ts=msg.get("ts")
-                    )
-                except Exception as e:
-                    print("[backend] save_price failed:", e)
-
-                    print("[backend] from agent:", msg)
-            # Persistance du montant de kamas envoyé par l'agent
-            elif msg.get("type") == "kamas_value":
-                try:
-                    d = msg.get("data", {}) or {}
-                    save_kamas_row(
-                        amount=int(d.get("amount", 0)),
-                        ts=msg.get("ts")
-                    )
-                except Exception as e:
-                    print("[backend] save_kamas failed:", e)
-                    print("[backend] from agent:", msg)
-            elif msg.get("type") == "purchase_event":
-                try:
-                    d = msg.get("data", {}) or {}
-                    quantity = d.get("quantity", 0)
-                    amount = d.get("amount", 0)
-                    price_value = d.get("price", 0)
-                    try:
-                        quantity_int = int(quantity)
-                    except (TypeError, ValueError):
-                        quantity_int = 0
-                    try:
-                        total_int = int(amount)
-                    except (TypeError, ValueError):
-                        total_int = 0
-                    try:
-                        unit_price = float(price_value)
-                    except (TypeError, ValueError):
-                        unit_price = 0.0
-                    quantity_label = d.get("quantity_label") or d.get("qty_label") or d.get("qty") or ""
-                    save_purchase_row(
-                        resource=d.get("resource", ""),
-                        quantity=quantity_int,
-                        quantity_label=str(quantity_label),
-                        unit_price=unit_price,
-                        total_price=total_int,
-                        ts=msg.get("ts"),
-                        date_str=d.get("date"),
-                    )
-                except Exception as e:
-                    print("[backend] save_purchase failed:", e)
-                    print("[backend] from agent:", msg)
-            elif msg.get("type") == "sale_event":
-                try:
-                    d = msg.get("data", {}) or {}
-                    quantity = d.get("quantity", 0)
-                    amount = d.get("amount", 0)
-                    price_value = d.get("price", 0)
-                    try:
-                        quantity_int = int(quantity)
-                    except (TypeError, ValueError):
-                        quantity_int = 0
-                    try:
-                        total_int = int(amount)
-                    except (TypeError, ValueError):
-                        total_int = 0
-                    try:
-                        unit_price = float(price_value)
-                    except (TypeError, ValueError):
-                        unit_price = 0.0
-                    quantity_label = d.get("quantity_label") or d.get("qty_label") or d.get("qty") or ""
-                    save_sale_row(
-                        resource=d.get("resource", ""),
-                        quantity=quantity_int,
-                        quantity_label=str(quantity_label),
-                        unit_price=unit_price,
-                        total_price=total_int,
-                        ts=msg.get("ts"),
-                        date_str=d.get("date"),
-                    )
-                except Exception as e:
-                    print("[backend] save_sale failed:", e)
-                    print("[backend] from agent:", msg)
-            await broadcast_ui(msg)
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            # Trames texte, ou binaires quand l'agent envoie du JSON déjà encodé
+            data = message.get("text")
+            msg = json.loads(data if data is not None else message.get("bytes") or b"")
+            # Les rafales arrivent regroupées en {"type": "batch", "items": [...]}
+            items = (msg.get("items") or []) if msg.get("type") == "batch" else (msg,)
+            for item in items:
+                await handle_agent_message(item)
     except WebSocketDisconnect:
         pass
     finally: